@@ -1,6 +1,8 @@
 from brownie import interface
 
 from helpers.StrategyCoreResolver import StrategyCoreResolver
+from helpers.ReceiptIndex import ReceiptIndex
+from helpers.multicall import Call, as_wei
 from rich.console import Console
 from _setup.config import WANT
 
@@ -46,6 +48,21 @@ class StrategyResolver(StrategyCoreResolver):
 
         return calls
 
+    def add_strategy_snap(self, calls, entities=None):
+        super().add_strategy_snap(calls, entities)
+        strategy = self.manager.strategy
+
+        # Read with the snap, so deferred verification sees the one of that block
+        calls.append(
+            Call(
+                strategy.address,
+                "minBbaUsdHarvest()(uint256)",
+                [["strategy.minBbaUsdHarvest", as_wei]],
+            )
+        )
+
+        return calls
+
     def confirm_harvest(self, before, after, tx):
         console.print("=== Compare Harvest ===")
         self.manager.printCompare(before, after)
@@ -53,13 +70,16 @@ class StrategyResolver(StrategyCoreResolver):
 
         super().confirm_harvest(before, after, tx)
 
-        assert len(tx.events["Harvested"]) == 1
-        event = tx.events["Harvested"][0]
+    def hook_after_harvest(self, before, after, tx):
+        events = ReceiptIndex.of(tx)
+
+        assert events.count("Harvested") == 1
+        event = events.events("Harvested")[0]
 
         assert event["token"] == WANT
         assert event["amount"] == after.get("sett.balance") - before.get("sett.balance")
 
-        assert len(tx.events["TreeDistribution"]) == 1
+        assert events.count("TreeDistribution") == 1
 
         emits = {
             "graviAura": self.manager.strategy.GRAVIAURA(),
@@ -67,15 +87,13 @@ class StrategyResolver(StrategyCoreResolver):
 
         # bbaUsd is autocompounded when strategy balance is greater than minBbaUsdHarvest
         # Find amount of bb-a-usd harvested
-        amount = 0
         rewardsPool = "0x62D7d772b2d909A0779d15299F4FC87e34513c6d"
-        for transfer in tx.events["Transfer"]:
-            if transfer["from"] == rewardsPool and transfer["to"] == self.manager.strategy:
-                amount = transfer["value"]
-                break
+        amount = events.transferred(
+            self.manager.strategy.BB_A_USD(), rewardsPool, self.manager.strategy
+        )
 
         total_bb_a_usd = amount + before.balances("bbaUsd", "strategy")
-        threshold = self.manager.strategy.minBbaUsdHarvest()
+        threshold = before.get("strategy.minBbaUsdHarvest")
         if total_bb_a_usd < threshold:
             assert (
                 after.balances("bbaUsd", "strategy") == total_bb_a_usd
@@ -88,8 +106,9 @@ class StrategyResolver(StrategyCoreResolver):
         assert after.balances("usdc", "strategy") == 0
         assert after.balances("bbaUsdc", "strategy") == 0
 
-        for token_key, event in zip(emits, tx.events["TreeDistribution"]):
-            token = emits[token_key]
+        for token_key, token in emits.items():
+            assert events.count("TreeDistribution", token) == 1
+            event = events.events("TreeDistribution", token)[0]
 
             assert after.balances(token_key, "badgerTree") > before.balances(
                 token_key, "badgerTree"
@@ -109,3 +128,45 @@ class StrategyResolver(StrategyCoreResolver):
             assert event["amount"] == after.balances(
                 token_key, "badgerTree"
             ) - before.balances(token_key, "badgerTree")
+
+    def hook_harvest_trace(self, before, after, tx, flows):
+        strategy = self.manager.strategy
+        balancerVault = strategy.BALANCER_VAULT()
+
+        # Swap, join and deposit intermediates, nothing may be left on the strategy
+        flows.assert_no_dust(
+            strategy,
+            [
+                strategy.WETH(),
+                strategy.USDC(),
+                strategy.BB_A_USDC(),
+                strategy.BAL(),
+                strategy.BALETH_BPT(),
+                strategy.AURA(),
+                strategy.GRAVIAURA(),
+            ],
+            before={
+                strategy.WETH(): before.balances("weth", "strategy"),
+                strategy.USDC(): before.balances("usdc", "strategy"),
+                strategy.BB_A_USDC(): before.balances("bbaUsdc", "strategy"),
+                strategy.AURA(): before.balances("aura", "strategy"),
+                strategy.GRAVIAURA(): before.balances("graviAura", "strategy"),
+            },
+        )
+
+        # The auraBal out of the Balancer vault is what was reported, and all restaked
+        auraBal = strategy.AURABAL()
+        earned = flows.sent(auraBal, balancerVault, strategy)
+        assert earned == ReceiptIndex.of(tx).events("Harvested")[0]["amount"]
+        assert flows.sent(auraBal, strategy, strategy.AURABAL_REWARDS()) == earned
+        flows.assert_conserved(strategy, auraBal)
+
+        # All the AURA went into graviAura, all the graviAura minted was distributed
+        graviAura = strategy.GRAVIAURA()
+        assert flows.sent(strategy.AURA(), strategy, graviAura) == flows.sent(
+            strategy.AURA(), dst=strategy
+        ) + before.balances("aura", "strategy")
+        distributed = ReceiptIndex.of(tx).events("TreeDistribution", graviAura)
+        assert distributed[0]["amount"] == flows.sent(
+            graviAura, strategy, self.manager.sett.badgerTree()
+        )
@@ -0,0 +1,7 @@
+"""
+Offline benchmarks for the Python side of the test helpers
+
+    python -m benchmarks.run             # report
+    python -m benchmarks.run --save      # store baselines
+    python -m benchmarks.run --compare   # fail on regressions against baselines
+"""
@@ -0,0 +1,210 @@
+"""
+Benchmark cases. Each case takes the size n and returns a function processing n items
+"""
+import io
+import random
+from contextlib import contextmanager, redirect_stdout
+
+from helpers import shares_math
+from helpers.multicall import Call, Multicall, Signature, as_wei, func
+from helpers.snapshot.render import GridRenderer
+from helpers.snapshot.snap import Snap
+
+from benchmarks.stand_in import FakeChain, FakeWeb3
+
+SIZES = [10, 100, 1_000, 10_000]
+
+rng = random.Random(1337)
+
+
+def addresses(n):
+    return ["0x" + rng.getrandbits(160).to_bytes(20, "big").hex() for _ in range(n)]
+
+
+def balance_calls(n):
+    token = addresses(1)[0]
+    return [
+        Call(
+            token,
+            [func.erc20.balanceOf, entity],
+            [["balances.want.e" + str(i), as_wei]],
+        )
+        for i, entity in enumerate(addresses(n))
+    ]
+
+
+@contextmanager
+def stand_in():
+    """
+    Point the brownie bound helpers to the local stand-ins
+    """
+    import helpers.multicall.call as call
+    import helpers.SnapshotManager as manager
+
+    w3 = FakeWeb3()
+    patched = [
+        (call, "default_web3", lambda: w3),
+        (manager, "chain", FakeChain()),
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in patched]
+    for module, name, value in patched:
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+# ===== Multicall =====
+
+
+def signature_encode(n):
+    signature = Signature(func.erc20.balanceOf)
+    args = [[address] for address in addresses(n)]
+
+    def run():
+        for arg in args:
+            signature.encode_data(arg)
+
+    return run
+
+
+def signature_decode(n):
+    signature = Signature(func.erc20.balanceOf)
+    outputs = [i.to_bytes(32, "big") for i in range(n)]
+
+    def run():
+        for output in outputs:
+            signature.decode_data(output)
+
+    return run
+
+
+def multicall_call(n):
+    multi = Multicall(balance_calls(n), FakeWeb3())
+
+    def run():
+        multi()
+
+    return run
+
+
+# ===== Snapshot =====
+
+
+class SyntheticResolver:
+    def __init__(self, token):
+        self.token = token
+        # No token decimals to read, every amount is formatted with 18
+        self.tokens = {}
+
+    def add_balances_snap(self, calls, entities):
+        for key, entity in entities.items():
+            calls.append(
+                Call(
+                    self.token,
+                    [func.erc20.balanceOf, entity],
+                    [["balances.want." + key, as_wei]],
+                )
+            )
+        return calls
+
+    def add_sett_snap(self, calls):
+        return calls
+
+    def add_strategy_snap(self, calls, entities=None):
+        return calls
+
+
+def synthetic_manager(n):
+    from helpers.SnapshotManager import SnapshotManager
+
+    return SnapshotManager.detached(
+        "Benchmark",
+        SyntheticResolver(addresses(1)[0]),
+        {"e" + str(i): a for i, a in enumerate(addresses(n))},
+        GridRenderer(),
+    )
+
+
+def snapshot_snap(n):
+    manager = synthetic_manager(n)
+
+    def run():
+        with stand_in(), redirect_stdout(io.StringIO()):
+            manager.snap()
+
+    return run
+
+
+def snapshot_print_compare(n):
+    manager = synthetic_manager(0)
+    before = Snap({"balances.want.e" + str(i): i * 10**18 for i in range(n)}, 1, [])
+    # Half of the keys change
+    after = Snap(
+        {k: v + (i % 2) * 10**15 for i, (k, v) in enumerate(before.data.items())},
+        2,
+        [],
+    )
+
+    def run():
+        with redirect_stdout(io.StringIO()):
+            manager.printCompare(before, after)
+
+    return run
+
+
+# ===== Shares math =====
+
+
+def shares_math_report_fees(n):
+    inputs = [
+        (
+            rng.randrange(1, 10**24),
+            1000,
+            0,
+            200,
+            rng.randrange(1, 86400 * 7),
+            rng.randrange(10**18, 10**27),
+            rng.randrange(10**18, 10**27),
+        )
+        for _ in range(n)
+    ]
+
+    def run():
+        for args in inputs:
+            shares_math.get_report_fees(*args)
+
+    return run
+
+
+def shares_math_withdrawal_fees(n):
+    inputs = [
+        (
+            rng.randrange(1, 10**24),
+            rng.randrange(10**18, 2 * 10**18),
+            18,
+            10,
+            rng.randrange(10**18, 10**27),
+            rng.randrange(10**18, 10**27),
+        )
+        for _ in range(n)
+    ]
+
+    def run():
+        for args in inputs:
+            shares_math.get_withdrawal_fees_in_shares(*args)
+
+    return run
+
+
+CASES = {
+    "signature.encode_data": signature_encode,
+    "signature.decode_data": signature_decode,
+    "multicall.__call__": multicall_call,
+    "snapshot.snap": snapshot_snap,
+    "snapshot.printCompare": snapshot_print_compare,
+    "shares_math.get_report_fees": shares_math_report_fees,
+    "shares_math.get_withdrawal_fees_in_shares": shares_math_withdrawal_fees,
+}
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from statistics import median
+from time import perf_counter
+
+from tabulate import tabulate
+
+from benchmarks.cases import CASES, SIZES
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pure modules, must import fast and without brownie
+IMPORTS = [
+    "helpers.shares_math",
+    "helpers.multicall.signature",
+    "helpers.snapshot.snap",
+    "helpers.multicall",
+    "helpers.utils",
+    # Loads brownie for chain, but no project: the snapshot cases run without one
+    "helpers.SnapshotManager",
+]
+
+IMPORT_PROBE = """
+import sys
+from time import perf_counter
+start = perf_counter()
+import {}
+print(perf_counter() - start, "brownie" in sys.modules)
+"""
+
+
+def measure(case, n, repeat):
+    run = case(n)
+    run()  # Warm up caches
+
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        timings.append(perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = median(timings)
+    return {
+        "ops_per_sec": n / seconds if seconds else float("inf"),
+        "peak_kib": peak / 1024,
+    }
+
+
+def measure_import(module, repeat):
+    """
+    Import time in a fresh interpreter, and whether brownie got pulled in
+    """
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_PROBE.format(module)], cwd=ROOT
+        )
+        seconds, brownie = output.decode().split()
+        timings.append(float(seconds))
+    return {"import_ms": median(timings) * 1000, "brownie": brownie == "True"}
+
+
+def compare(results, baselines, tolerance):
+    """
+    Returns the regressions: slower or allocating more than the baseline plus tolerance
+    """
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        if "import_ms" in result:
+            if result["import_ms"] > baseline["import_ms"] * (1 + tolerance) + 1:
+                regressions.append(
+                    (key, "import ms", baseline["import_ms"], result["import_ms"])
+                )
+            if result["brownie"] and not baseline["brownie"]:
+                regressions.append((key, "imports brownie", False, True))
+            continue
+        if result["ops_per_sec"] < baseline["ops_per_sec"] * (1 - tolerance):
+            regressions.append(
+                (key, "ops/s", baseline["ops_per_sec"], result["ops_per_sec"])
+            )
+        if result["peak_kib"] > baseline["peak_kib"] * (1 + tolerance) + 1:
+            regressions.append(
+                (key, "peak KiB", baseline["peak_kib"], result["peak_kib"])
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline helper benchmarks")
+    parser.add_argument("-k", default="", help="only run cases containing this")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--save", action="store_true", help="store results as baselines"
+    )
+    parser.add_argument("--compare", action="store_true", help="fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baselines", default=BASELINES)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, case in CASES.items():
+        if args.k not in name:
+            continue
+        for n in args.sizes:
+            results["{}[{}]".format(name, n)] = measure(case, n, args.repeat)
+
+    print(
+        tabulate(
+            [
+                [
+                    key,
+                    "{:,.0f}".format(r["ops_per_sec"]),
+                    "{:,.1f}".format(r["peak_kib"]),
+                ]
+                for key, r in results.items()
+            ],
+            headers=["case", "ops/s", "peak KiB"],
+            tablefmt="grid",
+        )
+    )
+
+    imports = {}
+    for module in IMPORTS:
+        if args.k in "import " + module:
+            imports["import " + module] = measure_import(module, args.repeat)
+
+    print(
+        tabulate(
+            [
+                [key, "{:,.1f}".format(r["import_ms"]), r["brownie"]]
+                for key, r in imports.items()
+            ],
+            headers=["module", "import ms", "loads brownie"],
+            tablefmt="grid",
+        )
+    )
+    results.update(imports)
+
+    if args.save:
+        baselines = {}
+        if os.path.exists(args.baselines):
+            with open(args.baselines) as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print("Baselines written to", args.baselines)
+
+    if args.compare:
+        if not os.path.exists(args.baselines):
+            print("No baselines found at", args.baselines, "- run with --save first")
+            return 1
+        with open(args.baselines) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(
+                tabulate(
+                    regressions,
+                    headers=["case", "metric", "baseline", "now"],
+                    tablefmt="grid",
+                )
+            )
+            return 1
+        print("No regressions against", args.baselines)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
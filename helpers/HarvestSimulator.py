@@ -0,0 +1,208 @@
+"""
+What harvest() would do now, without sending it
+
+harvest() is run as a call from the keeper at a pinned block, optionally with state
+overrides (token balances, raw storage) and a block time override. With trace the call
+goes through debug_traceCall (callTracer with logs), which gives the return data and the
+Harvested / TreeDistribution events of the same run. Predictions are memoized per block
+hash, so a block mined again after a revert on a dev chain is simulated again
+"""
+import json
+from collections import namedtuple
+
+from eth_utils import keccak
+from helpers.multicall.call import default_web3
+from helpers.multicall.signature import Signature
+from helpers.rpc.batch import batch_request
+from helpers.TraceVerifier import TRACER, iter_logs, topic_address
+
+HARVEST = Signature("harvest()((address,uint256)[])")
+BALANCE_OF = Signature("balanceOf(address)(uint256)")
+
+HARVESTED_TOPIC = "0x" + keccak(text="Harvested(address,uint256,uint256,uint256)").hex()
+TREE_DISTRIBUTION_TOPIC = (
+    "0x" + keccak(text="TreeDistribution(address,uint256,uint256,uint256)").hex()
+)
+
+# Storage slots probed for the balances mapping of a token
+MAX_BALANCE_SLOT = 20
+# Written while probing, unlikely to be anyone's balance
+SENTINEL = 0x5EED
+
+# token -> (mapping slot, vyper layout)
+_balanceSlots = {}
+
+Prediction = namedtuple(
+    "Prediction",
+    ["block", "timestamp", "harvested", "reported", "distributed"],
+)
+
+
+def word(value):
+    return "0x" + value.to_bytes(32, "big").hex()
+
+
+def mapping_slot(key, slot, vyper=False):
+    """
+    Storage slot of mapping[key] for a mapping at slot, solidity or vyper layout
+    """
+    key = bytes.fromhex(key[2:].lower().rjust(64, "0"))
+    slot = slot.to_bytes(32, "big")
+    return int.from_bytes(keccak(slot + key if vyper else key + slot), "big")
+
+
+def find_balance_slot(token, holder, block="latest", w3=None):
+    """
+    (mapping slot, vyper) of the token balances, found by overriding every candidate
+    slot with a sentinel in one batch and seeing which one balanceOf returns
+    """
+    token = token.lower()
+    if token in _balanceSlots:
+        return _balanceSlots[token]
+
+    candidates = [
+        (slot, vyper) for slot in range(MAX_BALANCE_SLOT) for vyper in (False, True)
+    ]
+    data = "0x" + BALANCE_OF.encode_data([holder]).hex()
+    results = batch_request(
+        [
+            (
+                "eth_call",
+                [
+                    {"to": token, "data": data},
+                    block,
+                    {
+                        token: {
+                            "stateDiff": {
+                                word(mapping_slot(holder, slot, vyper)): word(SENTINEL)
+                            }
+                        }
+                    },
+                ],
+            )
+            for slot, vyper in candidates
+        ],
+        w3,
+    )
+    for candidate, result in zip(candidates, results):
+        if result not in ("0x", None) and int(result, 16) == SENTINEL:
+            _balanceSlots[token] = candidate
+            return candidate
+    raise ValueError("Balances slot of {} not found".format(token))
+
+
+def balance_overrides(balances, block="latest", w3=None):
+    """
+    {token: {holder: amount}} -> eth_call state overrides setting those balances
+    """
+    overrides = {}
+    for token, holders in balances.items():
+        token = str(token).lower()
+        stateDiff = overrides.setdefault(token, {}).setdefault("stateDiff", {})
+        for holder, amount in holders.items():
+            holder = str(holder)
+            slot, vyper = find_balance_slot(token, holder, block, w3)
+            stateDiff[word(mapping_slot(holder, slot, vyper))] = word(amount)
+    return overrides
+
+
+def decode_events(logs, topic):
+    """
+    [(token, amount)] of the Harvested / TreeDistribution logs, token indexed
+    """
+    events = []
+    for log in logs:
+        topics = log.get("topics", [])
+        if not topics or topics[0].lower() != topic:
+            continue
+        data = bytes.fromhex(log["data"][2:])
+        events.append((topic_address(topics[1]), int.from_bytes(data[:32], "big")))
+    return events
+
+
+class HarvestSimulator:
+    def __init__(self, strategy, keeper, w3=None):
+        self.strategy = str(getattr(strategy, "address", strategy))
+        self.keeper = str(getattr(keeper, "address", keeper))
+        self.w3 = w3 or default_web3()
+        # (block hash, timestamp, overrides, trace) -> Prediction
+        self.predictions = {}
+
+    def simulate(
+        self, block=None, timestamp=None, balances=None, storage=None, trace=True
+    ):
+        """
+        Prediction of harvest() at block, a number or a tag ("latest" by default)
+            timestamp: block time the call runs at
+            balances: {token: {holder: amount}}
+            storage: {address: {slot: value}}, raw overrides on top of the balances
+        Without trace only the returned amounts are known, reported and distributed are None
+        """
+        tag = hex(block) if isinstance(block, int) else block or "latest"
+        header = batch_request([("eth_getBlockByNumber", [tag, False])], self.w3)[0]
+        if header is None:
+            raise ValueError("Block {} not found".format(block))
+        block = int(header["number"], 16)
+        # A pending block has no hash yet, it is simulated every time
+        blockHash = header["hash"]
+        if blockHash is not None:
+            tag = hex(block)
+
+        key = (
+            blockHash,
+            timestamp,
+            json.dumps([balances, storage], sort_keys=True, default=str),
+            trace,
+        )
+        if blockHash is not None and key in self.predictions:
+            return self.predictions[key]
+
+        overrides = balance_overrides(balances or {}, tag, self.w3)
+        for address, slots in (storage or {}).items():
+            stateDiff = overrides.setdefault(str(address).lower(), {}).setdefault(
+                "stateDiff", {}
+            )
+            for slot, value in slots.items():
+                stateDiff[word(int(slot))] = word(int(value))
+        blockOverrides = {"time": hex(timestamp)} if timestamp is not None else None
+
+        call = {
+            "from": self.keeper,
+            "to": self.strategy,
+            "data": "0x" + HARVEST.fourbyte.hex(),
+        }
+        if trace:
+            config = dict(TRACER)
+            if overrides:
+                config["stateOverrides"] = overrides
+            if blockOverrides:
+                config["blockOverrides"] = blockOverrides
+            frame = batch_request([("debug_traceCall", [call, tag, config])], self.w3)[
+                0
+            ]
+            if frame.get("error"):
+                raise ValueError("harvest() reverts: {}".format(frame["error"]))
+            output = frame["output"]
+            logs = list(iter_logs(frame))
+            reported = decode_events(logs, HARVESTED_TOPIC)
+            distributed = decode_events(logs, TREE_DISTRIBUTION_TOPIC)
+        else:
+            params = [call, tag]
+            if overrides or blockOverrides:
+                params.append(overrides)
+            if blockOverrides:
+                params.append(blockOverrides)
+            output = batch_request([("eth_call", params)], self.w3)[0]
+            reported = distributed = None
+
+        (harvested,) = HARVEST.decode_data(bytes.fromhex(output[2:]))
+        prediction = Prediction(
+            block,
+            timestamp,
+            [(token.lower(), amount) for token, amount in harvested],
+            reported,
+            distributed,
+        )
+        if blockHash is not None:
+            self.predictions[key] = prediction
+        return prediction
@@ -0,0 +1,218 @@
+"""
+Invariants are declared as data and compiled once per operation and snapshot layout:
+the before / after lookups in their expressions become index lookups into the snap values.
+All the invariants of one or many operations are then evaluated in a single pass, and
+every violation is reported instead of stopping at the first one.
+
+Expressions are python over:
+    before.get("sett.balance"), after.balances("want", "user"), after.shares(...)
+    params["amount"], derived["expected_want"]
+and the shares_math functions
+"""
+import ast
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from helpers import shares_math
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+Invariant = namedtuple(
+    "Invariant",
+    ["name", "actual", "op", "expected", "tolerance", "when"],
+    defaults=(None, 0, None),
+)
+
+Violation = namedtuple(
+    "Violation",
+    ["operation", "name", "actual", "op", "expected", "block", "error"],
+)
+
+
+def approx(actual, expected, tolerance):
+    """
+    helpers.utils.approx without the printing
+    """
+    diff = int(abs(actual - expected))
+    return diff == 0 or diff < (actual * tolerance // 100)
+
+
+OPS = {
+    "==": lambda a, e, t: a == e,
+    "!=": lambda a, e, t: a != e,
+    "<": lambda a, e, t: a < e,
+    "<=": lambda a, e, t: a <= e,
+    ">": lambda a, e, t: a > e,
+    ">=": lambda a, e, t: a >= e,
+    "approx": approx,
+    # actual is a boolean expression
+    "holds": lambda a, e, t: bool(a),
+}
+
+NAMESPACE = {
+    name: getattr(shares_math, name)
+    for name in dir(shares_math)
+    if not name.startswith("_")
+}
+NAMESPACE["Decimal"] = Decimal
+
+LOOKUP = re.compile(r"\b(before|after)\.(get|balances|shares)\(([^()]*)\)")
+
+
+def snap_key(getter, args):
+    if getter == "get":
+        return args[0]
+    return ".".join([getter] + list(args))
+
+
+class InvariantEngine:
+    def __init__(self, invariants, derived=None):
+        # operation -> [Invariant]
+        self.invariants = invariants
+        # operation -> [(name, expression)], evaluated in order before the invariants
+        self.derived = derived or {}
+        self.plans = {}
+
+    # ===== Compile =====
+
+    def compile(self, expression, index):
+        """
+        Expression -> function(B, A, params, derived), B and A being the snap values
+        """
+        missing = []
+
+        def lookup(match):
+            snap, getter, args = match.groups()
+            key = snap_key(getter, ast.literal_eval("(" + args + ",)"))
+            if key not in index:
+                missing.append(key)
+                return "None"
+            return "{}[{}]".format("B" if snap == "before" else "A", index[key])
+
+        source = LOOKUP.sub(lookup, expression)
+        if missing:
+            message = "Key {} not found in snap data".format(missing[0])
+
+            def fail(B, A, params, derived):
+                raise KeyError(message)
+
+            return fail
+        return eval("lambda B, A, params, derived: " + source, dict(NAMESPACE))
+
+    def plan(self, operation, keys):
+        """
+        Compiled derived values and invariants of an operation, for a snapshot layout
+        """
+        cacheKey = (operation, keys)
+        if cacheKey not in self.plans:
+            index = {key: i for i, key in enumerate(keys)}
+            compiled = lambda expression: (
+                self.compile(expression, index) if expression else None
+            )
+            self.plans[cacheKey] = (
+                [
+                    (name, compiled(expression))
+                    for name, expression in self.derived.get(operation, [])
+                ],
+                [
+                    (
+                        invariant,
+                        compiled(invariant.when),
+                        compiled(invariant.actual),
+                        compiled(invariant.expected),
+                    )
+                    for invariant in self.invariants.get(operation, [])
+                ],
+            )
+        return self.plans[cacheKey]
+
+    # ===== Evaluate =====
+
+    def evaluate(self, operation, before, after, params=None):
+        return self.evaluate_many([(operation, before, after, params)])
+
+    def evaluate_many(self, records):
+        """
+        [(operation, before, after, params)] -> every Violation, in order
+        """
+        violations = []
+        for operation, before, after, params in records:
+            keys = tuple(before.data)
+            assert keys == tuple(after.data), "Snaps of different entities"
+            violations += self.evaluate_values(
+                operation,
+                keys,
+                tuple(before.data.values()),
+                tuple(after.data.values()),
+                params,
+                after.block,
+            )
+        return violations
+
+    def evaluate_values(self, operation, keys, B, A, params, block):
+        """
+        Same as evaluate, on the snap values laid out as keys
+        """
+        derivedFns, checks = self.plan(operation, keys)
+        params = params or {}
+        violations = []
+
+        def violation(name, actual=None, op=None, expected=None, error=None):
+            violations.append(
+                Violation(operation, name, actual, op, expected, block, error)
+            )
+
+        derived = {}
+        for name, fn in derivedFns:
+            try:
+                derived[name] = fn(B, A, params, derived)
+            except Exception as e:
+                violation(name, error=repr(e))
+
+        for invariant, when, actual, expected in checks:
+            try:
+                if when and not when(B, A, params, derived):
+                    continue
+                value = actual(B, A, params, derived)
+                target = expected(B, A, params, derived) if expected else None
+                if not OPS[invariant.op](value, target, invariant.tolerance):
+                    violation(invariant.name, value, invariant.op, target)
+            except Exception as e:
+                violation(invariant.name, error=repr(e))
+
+        return violations
+
+    def check(self, operation, before, after, params=None):
+        """
+        Evaluates all the invariants of the operation, asserts none is violated
+        """
+        self.assert_none(self.evaluate(operation, before, after, params))
+
+    def assert_none(self, violations):
+        if violations:
+            self.report(violations)
+        assert not violations, "{} invariant(s) violated".format(len(violations))
+
+    def report(self, violations):
+        console.print("[red]=== Invariant violations ===[/red]")
+        print(
+            tabulate(
+                [
+                    [v.operation, v.block, v.name, v.actual, v.op, v.expected, v.error]
+                    for v in violations
+                ],
+                headers=[
+                    "operation",
+                    "block",
+                    "invariant",
+                    "actual",
+                    "op",
+                    "expected",
+                    "error",
+                ],
+                tablefmt="grid",
+            )
+        )
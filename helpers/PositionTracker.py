@@ -0,0 +1,163 @@
+from heapq import nlargest
+from operator import itemgetter
+
+from brownie import web3
+from eth_utils import keccak, to_checksum_address
+from rich.console import Console
+
+console = Console()
+
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+ZERO = bytes(20)
+
+
+class PositionTracker:
+    """
+    Replays the share Transfer logs of a vault into an address -> balance table
+    Call sync() on each new block to keep the table up to date
+    """
+
+    def __init__(self, vault, fromBlock=0, batchSize=10_000):
+        self.vault = vault
+        self.address = vault.address
+        self.batchSize = batchSize
+        self.lastBlock = fromBlock - 1
+        # Keyed by the raw 20 byte address to keep the table compact
+        self.positions = {}
+        # Starting after the vault deployment, balances from before fromBlock are read
+        # at the block ahead of it, once per holder the first time it shows in the logs
+        self.openingBlock = None
+        if fromBlock > 0 and len(web3.eth.getCode(self.address, fromBlock - 1)) > 0:
+            self.openingBlock = fromBlock - 1
+        self.opened = set()
+        self.supply = (
+            vault.totalSupply(block_identifier=self.openingBlock)
+            if self.openingBlock is not None
+            else 0
+        )
+
+    # ===== Sync =====
+
+    def sync(self, toBlock=None):
+        """
+        Fetch and apply all Transfer logs from the last synced block up to toBlock
+        """
+        if toBlock is None:
+            toBlock = web3.eth.blockNumber
+
+        start = self.lastBlock + 1
+        batchSize = self.batchSize
+        while start <= toBlock:
+            end = min(start + batchSize - 1, toBlock)
+            try:
+                logs = web3.eth.getLogs(
+                    {
+                        "address": self.address,
+                        "fromBlock": start,
+                        "toBlock": end,
+                        "topics": [TRANSFER_TOPIC],
+                    }
+                )
+            except ValueError:
+                # Provider refused the range (too many results), retry smaller
+                if batchSize == 1:
+                    raise
+                batchSize = max(batchSize // 2, 1)
+                continue
+
+            for log in logs:
+                self.apply(log)
+
+            self.lastBlock = end
+            start = end + 1
+            # Grow back towards the configured range after a smaller one went through
+            batchSize = min(batchSize * 2, self.batchSize)
+
+        return self.lastBlock
+
+    def apply(self, log):
+        topics = log["topics"]
+        sender = bytes(topics[1])[-20:]
+        receiver = bytes(topics[2])[-20:]
+        data = log["data"]
+        value = int(data, 16) if isinstance(data, str) else int.from_bytes(data, "big")
+
+        positions = self.positions
+        if sender == ZERO:
+            self.supply += value
+        else:
+            balance = self.position(sender) - value
+            if balance:
+                positions[sender] = balance
+            else:
+                positions.pop(sender, None)
+
+        if receiver == ZERO:
+            self.supply -= value
+        else:
+            balance = self.position(receiver) + value
+            if balance:
+                positions[receiver] = balance
+
+    def position(self, holder):
+        """
+        Balance of holder before the log being applied, its opening balance if first seen
+        """
+        if holder in self.positions:
+            return self.positions[holder]
+        if self.openingBlock is None or holder in self.opened:
+            return 0
+
+        self.opened.add(holder)
+        return self.vault.balanceOf(
+            to_checksum_address(holder), block_identifier=self.openingBlock
+        )
+
+    # ===== Getters =====
+
+    def balanceOf(self, user):
+        return self.positions.get(bytes.fromhex(str(user)[2:]), 0)
+
+    def holders(self):
+        return len(self.positions)
+
+    def topHolders(self, n=10):
+        return [
+            (to_checksum_address(holder), balance)
+            for holder, balance in nlargest(
+                n, self.positions.items(), key=itemgetter(1)
+            )
+        ]
+
+    def totalSupply(self):
+        return self.supply
+
+    def check_total_supply(self):
+        """
+        Checks that the replayed supply matches the sum of positions and the vault
+        totalSupply() at the last synced block
+        Started after the deployment, holders that never moved aren't in the table and
+        only the replayed supply is checked
+        """
+        tracked = sum(self.positions.values())
+        onchain = self.vault.totalSupply(block_identifier=self.lastBlock)
+        if self.openingBlock is not None:
+            tracked = self.supply
+
+        if tracked == self.supply == onchain:
+            console.print(
+                "[green]Positions match totalSupply at block[/green]", self.lastBlock
+            )
+            return True
+
+        console.print(
+            "[red]Positions don't match totalSupply at block[/red]",
+            self.lastBlock,
+            "- tracked:",
+            tracked,
+            "replayed:",
+            self.supply,
+            "onchain:",
+            onchain,
+        )
+        return False
@@ -0,0 +1,99 @@
+from collections import OrderedDict, defaultdict
+from itertools import product
+
+# First field present is used, covers the OZ, WETH and custom event argument names
+FROM_FIELDS = ("from", "src", "sender", "_from")
+TO_FIELDS = ("to", "dst", "recipient", "_to")
+AMOUNT_FIELDS = ("value", "amount", "wad", "_value")
+
+# Indexes of the latest receipts, see ReceiptIndex.of
+CACHE_SIZE = 64
+_cache = OrderedDict()
+
+
+def normalize(address):
+    return str(address).lower() if address is not None else None
+
+
+def first_field(event, fields):
+    for field in fields:
+        if field in event:
+            return event[field]
+    return None
+
+
+class ReceiptIndex:
+    """
+    The events of a receipt hashed by (event name, token, from, to), amounts summed per key
+    token is the event "token" argument if any, else the emitting contract
+    Any of token, from and to can be left out (None) to match all, lookups are O(1)
+    """
+
+    def __init__(self, tx):
+        self.tx = tx
+        self.amounts = defaultdict(int)
+        self.counts = defaultdict(int)
+        self.byKey = defaultdict(list)
+
+        for event in tx.events:
+            token = event["token"] if "token" in event else event.address
+            key = (
+                normalize(token),
+                normalize(first_field(event, FROM_FIELDS)),
+                normalize(first_field(event, TO_FIELDS)),
+            )
+            amount = first_field(event, AMOUNT_FIELDS)
+            # Indexed under every wildcard combination of (token, from, to), once
+            # per distinct key as missing fields already are wildcards
+            masks = {
+                (event.name,)
+                + tuple(value if keep else None for value, keep in zip(key, mask))
+                for mask in product((True, False), repeat=3)
+            }
+            for masked in masks:
+                self.counts[masked] += 1
+                self.byKey[masked].append(event)
+                if isinstance(amount, int):
+                    self.amounts[masked] += amount
+
+    @classmethod
+    def of(cls, tx):
+        """
+        The index of a receipt, built once and reused by every resolver check
+        """
+        cached = _cache.get(id(tx))
+        if cached is not None and cached.tx is tx:
+            _cache.move_to_end(id(tx))
+            return cached
+
+        index = cls(tx)
+        _cache[id(tx)] = index
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+        return index
+
+    # ===== Lookups =====
+
+    def key(self, name, token, src, dst):
+        return (name, normalize(token), normalize(src), normalize(dst))
+
+    def amount(self, name, token=None, src=None, dst=None):
+        """
+        Sum of the amounts of the matching events, 0 if none
+        """
+        return self.amounts.get(self.key(name, token, src, dst), 0)
+
+    def count(self, name, token=None, src=None, dst=None):
+        return self.counts.get(self.key(name, token, src, dst), 0)
+
+    def events(self, name, token=None, src=None, dst=None):
+        """
+        The matching events, in emission order
+        """
+        return self.byKey.get(self.key(name, token, src, dst), [])
+
+    def transferred(self, token, src=None, dst=None):
+        """
+        Amount of token transferred from src to dst in the receipt
+        """
+        return self.amount("Transfer", token, src, dst)
@@ -0,0 +1,247 @@
+import json
+import os
+
+from eth_utils import to_checksum_address
+from helpers.constants import AddressZero
+from helpers.multicall import Call, Multicall
+from helpers.multicall.call import default_web3
+from rich.console import Console
+
+console = Console()
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "registry"
+)
+
+# Keys read by the production scripts
+KEYS = [
+    "governance",
+    "guardian",
+    "keeper",
+    "controller",
+    "badgerTree",
+    "devGovernance",
+    "paymentsGovernance",
+    "governanceTimelock",
+    "proxyAdminTimelock",
+    "proxyAdminDev",
+    "rewardsLogger",
+    "keeperAccessControl",
+    "proxyAdminDfdBadger",
+    "dfdBadgerSharedGovernance",
+    "BadgerRewardsManager",
+]
+
+VERSIONS = ["v1", "v2"]
+VAULT_STATUS = [0, 1, 2]
+
+# Cached snapshots older than this many blocks are fetched again, REGISTRY_MAX_AGE overrides
+MAX_AGE = 50_000
+
+
+def cache_path(address, chainId):
+    return os.path.join(CACHE_DIR, "{}-{}.json".format(chainId, address.lower()))
+
+
+class RegistrySnapshot:
+    """
+    All the BadgerRegistry keys and vault listings read at a single block.
+    Serves get, getVaults and getFilteredProductionVaults like the registry does
+    """
+
+    def __init__(self, address, chainId, block, addresses, vaults, production):
+        self.address = address
+        self.chainId = chainId
+        self.block = block
+        # Only the reads that succeeded, see save for what is cached
+        # key -> address
+        self.addresses = addresses
+        # author -> version -> [vault]
+        self.vaults = vaults
+        # version -> status -> [vault]
+        self.production = production
+
+    # ===== Registry =====
+
+    def get(self, key):
+        return self.addresses.get(key, AddressZero)
+
+    def getVaults(self, version, author):
+        return self.vaults.get(author.lower(), {}).get(version, [])
+
+    def getFilteredProductionVaults(self, version, status):
+        return self.production.get(version, {}).get(str(status), [])
+
+    def allVaults(self):
+        """
+        Every vault listed by an author or as production, without duplicates
+        """
+        vaults = []
+        for listings in list(self.vaults.values()) + list(self.production.values()):
+            for listed in listings.values():
+                vaults += listed
+        return list(dict.fromkeys(vaults))
+
+    def covers(self, keys, authors):
+        return (
+            set(keys) <= set(self.addresses)
+            and all(
+                set(VERSIONS) <= set(self.vaults.get(author.lower(), {}))
+                for author in authors
+            )
+            and all(
+                {str(status) for status in VAULT_STATUS}
+                <= set(self.production.get(version, {}))
+                for version in VERSIONS
+            )
+        )
+
+    # ===== Fetch / Cache =====
+
+    @classmethod
+    def load(cls, address, keys=KEYS, authors=(), refresh=False, w3=None):
+        """
+        Registry snapshot from the disk cache, fetched (and cached) if there is none,
+        it misses some of the keys or authors, is older than MAX_AGE blocks or refresh
+        is set. REGISTRY_REFRESH=1 forces a refresh from the command line
+        """
+        w3 = w3 or default_web3()
+        path = cache_path(address, w3.eth.chainId)
+        refresh = refresh or os.environ.get("REGISTRY_REFRESH")
+        maxAge = int(os.environ.get("REGISTRY_MAX_AGE", MAX_AGE))
+
+        cached = None
+        if os.path.exists(path):
+            cached = cls.from_file(path)
+            # Either way, e.g. a fork pinned before the block it was taken at
+            age = abs(w3.eth.blockNumber - cached.block)
+            if age > maxAge:
+                console.print(
+                    "[yellow]Registry snapshot is[/yellow]",
+                    age,
+                    "[yellow]blocks away from the head, fetching it again[/yellow]",
+                )
+                refresh = True
+            if not refresh and cached.covers(keys, authors):
+                return cached
+
+        if cached:
+            # Keep what other scripts asked for in the same cache
+            keys = list(dict.fromkeys(list(cached.addresses) + list(keys)))
+            authors = list(dict.fromkeys(list(cached.vaults) + list(authors)))
+
+        snapshot = cls.fetch(address, keys, authors, w3=w3)
+        snapshot.save(path)
+        return snapshot
+
+    @classmethod
+    def fetch(cls, address, keys=KEYS, authors=(), block=None, w3=None):
+        """
+        Reads everything in one multicall pinned to block (latest by default)
+        """
+        w3 = w3 or default_web3()
+        block = w3.eth.blockNumber if block is None else block
+        authors = [author.lower() for author in authors]
+
+        calls = [
+            Call(address, ["get(string)(address)", key], [[("get", key), None]])
+            for key in keys
+        ]
+        for version in VERSIONS:
+            for author in authors:
+                calls.append(
+                    Call(
+                        address,
+                        ["getVaults(string,address)(address[])", version, author],
+                        [[("vaults", author, version), None]],
+                    )
+                )
+            for status in VAULT_STATUS:
+                calls.append(
+                    Call(
+                        address,
+                        [
+                            "getFilteredProductionVaults(string,uint8)(address[])",
+                            version,
+                            status,
+                        ],
+                        [[("production", version, str(status)), None]],
+                    )
+                )
+
+        data = Multicall(calls, w3, require_success=False, block_identifier=block)()
+
+        # Failed reads are left out, they read as unset and are fetched again next time
+        addresses = {
+            key: to_checksum_address(data[("get", key)])
+            for key in keys
+            if ("get", key) in data
+        }
+        vaults = {
+            author: {
+                version: [
+                    to_checksum_address(vault)
+                    for vault in data[("vaults", author, version)]
+                ]
+                for version in VERSIONS
+                if ("vaults", author, version) in data
+            }
+            for author in authors
+        }
+        production = {
+            version: {
+                str(status): [
+                    to_checksum_address(vault)
+                    for vault in data[("production", version, str(status))]
+                ]
+                for status in VAULT_STATUS
+                if ("production", version, str(status)) in data
+            }
+            for version in VERSIONS
+        }
+
+        console.print("[blue]Registry snapshot taken at block[/blue]", block)
+        return cls(address, w3.eth.chainId, block, addresses, vaults, production)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(
+            data["address"],
+            data["chainId"],
+            data["block"],
+            data["addresses"],
+            data["vaults"],
+            data["production"],
+        )
+
+    def save(self, path):
+        """
+        Unset keys and authors without any vault aren't cached, they may just not be
+        registered yet, so they are read again until they are
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        addresses = {
+            key: address
+            for key, address in self.addresses.items()
+            if address != AddressZero
+        }
+        vaults = {
+            author: listings
+            for author, listings in self.vaults.items()
+            if any(listings.values())
+        }
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "address": self.address,
+                    "chainId": self.chainId,
+                    "block": self.block,
+                    "addresses": addresses,
+                    "vaults": vaults,
+                    "production": self.production,
+                },
+                f,
+                indent=2,
+            )
@@ -1,26 +1,36 @@
-from brownie import *
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from types import MappingProxyType
+
+from brownie import chain
 from tabulate import tabulate
 from rich.console import Console
 from helpers.multicall import Multicall
-from helpers.utils import val
+from helpers.fixed_point import format_column, format_fixed, token_decimals
 
 from helpers.snapshot.snap import Snap
-
-from _setup.StrategyResolver import StrategyResolver
+from helpers.snapshot.deferred import DeferredLog
+from helpers.snapshot.render import get_renderer
+from helpers.InvariantEngine import Violation
 
 console = Console()
 
+# Compiled snap plans kept, one per set of tracked users
+MAX_PLANS = 64
+
 
 class SnapshotManager:
-    def __init__(self, sett, strategy, key):
-        self.key = key
+    def __init__(self, sett, strategy, key, traceHarvest=False, renderer=None):
+        # Only in brownie's namespace once a project is loaded, unlike chain
+        from brownie import interface
+
+        self.init_state(key, traceHarvest, renderer)
         self.sett = sett
         self.strategy = strategy
         self.want = interface.IERC20Detailed(self.sett.token())
         self.resolver = self.init_resolver(self.strategy.getName())
-        self.snaps = {}
-        self.settSnaps = {}
-        self.entities = {}
 
         assert self.want == self.strategy.want()
 
@@ -35,6 +45,42 @@ class SnapshotManager:
         for key, dest in destinations.items():
             self.addEntity(key, dest)
 
+    @classmethod
+    def detached(cls, key, resolver, entities, renderer=None):
+        """
+        A manager over the given resolver and entities, with no sett or strategy behind it
+        Snaps and their printing work, e.g. for benchmarks against a stand-in chain
+        """
+        manager = cls.__new__(cls)
+        manager.init_state(key, renderer=renderer)
+        manager.resolver = resolver
+        for entityKey, entity in entities.items():
+            manager.addEntity(entityKey, entity)
+        return manager
+
+    def init_state(self, key, traceHarvest=False, renderer=None):
+        self.key = key
+        self.snaps = {}
+        self.settSnaps = {}
+        # Base entities, tracked users are only added to the scope of their snap
+        self.entities = {}
+        # Tracked users -> (entities, Multicall), shared by the threads using the manager
+        self.plans = OrderedDict()
+        self.lock = threading.RLock()
+
+        # Deferred mode: confirmations are logged and verified in bulk by verifyDeferred
+        self.deferred = False
+        self.deferredLog = DeferredLog()
+
+        # Also verify harvests from their call trace, needs a node with debug_traceTransaction
+        self.traceHarvest = traceHarvest
+
+        # Where printTable / printCompare go, see helpers/snapshot/render.py
+        self.renderer = renderer or get_renderer(
+            os.environ.get("SNAPSHOT_RENDERER", "grid"),
+            os.environ.get("SNAPSHOT_OUTPUT"),
+        )
+
     def add_snap_calls(self, entities):
         calls = []
         calls = self.resolver.add_balances_snap(calls, entities)
@@ -46,30 +92,49 @@ class SnapshotManager:
     def snap(self, trackedUsers=None):
         print("snap")
         snapBlock = chain.height
-        entities = self.entities
-
-        if trackedUsers:
-            for key, user in trackedUsers.items():
-                entities[key] = user
-
-        calls = self.add_snap_calls(entities)
-        multi = Multicall(calls)
-        # multi.printCalls()
-
-        data = multi()
-        self.snaps[snapBlock] = Snap(
-            data,
-            snapBlock,
-            [x[0] for x in entities.items()],
-        )
-
-        return self.snaps[snapBlock]
+        entities, multi = self.plan(trackedUsers)
+
+        # multi() is the network round trip, it runs outside the lock
+        snap = Snap(multi(), snapBlock, list(entities))
+        with self.lock:
+            self.snaps[snapBlock] = snap
+        return snap
+
+    def scope(self, trackedUsers=None):
+        """
+        Read only view of the base entities with the tracked users on top
+        """
+        entities = dict(self.entities)
+        entities.update(trackedUsers or {})
+        return MappingProxyType(entities)
+
+    def plan(self, trackedUsers=None):
+        """
+        (entities, Multicall) of a snap, compiled once per set of tracked users
+        """
+        key = tuple(sorted((k, str(v)) for k, v in (trackedUsers or {}).items()))
+        with self.lock:
+            if key in self.plans:
+                self.plans.move_to_end(key)
+                return self.plans[key]
+
+            entities = self.scope(trackedUsers)
+            plan = (entities, Multicall(self.add_snap_calls(entities)))
+            self.plans[key] = plan
+            if len(self.plans) > MAX_PLANS:
+                self.plans.popitem(last=False)
+            return plan
 
     def addEntity(self, key, entity):
-        self.entities[key] = entity
+        with self.lock:
+            self.entities[key] = entity
+            # Every plan has the base entities compiled in
+            self.plans.clear()
 
     def init_resolver(self, name):
         print("init_resolver", name)
+        from _setup.StrategyResolver import StrategyResolver
+
         return StrategyResolver(self)
 
     def settTend(self, overrides, confirm=True):
@@ -78,7 +143,7 @@ class SnapshotManager:
         before = self.snap(trackedUsers)
         tx = self.strategy.tend(overrides)
         after = self.snap(trackedUsers)
-        if confirm:
+        if confirm and not self.defer("tend", before, after, {}, tx):
             self.resolver.confirm_tend(before, after, tx)
 
     def settHarvest(self, overrides, confirm=True):
@@ -87,41 +152,40 @@ class SnapshotManager:
         before = self.snap(trackedUsers)
         tx = self.strategy.harvest(overrides)
         after = self.snap(trackedUsers)
-        if confirm:
+        if confirm and not self.defer("harvest", before, after, {}, tx):
             self.resolver.confirm_harvest(before, after, tx)
 
     def settDeposit(self, amount, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
         before = self.snap(trackedUsers)
-        self.sett.deposit(amount, overrides)
+        tx = self.sett.deposit(amount, overrides)
         after = self.snap(trackedUsers)
 
-        if confirm:
-            self.resolver.confirm_deposit(
-                before, after, {"user": user, "amount": amount}
-            )
+        params = {"user": user, "amount": amount}
+        if confirm and not self.defer("deposit", before, after, params, tx):
+            self.resolver.confirm_deposit(before, after, params)
 
     def settDepositAll(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
         userBalance = self.want.balanceOf(user)
         before = self.snap(trackedUsers)
-        self.sett.depositAll(overrides)
+        tx = self.sett.depositAll(overrides)
         after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_deposit(
-                before, after, {"user": user, "amount": userBalance}
-            )
+        params = {"user": user, "amount": userBalance}
+        if confirm and not self.defer("deposit", before, after, params, tx):
+            self.resolver.confirm_deposit(before, after, params)
 
     def settEarn(self, overrides, confirm=True):
         user = overrides["from"].address
         trackedUsers = {"user": user}
         before = self.snap(trackedUsers)
-        self.sett.earn(overrides)
+        tx = self.sett.earn(overrides)
         after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_earn(before, after, {"user": user})
+        params = {"user": user}
+        if confirm and not self.defer("earn", before, after, params, tx):
+            self.resolver.confirm_earn(before, after, params)
 
     def settWithdraw(self, amount, overrides, confirm=True):
         user = overrides["from"].address
@@ -129,10 +193,9 @@ class SnapshotManager:
         before = self.snap(trackedUsers)
         tx = self.sett.withdraw(amount, overrides)
         after = self.snap(trackedUsers)
-        if confirm:
-            self.resolver.confirm_withdraw(
-                before, after, {"user": user, "amount": amount}, tx
-            )
+        params = {"user": user, "amount": amount}
+        if confirm and not self.defer("withdraw", before, after, params, tx):
+            self.resolver.confirm_withdraw(before, after, params, tx)
 
     def settWithdrawAll(self, overrides, confirm=True):
         user = overrides["from"].address
@@ -142,26 +205,92 @@ class SnapshotManager:
         tx = self.sett.withdraw(userBalance, overrides)
         after = self.snap(trackedUsers)
 
-        if confirm:
-            self.resolver.confirm_withdraw(
-                before, after, {"user": user, "amount": userBalance}, tx
+        params = {"user": user, "amount": userBalance}
+        if confirm and not self.defer("withdraw", before, after, params, tx):
+            self.resolver.confirm_withdraw(before, after, params, tx)
+
+    # ===== Deferred verification =====
+
+    def defer(self, operation, before, after, params, tx=None):
+        """
+        Logs the confirmation instead of running it when in deferred mode
+        """
+        if self.deferred:
+            self.deferredLog.append(operation, before, after, params, tx)
+        return self.deferred
+
+    @contextmanager
+    def deferredVerification(self, processes=None):
+        """
+        Runs the txs in the block at raw speed, verifies all of them at the end
+
+        with snap.deferredVerification():
+            snap.settDeposit(amount, {"from": user})
+            ...
+        """
+        self.deferred = True
+        try:
+            yield self.deferredLog
+            self.deferred = False
+            self.verifyDeferred(processes)
+        finally:
+            # Nothing logged carries over, whether the block or the verification failed
+            self.deferred = False
+            self.deferredLog.clear()
+
+    def verifyDeferred(self, processes=None):
+        """
+        Verifies all the logged confirmations and reports every violation.
+        The invariants can be evaluated in a process pool, the checks that
+        need the receipt or the chain run here
+        """
+        log = self.deferredLog
+        console.print("[blue]=== Verifying {} operations ===[/blue]".format(len(log)))
+
+        try:
+            violations = log.evaluate(
+                self.resolver.INVARIANTS, self.resolver.DERIVED, processes
             )
+            for operation, before, after, params, tx in log:
+                try:
+                    self.resolver.confirm_chain(operation, before, after, params, tx)
+                except AssertionError as e:
+                    violations.append(
+                        Violation(
+                            operation,
+                            "chain checks",
+                            None,
+                            None,
+                            None,
+                            after.block,
+                            repr(e),
+                        )
+                    )
+        finally:
+            log.clear()
+
+        self.resolver.engine.assert_none(violations)
 
     def format(self, key, value):
         if type(value) is int:
-            if "stakingRewards.staked" or "stakingRewards.earned" in key:
-                return val(value)
-            # Ether-scaled balances
-            # TODO: Handle based on token decimals
-            if (
-                "balance" in key
-                or key == "sett.available"
-                or key == "sett.getPricePerFullShare"
-                or key == "sett.totalSupply"
-            ):
-                return val(value)
+            return format_fixed(value, self.decimals(key))
         return value
 
+    def formatColumn(self, key, values):
+        """
+        format over many values of the same key at once
+        """
+        return format_column(values, self.decimals(key))
+
+    def decimals(self, key):
+        """
+        Decimals of the token of a balances.<token>.<entity> key, 18 for the others
+        """
+        parts = key.split(".")
+        if parts[0] == "balances" and parts[1] in self.resolver.tokens:
+            return token_decimals(self.resolver.tokens[parts[1]])
+        return 18
+
     def diff(self, a, b):
         if type(a) is int and type(b) is int:
             return b - a
@@ -170,34 +299,20 @@ class SnapshotManager:
 
     def printCompare(self, before: Snap, after: Snap):
         # self.printPermissions()
-        table = []
-        console.print(
-            "[green]=== Compare: {} Sett {} -> {} ===[/green]".format(
-                self.key, before.block, after.block
-            )
+        self.renderer.compare(
+            "Compare: {} Sett".format(self.key),
+            before.block,
+            after.block,
+            self.compareRows(before, after),
+            self.format,
         )
 
-        for key, item in before.data.items():
-
-            a = item
+    def compareRows(self, before: Snap, after: Snap):
+        for key, a in before.data.items():
             b = after.get(key)
-
             # Don't add items that don't change
             if a != b:
-                table.append(
-                    [
-                        key,
-                        self.format(key, a),
-                        self.format(key, b),
-                        self.format(key, self.diff(a, b)),
-                    ]
-                )
-
-        print(
-            tabulate(
-                table, headers=["metric", "before", "after", "diff"], tablefmt="grid"
-            )
-        )
+                yield key, a, b
 
     def printPermissions(self):
         # Accounts
@@ -231,14 +346,16 @@ class SnapshotManager:
 
     def printTable(self, snap: Snap):
         # Numerical Data
-        table = []
-        console.print("[green]=== Status Report: {} Sett ===[green]".format(self.key))
+        self.renderer.table(
+            "Status Report: {} Sett".format(self.key),
+            snap.block,
+            self.tableRows(snap),
+            self.format,
+        )
 
+    def tableRows(self, snap: Snap):
         for key, item in snap.data.items():
             # Don't display 0 balances:
             if "balances" in key and item == 0:
                 continue
-            table.append([key, self.format(key, item)])
-
-        table.append(["---------------", "--------------------"])
-        print(tabulate(table, headers=["metric", "value"]))
+            yield key, item
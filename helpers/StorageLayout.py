@@ -0,0 +1,318 @@
+"""
+Storage of a contract read slot by slot from its compiled storage layout
+
+The layout comes from solc (storageLayout output) through brownie's compiler and is
+cached by bytecode under .cache/layouts. Every variable is enumerated down to its
+words: value types, structs and static arrays in place, mappings for the given keys,
+dynamic arrays and long bytes / strings from their length. The EIP-1967 proxy slots
+are read as well. All of it is fetched with batched eth_getStorageAt, one batch for
+the fixed slots and one for the dynamic data, which is what an upgrade check diffs
+"""
+import json
+import os
+import re
+from collections import namedtuple
+
+from eth_utils import keccak
+from helpers.rpc.batch import address_from_slot, get_storage_at
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "layouts"
+)
+
+# EIP-1967 proxy slots, keccak("eip1967.proxy.*") - 1
+PROXY_SLOTS = {
+    "<implementation>": int(
+        0x360894A13BA1A3210667C828492DB98DCA3E2076CC3735A920A3CA505D382BBC
+    ),
+    "<admin>": int(0xB53127684A568B3173AE13B9F8A6016E243E63B6E8EE1178D6A717850B5D6103),
+}
+
+# Elements read per dynamic array at most
+MAX_ARRAY = 256
+
+STATIC_LENGTH = re.compile(r"\)(\d+)_storage$")
+ADDRESS_TYPE = {"encoding": "inplace", "label": "address", "numberOfBytes": "20"}
+
+# A value (or length word) to read: size in bytes, offset in the slot
+Variable = namedtuple("Variable", ["label", "slot", "offset", "size", "type"])
+Change = namedtuple("Change", ["label", "slot", "offset", "before", "after"])
+
+
+def hash_slot(data):
+    return int.from_bytes(keccak(data), "big")
+
+
+def pad(key):
+    """
+    A mapping key as its 32 bytes word
+    """
+    if isinstance(key, str) and key.startswith("0x"):
+        return bytes.fromhex(key[2:].rjust(64, "0"))
+    if isinstance(key, bytes):
+        return key.rjust(32, b"\0")
+    return (int(key) % 2**256).to_bytes(32, "big")
+
+
+def words(size):
+    return -(-int(size) // 32)
+
+
+def decode(word, variable, typeInfo):
+    value = (word >> (variable.offset * 8)) & ((1 << (variable.size * 8)) - 1)
+    if typeInfo.get("encoding", "inplace") != "inplace":
+        # Length word of a dynamic array, bytes or string
+        return value
+    label = typeInfo.get("label", "")
+    if label.startswith("address") or label.startswith("contract"):
+        return address_from_slot(value)
+    if label == "bool":
+        return bool(value)
+    if label.startswith("int"):
+        bits = variable.size * 8
+        return value - (1 << bits) if value >> (bits - 1) else value
+    return value
+
+
+class StorageLayout:
+    def __init__(self, storage, types):
+        # [{label, slot, offset, type}] and typeId -> {encoding, numberOfBytes, ...}
+        self.storage = storage
+        self.types = dict(types or {})
+        self.types.setdefault("t_address", ADDRESS_TYPE)
+
+    @classmethod
+    def compile(cls, container):
+        """
+        The storage layout of a brownie ContractContainer, compiled with storageLayout
+        added to the output selection and cached by bytecode
+        """
+        build = container._build
+        path = os.path.join(
+            CACHE_DIR, "{}-{}.json".format(build["contractName"], build["bytecodeSha1"])
+        )
+        if os.path.exists(path):
+            with open(path) as f:
+                layout = json.load(f)
+        else:
+            layout = compile_storage_layout(build["contractName"], build["sourcePath"])
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(layout, f)
+        return cls(layout["storage"], layout["types"])
+
+    # ===== Enumerate =====
+
+    def variables(self, keys=None):
+        """
+        [Variable] of the fixed slots, down to every word
+        keys: label -> [mapping keys] to follow, e.g. {"balances": [user, vault]}
+        """
+        keys = keys or {}
+        variables = [
+            Variable(label, slot, 0, 32, "t_address")
+            for label, slot in PROXY_SLOTS.items()
+        ]
+        for item in self.storage:
+            variables += self.expand(
+                item["label"],
+                int(item["slot"]),
+                int(item["offset"]),
+                item["type"],
+                keys.get(item["label"], []),
+            )
+        return variables
+
+    def expand(self, label, slot, offset, typeId, keys=()):
+        info = self.types[typeId]
+        encoding = info.get("encoding", "inplace")
+        size = int(info["numberOfBytes"])
+
+        if encoding == "mapping":
+            variables = []
+            for key in keys:
+                variables += self.expand(
+                    "{}[{}]".format(label, key),
+                    hash_slot(pad(key) + slot.to_bytes(32, "big")),
+                    0,
+                    info["value"],
+                )
+            return variables
+
+        if encoding in ("dynamic_array", "bytes"):
+            # The length word, the data is read once it is known (see dynamic)
+            return [Variable(label, slot, 0, 32, typeId)]
+
+        if "members" in info:
+            variables = []
+            for member in info["members"]:
+                variables += self.expand(
+                    "{}.{}".format(label, member["label"]),
+                    slot + int(member["slot"]),
+                    int(member["offset"]),
+                    member["type"],
+                )
+            return variables
+
+        if "base" in info:
+            length = int(STATIC_LENGTH.search(typeId).group(1))
+            return self.elements(label, slot, info["base"], length)
+
+        if size > 32:
+            return [
+                Variable("{}#{}".format(label, i), slot + i, 0, 32, typeId)
+                for i in range(words(size))
+            ]
+        return [Variable(label, slot, offset, size, typeId)]
+
+    def elements(self, label, slot, baseId, length):
+        base = self.types[baseId]
+        baseSize = int(base["numberOfBytes"])
+        variables = []
+        for i in range(length):
+            if baseSize < 32 and "members" not in base:
+                perSlot = 32 // baseSize
+                elementSlot, elementOffset = (
+                    slot + i // perSlot,
+                    (i % perSlot) * baseSize,
+                )
+            else:
+                elementSlot, elementOffset = slot + i * words(baseSize), 0
+            variables += self.expand(
+                "{}[{}]".format(label, i), elementSlot, elementOffset, baseId
+            )
+        return variables
+
+    def dynamic(self, variable, lengthWord):
+        """
+        [Variable] of the data of a dynamic array or long bytes / string
+        """
+        info = self.types[variable.type]
+        data = hash_slot(variable.slot.to_bytes(32, "big"))
+        if info["encoding"] == "bytes":
+            # Short values (lowest bit unset) are in the length word itself
+            if lengthWord & 1 == 0:
+                return []
+            length = (lengthWord - 1) // 2
+            return [
+                Variable(
+                    "{}#{}".format(variable.label, i), data + i, 0, 32, "t_bytes32"
+                )
+                for i in range(words(length))
+            ]
+        return self.elements(
+            variable.label, data, info["base"], min(lengthWord, MAX_ARRAY)
+        )
+
+    # ===== Read =====
+
+    def read(self, address, keys=None, block="latest", w3=None):
+        """
+        (slot, offset) -> (label, value) of the whole storage of address, in two
+        eth_getStorageAt batches. Labels aren't unique, e.g. the __gap of every base
+        """
+        address = str(address)
+        variables = self.variables(keys)
+        values = self.read_variables(address, variables, block, w3)
+
+        dynamicVariables = []
+        for variable in variables:
+            if self.types.get(variable.type, {}).get("encoding") in (
+                "dynamic_array",
+                "bytes",
+            ):
+                lengthWord = values[(variable.slot, variable.offset)][1]
+                dynamicVariables += self.dynamic(variable, lengthWord)
+        if dynamicVariables:
+            values.update(self.read_variables(address, dynamicVariables, block, w3))
+        return values
+
+    def read_variables(self, address, variables, block, w3):
+        """
+        (slot, offset) -> (label, value), every slot fetched once
+        """
+        slots = sorted({variable.slot for variable in variables})
+        fetched = dict(
+            zip(slots, get_storage_at([(address, slot) for slot in slots], block, w3))
+        )
+        return {
+            (variable.slot, variable.offset): (
+                variable.label,
+                decode(
+                    fetched[variable.slot], variable, self.types.get(variable.type, {})
+                ),
+            )
+            for variable in variables
+        }
+
+
+def compile_storage_layout(name, sourcePath):
+    """
+    {storage, types} of a project contract, from solc with storageLayout selected
+    """
+    from brownie.project import compiler, get_loaded_projects
+
+    project = get_loaded_projects()[0]
+    config = project._compiler_config["solc"]
+    compiler.solidity.set_solc_version(config["version"])
+
+    with open(project._path.joinpath(sourcePath)) as f:
+        sources = {sourcePath: f.read()}
+    inputJson = compiler.generate_input_json(
+        sources, optimize=False, remappings=config.get("remappings", [])
+    )
+    # Only the layout is needed, skips bytecode generation
+    inputJson["settings"]["outputSelection"] = {"*": {"*": ["storageLayout"]}}
+
+    cwd = os.getcwd()
+    os.chdir(project._path)
+    try:
+        output = compiler.compile_from_input_json(
+            inputJson, silent=True, allow_paths=project._path.as_posix()
+        )
+    finally:
+        os.chdir(cwd)
+    return output["contracts"][sourcePath][name]["storageLayout"]
+
+
+def value_of(values, label):
+    """
+    The value of the one variable called label in a StorageLayout.read
+    """
+    found = [value for name, value in values.values() if name == label]
+    if len(found) != 1:
+        raise KeyError("{} variables labelled {}".format(len(found), label))
+    return found[0]
+
+
+def diff(before, after):
+    """
+    [Change] of the values that differ between two StorageLayout.read, including
+    the variables only one of them has
+    """
+    changes = []
+    for key in list(after) + [key for key in before if key not in after]:
+        beforeLabel, beforeValue = before.get(key, (None, None))
+        afterLabel, afterValue = after.get(key, (None, None))
+        if beforeValue != afterValue or beforeLabel != afterLabel:
+            changes.append(
+                Change(afterLabel or beforeLabel, *key, beforeValue, afterValue)
+            )
+    return changes
+
+
+def print_diff(changes):
+    if not changes:
+        console.print("[green]No storage changes[/green]")
+        return
+    print(
+        tabulate(
+            [[c.label, hex(c.slot), c.offset, c.before, c.after] for c in changes],
+            headers=["variable", "slot", "offset", "before", "after"],
+            tablefmt="grid",
+        )
+    )
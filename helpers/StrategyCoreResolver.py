@@ -1,16 +1,6 @@
-from brownie import *
-from decimal import Decimal
-from helpers.shares_math import (
-    get_withdrawal_fees_in_shares,
-    get_withdrawal_fees_in_want,
-    from_shares_to_want,
-    get_report_fees,
-)
-
-from helpers.utils import (
-    approx,
-)
 from helpers.constants import *
+from helpers.InvariantEngine import InvariantEngine, Invariant
+from helpers.TraceVerifier import TokenFlows
 from helpers.multicall import Call, as_wei, func
 from rich.console import Console
 
@@ -18,8 +8,253 @@ console = Console()
 
 
 class StrategyCoreResolver:
+    # Values computed from the snaps with the shares_math, before checking the invariants
+    DERIVED = {
+        "deposit": [
+            (
+                "expected_shares",
+                'params["expected_shares"] if params.get("expected_shares") is not None'
+                ' else Decimal(params["amount"] * 10**18)'
+                ' / Decimal(before.get("sett.getPricePerFullShare"))',
+            ),
+        ],
+        "withdraw": [
+            (
+                "expected_want",
+                'from_shares_to_want(params["amount"],'
+                ' before.get("sett.getPricePerFullShare"), before.get("sett.decimals"))',
+            ),
+            (
+                "want_required_from_strat",
+                'derived["expected_want"] - before.balances("want", "sett")',
+            ),
+            (
+                "fee",
+                'get_withdrawal_fees_in_shares(params["amount"],'
+                ' before.get("sett.getPricePerFullShare"), before.get("sett.decimals"),'
+                ' before.get("sett.withdrawalFee"), before.get("sett.totalSupply"),'
+                ' before.get("sett.balance")) if before.get("sett.withdrawalFee") > 0 else 0',
+            ),
+            (
+                "fee_in_want",
+                'get_withdrawal_fees_in_want(params["amount"],'
+                ' before.get("sett.getPricePerFullShare"), before.get("sett.decimals"),'
+                ' before.get("sett.withdrawalFee")) if before.get("sett.withdrawalFee") > 0'
+                " else 0",
+            ),
+        ],
+        "harvest": [
+            (
+                "value_gained",
+                'after.get("sett.getPricePerFullShare")'
+                ' > before.get("sett.getPricePerFullShare")',
+            ),
+            (
+                "fees",
+                'get_report_fees(after.get("sett.balance") - before.get("sett.balance"),'
+                ' before.get("sett.performanceFeeGovernance"),'
+                ' before.get("sett.performanceFeeStrategist"),'
+                ' before.get("sett.managementFee"),'
+                ' after.get("sett.lastHarvestedAt") - before.get("sett.lastHarvestedAt"),'
+                ' before.get("sett.totalSupply"), before.get("sett.balance"))',
+            ),
+        ],
+    }
+
+    INVARIANTS = {
+        "deposit": [
+            Invariant(
+                "totalSupply() of Sett tokens increases by the shares",
+                'after.get("sett.totalSupply")',
+                "approx",
+                'before.get("sett.totalSupply") + derived["expected_shares"]',
+                1,
+            ),
+            Invariant(
+                "balanceOf() want in the Sett increases by the amount",
+                'after.balances("want", "sett")',
+                "approx",
+                'before.balances("want", "sett") + params["amount"]',
+                1,
+            ),
+            Invariant(
+                "balanceOf() want of the user decreases by the amount",
+                'after.balances("want", "user")',
+                "approx",
+                'before.balances("want", "user") - params["amount"]',
+                1,
+            ),
+            Invariant(
+                "balanceOf() Sett tokens of the user increases by the shares",
+                'after.balances("sett", "user")',
+                "approx",
+                'before.balances("sett", "user") + derived["expected_shares"]',
+                1,
+            ),
+        ],
+        "withdraw": [
+            # NOTE: withdraw(0) reverts so these should never be hit
+            Invariant(
+                "totalSupply() unchanged on withdraw(0)",
+                'after.get("sett.totalSupply")',
+                "==",
+                'before.get("sett.totalSupply")',
+                when='params["amount"] == 0',
+            ),
+            Invariant(
+                "Sett tokens of the user unchanged on withdraw(0)",
+                'after.balances("sett", "user")',
+                "==",
+                'before.balances("sett", "user")',
+                when='params["amount"] == 0',
+            ),
+            # 1. burn() works properly
+            Invariant(
+                "totalSupply() of Sett tokens decreases by the shares burned",
+                'after.get("sett.totalSupply") + params["amount"]',
+                "approx",
+                'before.get("sett.totalSupply")',
+                1,
+                when='params["amount"] > 0',
+            ),
+            Invariant(
+                "Sett tokens of the user decrease by the shares burned",
+                'after.balances("sett", "user") + params["amount"]',
+                "approx",
+                'before.balances("sett", "user")',
+                1,
+                when='params["amount"] > 0',
+            ),
+            # 2. strategy withdraws accurate amount, if idle in sett is insufficient
+            Invariant(
+                "Strategy has enough want for the withdrawal",
+                'derived["want_required_from_strat"]',
+                "<=",
+                'before.get("strategy.balanceOf")',
+                when='params["amount"] > 0 and derived["want_required_from_strat"] > 0',
+            ),
+            # NOTE: Assumes strategy don't lose > 1%
+            Invariant(
+                "Strategy balanceOf() decreases by the want required",
+                'before.get("strategy.balanceOf") - derived["want_required_from_strat"]',
+                "approx",
+                'after.get("strategy.balanceOf")',
+                1,
+                when='params["amount"] > 0 and derived["want_required_from_strat"] > 0',
+            ),
+            # 3. withdrawal fee is calculated properly
+            Invariant(
+                "Withdrawal fee is charged",
+                'derived["fee"] > 0 and derived["fee_in_want"] > 0',
+                "holds",
+                when='params["amount"] > 0 and before.get("sett.withdrawalFee") > 0',
+            ),
+            # We approx because for rounding we may get 1 less share
+            Invariant(
+                "Treasury gets the withdrawal fee shares",
+                'after.balances("sett", "treasury")',
+                "approx",
+                'before.balances("sett", "treasury") + derived["fee"]',
+                1,
+                when='params["amount"] > 0',
+            ),
+            # 4. user gets back ~correct amount
+            Invariant(
+                "User receives the want minus the fee",
+                'after.balances("want", "user")',
+                "approx",
+                'before.balances("want", "user") + derived["expected_want"]'
+                ' - derived["fee_in_want"]',
+                1,
+                when='params["amount"] > 0',
+            ),
+            Invariant(
+                "balance() of the Sett decreases by the want withdrawn",
+                'after.get("sett.balance")',
+                "approx",
+                'before.get("sett.balance") - derived["expected_want"]'
+                ' + derived["fee_in_want"]',
+                1,
+                when='params["amount"] > 0',
+            ),
+        ],
+        # Do nothing if there is not enough available want in sett to transfer.
+        # NB: Since we calculate available want by taking a percentage when
+        # balance is 1 it gets rounded down to 1.
+        "earn": [
+            Invariant(
+                "balanceOf() want in the Sett doesn't increase",
+                'after.balances("want", "sett")',
+                "<=",
+                'before.balances("want", "sett")',
+                when='before.balances("want", "sett") > 1',
+            ),
+            Invariant(
+                "All want is in the pool OR sitting in the strategy, not a mix",
+                '(after.get("strategy.balanceOfWant") == 0'
+                ' and after.get("strategy.balanceOfPool")'
+                ' > before.get("strategy.balanceOfPool"))'
+                ' or (after.get("strategy.balanceOfWant")'
+                ' > before.get("strategy.balanceOfWant")'
+                ' and after.get("strategy.balanceOfPool") == 0)',
+                "holds",
+                when='before.balances("want", "sett") > 1',
+            ),
+            Invariant(
+                "balanceOf() of the Strategy increases",
+                'after.get("strategy.balanceOf")',
+                ">",
+                'before.get("strategy.balanceOf")',
+                when='before.balances("want", "sett") > 1',
+            ),
+            Invariant(
+                "balanceOf() want of the user doesn't change",
+                'after.balances("want", "user")',
+                "==",
+                'before.balances("want", "user")',
+                when='before.balances("want", "sett") > 1',
+            ),
+        ],
+        "harvest": [
+            # Strategist should earn if fee is enabled and value was generated
+            Invariant(
+                "Strategist earns performance fees",
+                'after.balances("sett", "strategist")',
+                ">",
+                'before.balances("sett", "strategist")',
+                when='before.get("sett.performanceFeeStrategist") > 0'
+                ' and derived["value_gained"]',
+            ),
+            Invariant(
+                "Treasury earns performance fees",
+                'after.balances("sett", "treasury")',
+                ">",
+                'before.balances("sett", "treasury")',
+                when='before.get("sett.performanceFeeGovernance") > 0'
+                ' and derived["value_gained"]',
+            ),
+            ## Specific check to prove that gain was as modeled
+            Invariant(
+                "Strategist shares match the modeled performance fee",
+                'after.balances("sett", "strategist")'
+                ' - before.balances("sett", "strategist")',
+                "==",
+                'derived["fees"].shares_perf_strategist',
+            ),
+            Invariant(
+                "Treasury shares match the modeled performance and management fees",
+                'after.balances("sett", "treasury") - before.balances("sett", "treasury")',
+                "==",
+                'derived["fees"].shares_perf_treasury + derived["fees"].shares_management',
+            ),
+        ],
+    }
+
     def __init__(self, manager):
         self.manager = manager
+        self.engine = InvariantEngine(self.INVARIANTS, self.DERIVED)
+        # tokenKey -> address of the tokens with balances in the snaps
+        self.tokens = {}
 
     # ===== Read strategy data =====
 
@@ -36,6 +271,7 @@ class StrategyCoreResolver:
         return calls
 
     def add_entity_balances_for_tokens(self, calls, tokenKey, token, entities):
+        self.tokens[tokenKey] = token.address
         for entityKey, entity in entities.items():
             calls.append(
                 Call(
@@ -168,29 +404,19 @@ class StrategyCoreResolver:
         console.print("=== Compare Earn ===")
         self.manager.printCompare(before, after)
 
-        # Do nothing if there is not enough available want in sett to transfer.
-        # NB: Since we calculate available want by taking a percentage when
-        # balance is 1 it gets rounded down to 1.
-        if before.balances("want", "sett") <= 1:
+        self.engine.check("earn", before, after, params)
+        if self.nothing_to_earn(before):
             return
-
-        assert after.balances("want", "sett") <= before.balances("want", "sett")
-
-        # All want should be in pool OR sitting in strategy, not a mix
-        assert (
-            after.get("strategy.balanceOfWant") == 0
-            and after.get("strategy.balanceOfPool")
-            > before.get("strategy.balanceOfPool")
-        ) or (
-            after.get("strategy.balanceOfWant") > before.get("strategy.balanceOfWant")
-            and after.get("strategy.balanceOfPool") == 0
-        )
-
-        assert after.get("strategy.balanceOf") > before.get("strategy.balanceOf")
-        assert after.balances("want", "user") == before.balances("want", "user")
-
         self.hook_after_earn(before, after, params)
 
+    def nothing_to_earn(self, before):
+        """
+        Not enough available want in sett to transfer.
+        NB: Since we calculate available want by taking a percentage when
+        balance is 1 it gets rounded down to 1.
+        """
+        return before.balances("want", "sett") <= 1
+
     def confirm_withdraw(self, before, after, params, tx):
         """
         Withdraw Should;
@@ -204,118 +430,10 @@ class StrategyCoreResolver:
         console.print("=== Compare Withdraw ===")
         self.manager.printCompare(before, after)
 
+        self.engine.check("withdraw", before, after, params)
         if params["amount"] == 0:
             # NOTE: withdraw(0) reverts so this should never be hit
-            assert after.get("sett.totalSupply") == before.get("sett.totalSupply")
-            # Decrease the Sett tokens for the user based on withdrawAmount and pricePerFullShare
-            assert after.balances("sett", "user") == before.balances("sett", "user")
             return
-
-        shares_to_burn = params["amount"]
-        ppfs_before_withdraw = before.get("sett.getPricePerFullShare")
-        vault_decimals = before.get("sett.decimals")
-
-        # We check 4 things:
-        # 1. burn() works properly
-        # 2. strategy withdraws accurate amount
-        # 3. withdrawal fee is calculated properly
-        # 4. user gets back ~correct amount/something
-
-        # 1.
-        # Decrease the totalSupply of Sett tokens
-        assert approx(
-            after.get("sett.totalSupply") + shares_to_burn,
-            before.get("sett.totalSupply"),
-            1,
-        )
-
-        assert approx(
-            after.balances("sett", "user") + shares_to_burn,
-            before.balances("sett", "user"),
-            1,
-        )
-
-        # 2.
-        ## Accurately check user got the expected amount
-        # Amount of want expected to be withdrawn
-        expected_want = from_shares_to_want(
-            shares_to_burn, ppfs_before_withdraw, vault_decimals
-        )
-
-        # Want in the strategy should be decreased, if idle in sett is insufficient to cover withdrawal
-        if expected_want > before.balances("want", "sett"):
-            # Withdraw from idle in sett first
-            want_required_from_strat = expected_want - before.balances("want", "sett")
-
-            # Ensure that we have enough in the strategy to satisfy the request
-            assert want_required_from_strat <= before.get("strategy.balanceOf")
-
-            # # NOTE: Assumes strategy don't lose > 1%
-            # Strategies can lose money upto a certain threshold. On calling withdraw on a strategy
-            # for some amount, we can only be sure that the strategy returns some minimum amount back
-            # (based on a adjustable threshold parameter)
-
-            # Strategy should get at least this amount of want after withdrawing from pool
-            assert approx(
-                before.get("strategy.balanceOf") - want_required_from_strat,
-                after.get("strategy.balanceOf"),
-                1,
-            )
-
-        # 3.
-        ## Accurately calculate withdrawal fee
-        fee = fee_in_want = 0
-        if before.get("sett.withdrawalFee") > 0:
-            withdrawal_fee_bps = before.get("sett.withdrawalFee")
-            total_supply_before_withdraw = before.get("sett.totalSupply")
-            vault_balance_before_withdraw = before.get("sett.balance")
-
-            fee = get_withdrawal_fees_in_shares(
-                shares_to_burn,
-                ppfs_before_withdraw,
-                vault_decimals,
-                withdrawal_fee_bps,
-                total_supply_before_withdraw,
-                vault_balance_before_withdraw,
-            )
-
-            fee_in_want = get_withdrawal_fees_in_want(
-                shares_to_burn, ppfs_before_withdraw, vault_decimals, withdrawal_fee_bps
-            )
-            assert fee > 0 and fee_in_want > 0
-
-        ## We got shares issued as expected
-        """
-            NOTE: We have to approx here
-            We approx because for rounding we may get 1 less share
-            >>> after.balances("sett", "treasury")
-            399999999999999999
-            >>> before.balances("sett", "treasury")
-            200000000000000000
-            >>> fee
-            2e+17
-        """
-        assert approx(
-            after.balances("sett", "treasury"),
-            before.balances("sett", "treasury") + fee,
-            1,
-        )
-
-        # 4.
-        # # NOTE: Assumes strategy don't lose > 1%
-        # Withdrawal increases user balance
-        assert approx(
-            after.balances("want", "user"),
-            before.balances("want", "user") + expected_want - fee_in_want,
-            1,
-        )
-        # Withdrawal should decrease balance of sett
-        assert approx(
-            after.get("sett.balance"),
-            before.get("sett.balance") - expected_want + fee_in_want,
-            1,
-        )
-
         self.hook_after_confirm_withdraw(before, after, params)
 
     def confirm_deposit(self, before, after, params):
@@ -327,41 +445,10 @@ class StrategyCoreResolver:
         - Decrease the balanceOf() want of the user by depositAmount
         """
 
-        ppfs = before.get("sett.getPricePerFullShare")
         console.print("=== Compare Deposit ===")
         self.manager.printCompare(before, after)
 
-        expected_shares = Decimal(params["amount"] * Wei("1 ether")) / Decimal(ppfs)
-        if params.get("expected_shares") is not None:
-            expected_shares = params["expected_shares"]
-
-        # Increase the totalSupply() of Sett tokens
-        assert approx(
-            after.get("sett.totalSupply"),
-            before.get("sett.totalSupply") + expected_shares,
-            1,
-        )
-
-        # Increase the balanceOf() want in the Sett by depositAmount
-        assert approx(
-            after.balances("want", "sett"),
-            before.balances("want", "sett") + params["amount"],
-            1,
-        )
-
-        # Decrease the balanceOf() want of the user by depositAmount
-        assert approx(
-            after.balances("want", "user"),
-            before.balances("want", "user") - params["amount"],
-            1,
-        )
-
-        # Increase the balanceOf() Sett tokens for the user based on depositAmount / pricePerFullShare
-        assert approx(
-            after.balances("sett", "user"),
-            before.balances("sett", "user") + expected_shares,
-            1,
-        )
+        self.engine.check("deposit", before, after, params)
         self.hook_after_confirm_deposit(before, after, params)
 
     # ===== Strategies must implement =====
@@ -394,6 +481,29 @@ class StrategyCoreResolver:
         """
         assert True
 
+    def hook_after_harvest(self, before, after, tx):
+        """
+        Specifies extra check for ordinary operation on harvest
+        Use this to verify the harvest events and the rewards distribution
+        """
+        assert True
+
+    def hook_harvest_trace(self, before, after, tx, flows):
+        """
+        Specifies the dust and conservation checks on the harvest token flows
+        Only run when the manager traces harvests, see verify_harvest_trace
+        """
+        assert True
+
+    def verify_harvest_trace(self, before, after, tx):
+        """
+        Checks the token flow graph of the harvest call trace, one debug_traceTransaction
+        instead of balance reads on every intermediate token
+        """
+        if not self.manager.traceHarvest:
+            return
+        self.hook_harvest_trace(before, after, tx, TokenFlows.of(tx))
+
     def confirm_harvest(self, before, after, tx):
         """
         Verfies that the Harvest produced yield and fees
@@ -403,60 +513,27 @@ class StrategyCoreResolver:
         # self.confirm_harvest_state(before, after, tx)
 
         ## Verify harvest, and verify that the correct amount of shares was issued against perf fees
+        self.engine.check("harvest", before, after)
+        self.hook_after_harvest(before, after, tx)
+        self.verify_harvest_trace(before, after, tx)
 
-        ## Simple check to guarantee a degree of gains
-        valueGained = after.get("sett.getPricePerFullShare") > before.get(
-            "sett.getPricePerFullShare"
-        )
-
-        # # Strategist should earn if fee is enabled and value was generated
-        if before.get("sett.performanceFeeStrategist") > 0 and valueGained:
-            assert after.balances("sett", "strategist") > before.balances(
-                "sett", "strategist"
-            )
-
-        # # Strategist should earn if fee is enabled and value was generated
-        if before.get("sett.performanceFeeGovernance") > 0 and valueGained:
-            assert after.balances("sett", "treasury") > before.balances(
-                "sett", "treasury"
-            )
-
-        ## Specific check to prove that gain was as modeled
-        total_harvest_gain = after.get("sett.balance") - before.get("sett.balance")
-        performance_fee_treasury = before.get("sett.performanceFeeGovernance")
-        performance_fee_strategist = before.get("sett.performanceFeeStrategist")
-        management_fee = before.get("sett.managementFee")
-        time_since_last_harvest = after.get("sett.lastHarvestedAt") - before.get(
-            "sett.lastHarvestedAt"
-        )
-        total_supply_before_deposit = before.get("sett.totalSupply")
-        balance_before_deposit = before.get("sett.balance")
-
-        fees = get_report_fees(
-            total_harvest_gain,
-            performance_fee_treasury,
-            performance_fee_strategist,
-            management_fee,
-            time_since_last_harvest,
-            total_supply_before_deposit,
-            balance_before_deposit,
-        )
-
-        shares_perf_treasury = fees.shares_perf_treasury
-        shares_management = fees.shares_management
-        shares_perf_strategist = fees.shares_perf_strategist
-
-        delta_strategist = after.balances("sett", "strategist") - before.balances(
-            "sett", "strategist"
-        )
-
-        assert delta_strategist == shares_perf_strategist
-
-        delta_treasury = after.balances("sett", "treasury") - before.balances(
-            "sett", "treasury"
-        )
-
-        assert delta_treasury == shares_perf_treasury + shares_management
+    def confirm_chain(self, operation, before, after, params, tx):
+        """
+        The checks that need the receipt or the chain, the invariants are verified apart
+        Used by the SnapshotManager deferred mode, always in the main process
+        """
+        if operation == "deposit":
+            self.hook_after_confirm_deposit(before, after, params)
+        elif operation == "withdraw" and params["amount"] > 0:
+            self.hook_after_confirm_withdraw(before, after, params)
+        elif operation == "earn" and not self.nothing_to_earn(before):
+            self.hook_after_earn(before, after, params)
+        elif operation == "harvest":
+            self.confirm_harvest_state(before, after, tx)
+            self.hook_after_harvest(before, after, tx)
+            self.verify_harvest_trace(before, after, tx)
+        elif operation == "tend":
+            self.confirm_tend(before, after, tx)
 
     def confirm_tend(self, before, after, tx):
         """
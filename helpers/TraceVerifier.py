@@ -0,0 +1,159 @@
+"""
+Token flow graph of a transaction from its call trace
+
+The trace is pulled once with debug_traceTransaction (callTracer with logs) and cached
+on disk by chain id, block hash and tx hash: a dev chain reverted and mined again reuses
+tx hashes in different blocks, which get their own entry. Every ERC20 Transfer log of
+the calls that didn't revert becomes an edge (token, from, to) -> amount, mints come
+from and burns go to the zero address
+"""
+import json
+import os
+from collections import defaultdict
+
+from eth_utils import keccak
+from helpers.constants import AddressZero
+from helpers.rpc.batch import batch_request
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "traces"
+)
+
+TRACER = {"tracer": "callTracer", "tracerConfig": {"withLog": True}}
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+
+
+def normalize(address):
+    return str(address).lower()
+
+
+def cache_path(chainId, blockHash, txHash):
+    return os.path.join(
+        CACHE_DIR,
+        "{}-{}-{}.json".format(chainId, blockHash.lower(), txHash.lower()),
+    )
+
+
+def get_trace(txHash, w3=None, refresh=False):
+    """
+    The callTracer trace of a transaction, from the disk cache if already pulled
+    """
+    txHash = txHash if isinstance(txHash, str) else "0x" + bytes(txHash).hex()
+    chainId, tx = batch_request(
+        [("eth_chainId", []), ("eth_getTransactionByHash", [txHash])], w3
+    )
+    if tx is None or tx.get("blockHash") is None:
+        raise ValueError("Transaction {} not mined".format(txHash))
+    path = cache_path(int(chainId, 16), tx["blockHash"], txHash)
+    if not refresh and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+    trace = batch_request([("debug_traceTransaction", [txHash, TRACER])], w3)[0]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(trace, f)
+    return trace
+
+
+def iter_logs(frame):
+    """
+    The logs of the frame and its subcalls, skipping the reverted ones with their subcalls
+    """
+    if frame.get("error"):
+        return
+    for log in frame.get("logs", []):
+        yield log
+    for call in frame.get("calls", []):
+        yield from iter_logs(call)
+
+
+def topic_address(topic):
+    return "0x" + topic[-40:].lower()
+
+
+class TokenFlows:
+    """
+    (token, from, to) -> amount over a transaction, with per account net flows
+    """
+
+    def __init__(self, logs):
+        self.edges = defaultdict(int)
+        # (token, account) -> received - sent
+        self.nets = defaultdict(int)
+
+        for log in logs:
+            topics = log.get("topics", [])
+            # ERC721 Transfers index the id as well, they are not token flows
+            if len(topics) != 3 or topics[0].lower() != TRANSFER_TOPIC:
+                continue
+            token = normalize(log["address"])
+            src, dst = topic_address(topics[1]), topic_address(topics[2])
+            amount = int(log["data"], 16) if log["data"] not in ("0x", "") else 0
+
+            self.edges[(token, src, dst)] += amount
+            self.nets[(token, src)] -= amount
+            self.nets[(token, dst)] += amount
+
+    @classmethod
+    def from_trace(cls, trace):
+        return cls(iter_logs(trace))
+
+    @classmethod
+    def of(cls, tx, w3=None):
+        return cls.from_trace(get_trace(tx.txid, w3))
+
+    # ===== Queries =====
+
+    def sent(self, token, src=None, dst=None):
+        """
+        Amount of token moved from src to dst, either one left out matches any account
+        """
+        token = normalize(token)
+        src = normalize(src) if src is not None else None
+        dst = normalize(dst) if dst is not None else None
+        return sum(
+            amount
+            for (t, s, d), amount in self.edges.items()
+            if t == token and src in (None, s) and dst in (None, d)
+        )
+
+    def net(self, token, account):
+        """
+        Received minus sent by the account over the transaction
+        """
+        return self.nets.get((normalize(token), normalize(account)), 0)
+
+    def minted(self, token, dst=None):
+        return self.sent(token, AddressZero, dst)
+
+    def burned(self, token, src=None):
+        return self.sent(token, src, AddressZero)
+
+    def tokens(self):
+        return sorted({token for token, _, _ in self.edges})
+
+    # ===== Checks =====
+
+    def assert_no_dust(self, account, tokens, before=None):
+        """
+        Nothing of the tokens is left on the account after the transaction
+        before is token -> balance ahead of it, without it all that came in must have left
+        """
+        before = {normalize(t): b for t, b in (before or {}).items()}
+        for token in tokens:
+            net = self.net(token, account)
+            if normalize(token) in before:
+                left = before[normalize(token)] + net
+                assert left == 0, "{} dust of {} left on {}".format(
+                    left, token, account
+                )
+            else:
+                assert net <= 0, "{} of {} kept by {}".format(net, token, account)
+
+    def assert_conserved(self, account, token):
+        """
+        The account passed all it received of token on, none created nor lost
+        """
+        net = self.net(token, account)
+        assert net == 0, "{} of {} not conserved through {}".format(net, token, account)
@@ -0,0 +1,150 @@
+from collections import namedtuple
+
+from helpers.multicall import Call, Multicall
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+Step = namedtuple(
+    "Step", ["contract", "getter", "expected", "setter", "args", "dependent"]
+)
+
+# Margin on the gas estimate of setters sent after the steps they depend on
+GAS_BUFFER = 1.2
+
+
+def normalize(value):
+    """
+    Comparable form of a read or expected value: addresses and bytes as lowercase hex
+    """
+    if hasattr(value, "address"):
+        value = value.address
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, str) and value.startswith("0x"):
+        return value.lower()
+    return value
+
+
+class TxPipeline:
+    """
+    Brings a set of on chain parameters to their expected values:
+    one multicall to read them, only the setters for the ones that differ sent
+    back to back with explicit nonces, then one multicall to verify
+
+    pipeline = TxPipeline(dev)
+    pipeline.add(vault, "keeper()(address)", keeper, "setKeeper", keeper)
+    pipeline.run()
+    """
+
+    def __init__(self, sender, w3=None):
+        self.sender = sender
+        self.w3 = w3
+        self.steps = []
+
+    def add(self, contract, getter, expected, setter, *setterArgs, dependent=False):
+        """
+        getter is a multicall signature, or [signature, *args] if it takes arguments
+        Mark setters that depend on an earlier step of the pipeline as dependent, their
+        gas can't be estimated before that step is mined so they are sent after it
+        """
+        self.steps.append(
+            Step(contract, getter, expected, setter, setterArgs, dependent)
+        )
+        return self
+
+    # ===== Read =====
+
+    def read(self):
+        calls = [
+            Call(step.contract.address, step.getter, [[i, None]])
+            for i, step in enumerate(self.steps)
+        ]
+        return Multicall(calls, self.w3)() if calls else {}
+
+    def diff(self, current=None):
+        """
+        Steps whose getter doesn't return the expected value, in order
+        """
+        current = self.read() if current is None else current
+        return [
+            step
+            for i, step in enumerate(self.steps)
+            if normalize(current[i]) != normalize(step.expected)
+        ]
+
+    def calls(self, steps=None):
+        """
+        [(to, calldata)] of the setters, e.g. to batch them in a Safe MultiSend
+        """
+        steps = self.diff() if steps is None else steps
+        return [
+            (
+                step.contract.address,
+                getattr(step.contract, step.setter).encode_input(*step.args),
+            )
+            for step in steps
+        ]
+
+    # ===== Write =====
+
+    def submit(self, steps):
+        """
+        Sends all the setters without waiting, nonces keep them in order
+        A dependent setter waits for the txs before it, then its gas is estimated
+        """
+        nonce = self.sender.nonce
+        txs = []
+        for offset, step in enumerate(steps):
+            params = {"from": self.sender, "nonce": nonce + offset, "required_confs": 0}
+            if step.dependent:
+                self.wait(txs)
+                params["gas_buffer"] = GAS_BUFFER
+            txs.append(getattr(step.contract, step.setter)(*step.args, params))
+        return txs
+
+    def wait(self, txs):
+        """
+        The txs are mined concurrently, waiting on them in nonce order
+        only costs as long as the slowest one
+        """
+        for tx in txs:
+            tx.wait(1)
+            assert tx.status == 1, "{} reverted".format(tx.txid)
+
+    def verify(self):
+        mismatches = self.diff()
+        for step in mismatches:
+            console.print(
+                "[red]Not set:[/red]", step.contract.address, step.getter, step.expected
+            )
+        assert not mismatches
+
+    def run(self):
+        """
+        Read, send the minimal set of txs, wait and verify. Returns the txs sent
+        """
+        steps = self.diff()
+        self.print(steps)
+
+        txs = self.submit(steps)
+        self.wait(txs)
+        self.verify()
+
+        return txs
+
+    def print(self, steps):
+        if not steps:
+            console.print("[green]All parameters already set[/green]")
+            return
+        print(
+            tabulate(
+                [
+                    [step.contract.address, step.setter, list(step.args)]
+                    for step in steps
+                ],
+                headers=["contract", "setter", "args"],
+                tablefmt="grid",
+            )
+        )
@@ -0,0 +1,80 @@
+"""
+Exact formatting of token amounts
+
+Same output as "{:,.18f}".format(amount / 10**decimals), without going through a float:
+the integer and fractional parts come from one divmod by a cached power of ten, so
+amounts above 2**53 wei keep all their digits. Rounding, when places < decimals, is half
+to even like Decimal
+"""
+from functools import lru_cache
+
+PLACES = 18
+
+
+@lru_cache(maxsize=None)
+def pow10(n):
+    return 10**n
+
+
+@lru_cache(maxsize=None)
+def token_decimals(token):
+    """
+    decimals() of a token, read once per address
+    """
+    from brownie import interface
+
+    return interface.IERC20Detailed(token).decimals()
+
+
+def round_places(amount, decimals, places):
+    """
+    amount (>= 0) with decimals rounded half to even to places decimals
+    """
+    unit = pow10(decimals - places)
+    quotient, remainder = divmod(amount, unit)
+    if 2 * remainder > unit or (2 * remainder == unit and quotient & 1):
+        quotient += 1
+    return quotient
+
+
+def format_fixed(amount, decimals=18, places=PLACES):
+    negative = amount < 0
+    if negative:
+        amount = -amount
+    if places < decimals:
+        amount, decimals = round_places(amount, decimals, places), places
+
+    whole, fraction = divmod(amount, pow10(decimals))
+    if places:
+        text = "{:,}.{:0{}d}".format(whole, fraction * pow10(places - decimals), places)
+    else:
+        text = "{:,}".format(whole)
+    # Like float formatting, a negative amount keeps its sign even if it rounds to 0
+    return "-" + text if negative else text
+
+
+def format_column(amounts, decimals=18, places=PLACES):
+    """
+    format_fixed over a whole column, values that are not ints are passed through
+    """
+    if places < decimals:
+        return [
+            format_fixed(amount, decimals, places) if type(amount) is int else amount
+            for amount in amounts
+        ]
+
+    unit = pow10(decimals)
+    scale = pow10(places - decimals)
+    column = []
+    for amount in amounts:
+        if type(amount) is not int:
+            column.append(amount)
+            continue
+        whole, fraction = divmod(-amount if amount < 0 else amount, unit)
+        text = (
+            "{:,}.{:0{}d}".format(whole, fraction * scale, places)
+            if places
+            else "{:,}".format(whole)
+        )
+        column.append("-" + text if amount < 0 else text)
+    return column
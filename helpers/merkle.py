@@ -0,0 +1,225 @@
+"""
+Merkle trees for TheGuestlist, built and read without holding them in memory
+
+Leaves are keccak256(abi.encodePacked(address)) and pairs are hashed sorted, like
+OpenZeppelin's MerkleProof.verify. An odd node at the end of a level is promoted as is.
+
+The tree is stored in one file: MAGIC, the leaf count (uint64) and every level
+from the (sorted) leaves up to the root, 32 bytes per node
+"""
+import csv
+import heapq
+import mmap
+import os
+import re
+import tempfile
+
+from eth_utils import is_checksum_address, is_hex_address, keccak
+
+MAGIC = b"MRKL"
+HEADER = len(MAGIC) + 8
+NODE = 32
+
+# Leaves sorted in memory at once: 32 MiB of hashes, but as 65 byte bytes objects
+# referenced from the list and its sorted copy it comes to about 80 MiB
+CHUNK = 1 << 20
+
+# A first CSV row that isn't hex is a header
+HEX = re.compile(r"^(0x)?[0-9a-fA-F]*$")
+
+
+def normalize(address):
+    """
+    Lowercase 0x prefixed address, ValueError on a bad length, characters or checksum
+    """
+    address = str(address).strip()
+    if not address.startswith("0x"):
+        address = "0x" + address
+    digits = address[2:]
+    # Mixed case must be a valid EIP-55 checksum, single case has none
+    mixed = digits != digits.lower() and digits != digits.upper()
+    if not is_hex_address(address) or (mixed and not is_checksum_address(address)):
+        raise ValueError("Invalid address {}".format(address))
+    return address.lower()
+
+
+def leaf(address):
+    return keccak(bytes.fromhex(normalize(address)[2:]))
+
+
+def hash_pair(a, b):
+    return keccak(a + b) if a <= b else keccak(b + a)
+
+
+def verify(proof, root, node):
+    for sibling in proof:
+        node = hash_pair(node, sibling)
+    return node == root
+
+
+def level_sizes(n):
+    sizes = [n]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+# ===== Build =====
+
+
+def read_addresses(path):
+    """
+    Streams the addresses in the first column of a CSV, normalized, skipping a header
+    and blank rows. Raises on any other row that isn't a valid address
+    """
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            cell = row[0].strip() if row else ""
+            if not cell or (line == 1 and not HEX.match(cell)):
+                continue
+            try:
+                yield normalize(cell)
+            except ValueError:
+                raise ValueError("{}:{}: invalid address {}".format(path, line, cell))
+
+
+def sorted_leaves(addresses, chunk=CHUNK):
+    """
+    Unique leaves in order, sorted in chunks on disk and merged with heapq.merge
+    """
+    runs = []
+    try:
+        leaves = []
+        for address in addresses:
+            leaves.append(leaf(address))
+            if len(leaves) >= chunk:
+                runs.append(write_run(sorted(leaves)))
+                leaves = []
+        if leaves or not runs:
+            runs.append(write_run(sorted(leaves)))
+
+        previous = None
+        for node in heapq.merge(*[read_run(run) for run in runs]):
+            if node != previous:
+                yield node
+            previous = node
+    finally:
+        for run in runs:
+            run.close()
+
+
+def write_run(leaves):
+    run = tempfile.TemporaryFile()
+    run.write(b"".join(leaves))
+    run.seek(0)
+    return run
+
+
+def read_run(run):
+    while True:
+        node = run.read(NODE)
+        if not node:
+            return
+        yield node
+
+
+def build(addresses, path, chunk=CHUNK):
+    """
+    Writes the tree for the addresses to path, returns its root
+    Memory use is bounded by chunk, each level is hashed streaming from the previous one
+    """
+    with open(path, "w+b") as f:
+        f.write(MAGIC + bytes(8))
+        n = 0
+        for node in sorted_leaves(addresses, chunk):
+            f.write(node)
+            n += 1
+        assert n > 0, "No addresses"
+
+        f.seek(len(MAGIC))
+        f.write(n.to_bytes(8, "big"))
+        f.seek(0, os.SEEK_END)
+
+        offset = HEADER
+        with open(path, "rb") as previous:
+            for size in level_sizes(n)[:-1]:
+                f.flush()
+                previous.seek(offset)
+                for _ in range(size // 2):
+                    pair = previous.read(2 * NODE)
+                    f.write(hash_pair(pair[:NODE], pair[NODE:]))
+                if size % 2:
+                    f.write(previous.read(NODE))
+                offset += size * NODE
+
+    tree = MerkleTree(path)
+    root = tree.root
+    tree.close()
+    return root
+
+
+# ===== Read =====
+
+
+class MerkleTree:
+    """
+    A tree file memory mapped, proofs are O(log n) reads
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        assert self.map[: len(MAGIC)] == MAGIC, "Not a merkle tree file"
+
+        self.size = int.from_bytes(self.map[len(MAGIC) : HEADER], "big")
+        self.offsets = []
+        offset = HEADER
+        for size in level_sizes(self.size):
+            self.offsets.append((offset, size))
+            offset += size * NODE
+
+    def node(self, level, index):
+        offset = self.offsets[level][0] + index * NODE
+        return self.map[offset : offset + NODE]
+
+    @property
+    def root(self):
+        return self.node(len(self.offsets) - 1, 0)
+
+    def index(self, node):
+        """
+        Position of a leaf, binary searched as the leaves are sorted. None if not found
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.node(0, middle) < node:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.size and self.node(0, low) == node:
+            return low
+        return None
+
+    def proof(self, address):
+        """
+        Sibling hashes from the leaf up, None if the address is not in the tree
+        """
+        index = self.index(leaf(address))
+        if index is None:
+            return None
+        return self.proof_at(index)
+
+    def proof_at(self, index):
+        proof = []
+        for level, (_, size) in enumerate(self.offsets[:-1]):
+            sibling = index ^ 1
+            # The last node of an odd level has no sibling, it was promoted
+            if sibling < size:
+                proof.append(self.node(level, sibling))
+            index //= 2
+        return proof
+
+    def close(self):
+        self.map.close()
+        self.file.close()
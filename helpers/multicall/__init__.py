@@ -4,7 +4,23 @@ https://github.com/banteg/multicall.py
 """
 __version__ = "0.1.1"
 
-from helpers.multicall.signature import Signature
-from helpers.multicall.call import Call
-from helpers.multicall.multicall import Multicall
-from helpers.multicall.functions import func, as_wei
+from importlib import import_module
+
+# Loaded on first use so that importing a submodule (e.g. signature) stays cheap
+_EXPORTS = {
+    "Signature": "helpers.multicall.signature",
+    "Call": "helpers.multicall.call",
+    "Multicall": "helpers.multicall.multicall",
+    "func": "helpers.multicall.functions",
+    "as_wei": "helpers.multicall.functions",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
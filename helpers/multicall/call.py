@@ -1,7 +1,15 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/call.py
 from eth_utils import to_checksum_address
-from brownie import web3
-from helpers.multicall import Signature
+from helpers.multicall.signature import Signature
+
+
+def default_web3():
+    """
+    brownie's web3, only imported once a call is actually made
+    """
+    from brownie import web3
+
+    return web3
 
 
 class Call:
@@ -29,8 +37,9 @@ class Call:
         else:
             return decoded if len(decoded) > 1 else decoded[0]
 
-    def __call__(self, args=None):
+    def __call__(self, args=None, w3=None, block_identifier=None):
         args = args or self.args
+        w3 = w3 or default_web3()
         calldata = self.signature.encode_data(args)
-        output = web3.eth.call({"to": self.target, "data": calldata})
+        output = w3.eth.call({"to": self.target, "data": calldata}, block_identifier)
         return self.decode_output(output)
@@ -29,3 +29,21 @@ MULTICALL_ADDRESSES = {
     Network.Arbitrum: "0x7A7443F8c577d537f1d8cD4a629d40a3148Dd7ee",
     Network.Hardhat: "0x7A7443F8c577d537f1d8cD4a629d40a3148Dd7ee",
 }
+
+# Multicall2, or Multicall3 which keeps its interface, for tryAggregate
+MULTICALL2 = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL2_ADDRESSES = {
+    Network.Mainnet: MULTICALL2,
+    Network.Kovan: MULTICALL2,
+    Network.Rinkeby: MULTICALL2,
+    Network.Görli: MULTICALL2,
+    Network.xDai: MULTICALL3,
+    Network.Fantom: MULTICALL3,
+    Network.Forknet: MULTICALL2,
+    Network.BSC: MULTICALL3,
+    Network.Polygon: MULTICALL3,
+    Network.Arbitrum: MULTICALL3,
+    Network.Hardhat: MULTICALL3,
+}
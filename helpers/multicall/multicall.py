@@ -1,33 +1,97 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/multicall.py
 from typing import List
 
-from brownie import web3
+from eth_abi.exceptions import DecodingError
+from web3.exceptions import ContractLogicError
 
-from helpers.multicall import Call
-from helpers.multicall.constants import MULTICALL_ADDRESSES
-from rich.console import Console
+from helpers.multicall import call
+from helpers.multicall.call import Call
+from helpers.multicall.constants import MULTICALL_ADDRESSES, MULTICALL2_ADDRESSES
 
-console = Console()
+
+def is_revert(error):
+    """
+    True if a call failed in the contract (revert, or no data to decode), not on the way
+    """
+    if isinstance(error, (ContractLogicError, DecodingError)):
+        return True
+    if isinstance(error, ValueError) and error.args:
+        # Ganache and older nodes report reverts as a plain RPC error
+        message = error.args[0]
+        if isinstance(message, dict):
+            message = message.get("message", "")
+        return "revert" in str(message).lower()
+    return False
 
 
 class Multicall:
-    def __init__(self, calls: List[Call]):
+    def __init__(
+        self, calls: List[Call], w3=None, require_success=True, block_identifier=None
+    ):
         self.calls = calls
+        self.w3 = w3
+        # Pins all the calls to a block, latest by default
+        self.block_identifier = block_identifier
+        # aggregate() reverts if any call does, when False the calls go through
+        # tryAggregate() and the failed ones are left out of the result
+        self.require_success = require_success
 
     def printCalls(self):
-        for call in self.calls:
-            console.print(
-                {"target": call.target, "function": call.function, "args": call.args}
-            )
+        from rich.console import Console
+
+        console = Console()
+        for c in self.calls:
+            console.print({"target": c.target, "function": c.function, "args": c.args})
 
     def __call__(self):
+        w3 = self.w3 or call.default_web3()
+        if not self.require_success:
+            return self.try_aggregate(w3)
+
         aggregate = Call(
-            MULTICALL_ADDRESSES[web3.eth.chainId],
+            MULTICALL_ADDRESSES[w3.eth.chainId],
             "aggregate((address,bytes)[])(uint256,bytes[])",
         )
-        args = [[[call.target, call.data] for call in self.calls]]
-        block, outputs = aggregate(args)
+        args = [[[c.target, c.data] for c in self.calls]]
+        block, outputs = aggregate(args, w3, self.block_identifier)
+
+        result = {}
+        for c, output in zip(self.calls, outputs):
+            result.update(c.decode_output(output))
+        return result
+
+    def try_aggregate(self, w3):
+        chainId = w3.eth.chainId
+        if chainId not in MULTICALL2_ADDRESSES:
+            return self.call_each(w3)
+
+        tryAggregate = Call(
+            MULTICALL2_ADDRESSES[chainId],
+            "tryAggregate(bool,(address,bytes)[])((bool,bytes)[])",
+        )
+        args = [False, [[c.target, c.data] for c in self.calls]]
+        outputs = tryAggregate(args, w3, self.block_identifier)
+
+        result = {}
+        for c, (success, output) in zip(self.calls, outputs):
+            if not success:
+                continue
+            try:
+                result.update(c.decode_output(output))
+            except DecodingError:
+                # Succeeded without returning anything, e.g. a call to an EOA
+                continue
+        return result
+
+    def call_each(self, w3):
+        """
+        One call at a time, on chains without Multicall2
+        """
         result = {}
-        for call, output in zip(self.calls, outputs):
-            result.update(call.decode_output(output))
+        for c in self.calls:
+            try:
+                result.update(c(w3=w3, block_identifier=self.block_identifier))
+            except Exception as error:
+                if not is_revert(error):
+                    raise
         return result
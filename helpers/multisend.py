@@ -0,0 +1,108 @@
+"""
+Gnosis Safe MultiSend payloads: many governance txs in one Safe tx
+
+Each tx is packed as operation (1 byte) + to (20) + value (32) + data length (32) + data,
+and the concatenation is passed to multiSend(bytes)
+"""
+from helpers.multicall.call import Call, default_web3
+from helpers.multicall.multicall import is_revert
+
+MULTISEND = "0xA238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761"
+MULTISEND_CALL_ONLY = "0x40A2aCCbd92BCA938b02010E17A5b8929b49130D"
+
+# multiSend(bytes)
+MULTISEND_SELECTOR = bytes.fromhex("8d80ff0a")
+
+CALL = 0
+DELEGATECALL = 1
+
+# Cheatcodes to replace an account's code, by node
+SET_CODE_METHODS = ["evm_setAccountCode", "anvil_setCode", "hardhat_setCode"]
+
+
+def to_bytes(data):
+    if isinstance(data, str):
+        return bytes.fromhex(data[2:] if data.startswith("0x") else data)
+    return bytes(data)
+
+
+def pack(to, data, value=0, operation=CALL):
+    """
+    A single tx in MultiSend's packed format
+    """
+    data = to_bytes(data)
+    return b"".join(
+        [
+            operation.to_bytes(1, "big"),
+            to_bytes(getattr(to, "address", to)),
+            value.to_bytes(32, "big"),
+            len(data).to_bytes(32, "big"),
+            data,
+        ]
+    )
+
+
+def encode(txs):
+    """
+    multiSend(bytes) calldata for [(to, data)] or [(to, data, value)]
+    The bytes argument is ABI encoded by hand: offset, length, data padded to 32 bytes
+    """
+    packed = b"".join(pack(*tx) for tx in txs)
+    return b"".join(
+        [
+            MULTISEND_SELECTOR,
+            (32).to_bytes(32, "big"),
+            len(packed).to_bytes(32, "big"),
+            packed,
+            bytes(-len(packed) % 32),
+        ]
+    )
+
+
+def is_safe(address, w3=None):
+    """
+    True if address is a Gnosis Safe: a contract answering VERSION() and getThreshold() > 0
+    """
+    w3 = w3 or default_web3()
+    address = getattr(address, "address", address)
+    if len(w3.eth.getCode(address)) == 0:
+        return False
+    try:
+        Call(address, "VERSION()(string)")(w3=w3)
+        return Call(address, "getThreshold()(uint256)")(w3=w3) > 0
+    except Exception as error:
+        # Reverted or returned nothing to decode, it isn't a Safe
+        if not is_revert(error):
+            raise
+        return False
+
+
+def simulate(safe, txs, multisend=MULTISEND_CALL_ONLY, w3=None):
+    """
+    FOR LOCAL / FORK NETWORKS ONLY
+    Dry runs the whole batch as the Safe would execute it: the Safe's code is swapped
+    for MultiSend's (the Safe delegatecalls it) and the batch is eth_call'ed on it.
+    Raises if any of the txs reverts, the node state is reverted either way
+    """
+    w3 = w3 or default_web3()
+    code = w3.eth.getCode(multisend)
+    assert len(code) > 0, "MultiSend is not deployed on this network"
+
+    snapshot = w3.provider.make_request("evm_snapshot", [])["result"]
+    try:
+        set_code(w3, getattr(safe, "address", safe), "0x" + bytes(code).hex())
+        return w3.eth.call(
+            {"to": getattr(safe, "address", safe), "data": "0x" + encode(txs).hex()}
+        )
+    finally:
+        w3.provider.make_request("evm_revert", [snapshot])
+
+
+def set_code(w3, address, code):
+    for method in SET_CODE_METHODS:
+        response = w3.provider.make_request(method, [address, code])
+        if "error" not in response:
+            return
+    raise ValueError(
+        "The node can't replace account code: {}".format(response["error"])
+    )
@@ -0,0 +1,3 @@
+"""
+JSON-RPC level utilities that sit under brownie's web3 provider
+"""
@@ -0,0 +1,68 @@
+"""
+JSON-RPC batch requests, e.g. hundreds of eth_getStorageAt in one round trip
+"""
+import requests
+from web3 import HTTPProvider
+
+from helpers.multicall.call import default_web3
+
+MAX_BATCH = 500
+TIMEOUT = 60
+
+
+def batch_request(calls, w3=None):
+    """
+    Sends [(method, params)] as JSON-RPC batches, returns the results in order
+    Falls back to one request at a time for non HTTP (or wrapped) providers
+    """
+    w3 = w3 or default_web3()
+    provider = w3.provider
+
+    if type(provider) is not HTTPProvider:
+        responses = [provider.make_request(method, params) for method, params in calls]
+        return [_result(response) for response in responses]
+
+    # Same headers, timeout, proxies... as the provider's own requests
+    kwargs = dict(provider.get_request_kwargs())
+    kwargs.setdefault("timeout", TIMEOUT)
+
+    results = []
+    for start in range(0, len(calls), MAX_BATCH):
+        chunk = calls[start : start + MAX_BATCH]
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(chunk)
+        ]
+        response = requests.post(provider.endpoint_uri, json=payload, **kwargs).json()
+        if isinstance(response, dict):
+            # Some nodes answer a whole batch with a single error
+            raise ValueError(response.get("error", response))
+        byId = {item["id"]: item for item in response}
+        results += [_result(byId[i]) for i in range(len(chunk))]
+
+    return results
+
+
+def _result(response):
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
+
+
+def get_storage_at(slots, block="latest", w3=None):
+    """
+    Reads [(address, slot)] in one batch, returns the values as ints
+    """
+    block = hex(block) if isinstance(block, int) else block
+    results = batch_request(
+        [("eth_getStorageAt", [address, hex(slot), block]) for address, slot in slots],
+        w3,
+    )
+    return [int(value, 16) if value not in ("0x", None) else 0 for value in results]
+
+
+def address_from_slot(value):
+    """
+    Address stored right aligned in a storage word, lowercase like the multicall decoder
+    """
+    return "0x" + (value & (2**160 - 1)).to_bytes(20, "big").hex()
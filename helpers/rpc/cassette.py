@@ -0,0 +1,271 @@
+"""
+Record / replay of JSON-RPC traffic
+
+Serve a local node that ganache forks from. Recording proxies every request to the
+upstream node into a compact gzipped cassette, replaying serves the same requests
+from the cassette alone, so the forked suite runs without network access.
+
+    python -m helpers.rpc.cassette record cassettes/fork.json.gz --port 8546 --upstream $UPSTREAM
+    python -m helpers.rpc.cassette replay cassettes/fork.json.gz --port 8546
+    brownie test --network mainnet-fork-cassette
+"""
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from web3.providers import BaseProvider
+
+VERSION = 2
+
+# Reads whose result only depends on method + params once pinned to a block number at or
+# below the upstream head, anything else replays in recorded order
+STATE_READS = {
+    "eth_call",
+    "eth_getBalance",
+    "eth_getCode",
+    "eth_getStorageAt",
+    "eth_getTransactionCount",
+    "eth_getLogs",
+    "eth_getBlockByNumber",
+}
+STATIC = {"eth_chainId", "net_version", "web3_clientVersion"}
+
+
+def _default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    raise TypeError("Can't encode {!r}".format(value))
+
+
+def request_key(method, params):
+    return (
+        method
+        + ":"
+        + json.dumps(params, sort_keys=True, separators=(",", ":"), default=_default)
+    )
+
+
+def block_number(block):
+    """
+    The block number of a block parameter, None for tags and block hashes
+    """
+    if isinstance(block, int):
+        return block
+    if isinstance(block, str) and block.startswith("0x") and len(block) < 66:
+        return int(block, 16)
+    return None
+
+
+def is_pinned(method, params, forkBlock=None):
+    """
+    True if the response can't change between calls, i.e. a state read at an explicit
+    block that was already mined when the fork was made
+    """
+    if method in STATIC:
+        return True
+    if method not in STATE_READS or not params or forkBlock is None:
+        return False
+    if method == "eth_getLogs":
+        blocks = [block_number(params[0].get(k)) for k in ("fromBlock", "toBlock")]
+    else:
+        blocks = [
+            block_number(params[0] if method == "eth_getBlockByNumber" else params[-1])
+        ]
+    return all(block is not None and block <= forkBlock for block in blocks)
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+class Cassette:
+    """
+    Request key -> ordered list of responses, with identical responses stored once
+    """
+
+    def __init__(self, path, forkBlock=None):
+        self.path = path
+        self.forkBlock = forkBlock
+        self.responses = []
+        self.entries = defaultdict(list)
+        self._index = {}
+        self._cursor = defaultdict(int)
+        # The server handles each request on its own thread
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt") as f:
+            raw = json.load(f)
+        if raw["version"] != VERSION:
+            raise ValueError("Unsupported cassette version {}".format(raw["version"]))
+        cassette = cls(path, raw["forkBlock"])
+        cassette.responses = raw["responses"]
+        cassette.entries.update(raw["entries"])
+        cassette._index = {
+            json.dumps(r, sort_keys=True): i for i, r in enumerate(cassette.responses)
+        }
+        return cassette
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with gzip.open(self.path, "wt") as f:
+            json.dump(
+                {
+                    "version": VERSION,
+                    "forkBlock": self.forkBlock,
+                    "responses": self.responses,
+                    "entries": self.entries,
+                },
+                f,
+                separators=(",", ":"),
+            )
+        self.dirty = False
+
+    def record(self, method, params, response):
+        # Only keep the payload, the id is restored from the request on replay
+        payload = {k: v for k, v in response.items() if k in ("result", "error")}
+        key = request_key(method, params)
+        encoded = json.dumps(payload, sort_keys=True)
+        with self._lock:
+            if method == "eth_blockNumber" and "result" in payload:
+                # Every block up to a head the upstream reported is final
+                self.forkBlock = max(self.forkBlock or 0, int(payload["result"], 16))
+            if is_pinned(method, params, self.forkBlock) and self.entries.get(key):
+                return
+
+            index = self._index.get(encoded)
+            if index is None:
+                index = self._index[encoded] = len(self.responses)
+                self.responses.append(payload)
+
+            self.entries[key].append(index)
+            self.dirty = True
+
+    def play(self, method, params, id_=None):
+        key = request_key(method, params)
+        recorded = self.entries.get(key)
+        if not recorded:
+            raise CassetteMiss("{} not found in cassette {}".format(key, self.path))
+
+        if is_pinned(method, params, self.forkBlock):
+            index = recorded[0]
+        else:
+            with self._lock:
+                cursor = self._cursor[key]
+                if cursor >= len(recorded):
+                    raise CassetteMiss(
+                        "{} was called more often than recorded in {}".format(
+                            key, self.path
+                        )
+                    )
+                self._cursor[key] = cursor + 1
+            index = recorded[cursor]
+
+        response = {"jsonrpc": "2.0", "id": id_}
+        response.update(self.responses[index])
+        return response
+
+
+class CassetteProvider(BaseProvider):
+    """
+    Wraps the upstream web3 provider, recording its traffic or replaying it from a cassette
+    """
+
+    def __init__(self, cassette, provider=None, mode="replay"):
+        super().__init__()
+        assert mode in ("record", "replay")
+        self.cassette = cassette
+        self.provider = provider
+        self.mode = mode
+
+    @property
+    def endpoint_uri(self):
+        return getattr(self.provider, "endpoint_uri", None)
+
+    def make_request(self, method, params):
+        if self.mode == "replay":
+            return self.cassette.play(method, params)
+
+        response = self.provider.make_request(method, params)
+        self.cassette.record(method, params, response)
+        return response
+
+    def isConnected(self):
+        return self.mode == "replay" or self.provider.isConnected()
+
+
+# ===== Standalone node =====
+
+
+def serve(cassette, port=8546, upstream=None):
+    """
+    Serve JSON-RPC from a cassette on localhost, proxying to upstream when recording
+    """
+    if upstream:
+        from web3 import HTTPProvider
+
+        provider = CassetteProvider(cassette, HTTPProvider(upstream), "record")
+    else:
+        provider = CassetteProvider(cassette, None, "replay")
+
+    def handle(request):
+        method, params = request["method"], request.get("params", [])
+        try:
+            response = provider.make_request(method, params)
+        except CassetteMiss as error:
+            response = {"error": {"code": -32000, "message": str(error)}}
+        response = dict(response, id=request.get("id"), jsonrpc="2.0")
+        return response
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if isinstance(body, list):
+                response = [handle(request) for request in body]
+            else:
+                response = handle(body)
+
+            encoded = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cassette.save()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JSON-RPC record / replay node")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("path")
+    parser.add_argument(
+        "--port", type=int, default=8546, help="ganache forks from this port"
+    )
+    parser.add_argument("--upstream", help="node to record from")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        assert args.upstream, "--upstream is required to record"
+        serve(Cassette(args.path), args.port, args.upstream)
+    else:
+        serve(Cassette.load(args.path), args.port)
@@ -0,0 +1,153 @@
+"""
+Opt-in JSON-RPC profiling: calls, bytes and latency per method and per call site
+
+    brownie test --rpc-profile [--rpc-profile-json profile.json]
+    brownie run profile_run main 5_production_proxy_check
+"""
+import json
+import os
+import sys
+from collections import defaultdict
+from time import perf_counter
+
+from rich.console import Console
+from tabulate import tabulate
+from web3.providers import BaseProvider
+
+console = Console()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Plumbing modules, calls are attributed to whoever called into them
+SKIP = tuple(os.path.join(ROOT, path) for path in ("helpers/rpc", "helpers/multicall"))
+
+
+class Stat:
+    __slots__ = ("calls", "sent", "received", "seconds", "slowest")
+
+    def __init__(self):
+        self.calls = 0
+        self.sent = 0
+        self.received = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+
+    def add(self, sent, received, seconds):
+        self.calls += 1
+        self.sent += sent
+        self.received += received
+        self.seconds += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+def call_site():
+    """
+    First project frame outside the plumbing, as Class.method or module:function
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if (
+            path.startswith(ROOT)
+            and not path.startswith(SKIP)
+            and "site-packages" not in path
+        ):
+            owner = frame.f_locals.get("self")
+            if owner is not None:
+                return type(owner).__name__ + "." + frame.f_code.co_name
+            module = os.path.splitext(os.path.basename(path))[0]
+            return module + ":" + frame.f_code.co_name
+        frame = frame.f_back
+    return "<external>"
+
+
+def _size(payload):
+    return len(json.dumps(payload, default=str))
+
+
+class RpcProfiler(BaseProvider):
+    """
+    Wraps a web3 provider and records every request going through it
+    """
+
+    def __init__(self, provider):
+        super().__init__()
+        self.provider = provider
+        self.methods = defaultdict(Stat)
+        self.sites = defaultdict(Stat)
+
+    @property
+    def endpoint_uri(self):
+        return getattr(self.provider, "endpoint_uri", None)
+
+    def make_request(self, method, params):
+        start = perf_counter()
+        response = self.provider.make_request(method, params)
+        elapsed = perf_counter() - start
+
+        sent = _size(params)
+        received = _size(response)
+        self.methods[method].add(sent, received, elapsed)
+        self.sites[(call_site(), method)].add(sent, received, elapsed)
+        return response
+
+    def isConnected(self):
+        return self.provider.isConnected()
+
+    # ===== Report =====
+
+    def summary(self, limit=25):
+        console.print("[green]=== RPC Profile: by method ===[/green]")
+        print(self._table((((m,), s) for m, s in self.methods.items()), ["method"]))
+        console.print("[green]=== RPC Profile: by call site ===[/green]")
+        print(self._table(self.sites.items(), ["site", "method"], limit))
+
+    def _table(self, rows, keys, limit=None):
+        rows = sorted(rows, key=lambda row: row[1].seconds, reverse=True)[:limit]
+        return tabulate(
+            [
+                list(key)
+                + [
+                    stat.calls,
+                    stat.sent,
+                    stat.received,
+                    "{:.3f}".format(stat.seconds),
+                    "{:.2f}".format(stat.seconds / stat.calls * 1000),
+                    "{:.2f}".format(stat.slowest * 1000),
+                ]
+                for key, stat in rows
+            ],
+            headers=keys + ["calls", "sent", "received", "s", "avg ms", "max ms"],
+            tablefmt="grid",
+        )
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "methods": {m: s.as_dict() for m, s in self.methods.items()},
+                    "sites": [
+                        dict(site=site, method=method, **s.as_dict())
+                        for (site, method), s in self.sites.items()
+                    ],
+                },
+                f,
+                indent=2,
+            )
+        console.print("[blue]RPC profile written to[/blue]", path)
+
+
+def install(web3):
+    profiler = RpcProfiler(web3.provider)
+    web3.provider = profiler
+    return profiler
+
+
+def uninstall(web3):
+    profiler = web3.provider
+    if isinstance(profiler, RpcProfiler):
+        web3.provider = profiler.provider
+    return profiler
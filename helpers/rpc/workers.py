@@ -0,0 +1,120 @@
+"""
+Per worker fork nodes for `brownie test -n <workers>` (pytest-xdist)
+
+brownie's xdist runner already gives each worker its own node and port. This pins
+all of their forks to the same block (FORK_BLOCK) so they share ganache's on-disk fork
+cache, which the controller warms once before the workers start.
+"""
+import os
+import re
+import subprocess
+import time
+
+from brownie._config import CONFIG
+from rich.console import Console
+
+console = Console()
+
+WARM_TIMEOUT = 60
+
+
+def worker_index(config):
+    """
+    Index of this xdist worker ("gw3" -> 3), None when not running as a worker
+    """
+    workerinput = getattr(config, "workerinput", None)
+    if workerinput is None:
+        return None
+    return int(re.sub(r"\D", "", workerinput["workerid"]))
+
+
+def is_controller(config):
+    return worker_index(config) is None and bool(
+        getattr(config.option, "numprocesses", None)
+    )
+
+
+def active_network(config):
+    workerinput = getattr(config, "workerinput", {})
+    return (
+        workerinput.get("network")
+        or CONFIG.argv.get("network")
+        or CONFIG.settings["networks"]["default"]
+    )
+
+
+def fork_url(network, block=None):
+    """
+    Resolve the fork target of a development network to a url, pinned to block if given
+    """
+    fork = CONFIG.networks[network]["cmd_settings"].get("fork")
+    if fork in CONFIG.networks:
+        fork = CONFIG.networks[fork]["host"]
+    fork = os.path.expandvars(str(fork))
+    if block:
+        fork = "{}@{}".format(fork.split("@")[0], block)
+    return fork
+
+
+def configure(config):
+    """
+    Pin the fork of this process' node to FORK_BLOCK, warming the cache from the controller
+    """
+    network = active_network(config)
+    settings = CONFIG.networks[network].setdefault("cmd_settings", {})
+    block = os.getenv("FORK_BLOCK")
+
+    if block and settings.get("fork"):
+        settings["fork"] = fork_url(network, block)
+
+    if is_controller(config) and block and settings.get("fork"):
+        warm_fork_cache(settings["fork"], settings.get("port", 8545))
+
+
+def warm_fork_cache(fork, port, addresses=None):
+    """
+    Launch a single node at the pinned block and touch the state the suite needs,
+    so workers read it from the shared on-disk cache instead of the remote node
+    """
+    from web3 import Web3, HTTPProvider
+
+    if addresses is None:
+        addresses = suite_addresses()
+
+    process = subprocess.Popen(
+        ["ganache-cli", "--port", str(port), "--fork.url", fork],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        w3 = Web3(HTTPProvider("http://127.0.0.1:{}".format(port)))
+        deadline = time.time() + WARM_TIMEOUT
+        while not w3.isConnected():
+            if time.time() > deadline:
+                console.print("[red]Fork cache warm up timed out[/red]")
+                return
+            time.sleep(0.5)
+
+        for address in addresses:
+            address = Web3.toChecksumAddress(address)
+            w3.eth.getCode(address)
+            w3.eth.getBalance(address)
+            w3.eth.getStorageAt(address, 0)
+        console.print(
+            "[green]Warmed fork cache for[/green]", len(addresses), "addresses"
+        )
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def suite_addresses():
+    """
+    Every address hardcoded in the config and the strategy
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    found = set()
+    for path in ("_setup/config.py", "contracts/AuraBalStakerStrategy.sol"):
+        with open(os.path.join(root, path)) as f:
+            found.update(re.findall(r"0x[0-9a-fA-F]{40}(?![0-9a-fA-F])", f.read()))
+    return sorted(found)
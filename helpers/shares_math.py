@@ -1,9 +1,14 @@
-from dotmap import DotMap
+from collections import namedtuple
 
 """
   Set of functions to calculate shares burned, fees, and want withdrawn or deposited
 """
 
+ReportFees = namedtuple(
+    "ReportFees",
+    ["shares_perf_treasury", "shares_management", "shares_perf_strategist"],
+)
+
 MAX_BPS = 10_000
 SECS_PER_YEAR = 31_556_952
 
@@ -168,7 +173,7 @@ def get_report_fees(
         fee_in_want_strategist, new_total_supply, pool
     )
 
-    return DotMap(
+    return ReportFees(
         shares_perf_treasury=shares_perf_treasury,
         shares_management=shares_management,
         shares_perf_strategist=shares_perf_strategist,
@@ -0,0 +1,103 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from helpers.InvariantEngine import InvariantEngine
+from helpers.snapshot.snap import Snap
+
+# Snap values only, their keys are shared by all the records of the same layout
+Record = namedtuple(
+    "Record",
+    ["operation", "layout", "beforeBlock", "before", "afterBlock", "after", "params"],
+)
+
+
+class DeferredLog:
+    """
+    Compact log of (operation, before, after, params, tx) to verify after the scenario
+    """
+
+    def __init__(self):
+        # keys -> layout id, and layout id -> (keys, entityKeys)
+        self.layoutIds = {}
+        self.layouts = []
+        self.records = []
+        # Receipts stay in this process, records are sent to the verifying processes
+        self.txs = []
+
+    def append(self, operation, before, after, params, tx=None):
+        keys = tuple(before.data)
+        assert keys == tuple(after.data), "Snaps of different entities"
+        if keys not in self.layoutIds:
+            self.layoutIds[keys] = len(self.layouts)
+            self.layouts.append((keys, after.entityKeys))
+
+        self.records.append(
+            Record(
+                operation,
+                self.layoutIds[keys],
+                before.block,
+                tuple(before.data.values()),
+                after.block,
+                tuple(after.data.values()),
+                params,
+            )
+        )
+        self.txs.append(tx)
+
+    def snaps(self, record):
+        keys, entityKeys = self.layouts[record.layout]
+        return (
+            Snap(dict(zip(keys, record.before)), record.beforeBlock, entityKeys),
+            Snap(dict(zip(keys, record.after)), record.afterBlock, entityKeys),
+        )
+
+    def __iter__(self):
+        """
+        (operation, before, after, params, tx)
+        """
+        for record, tx in zip(self.records, self.txs):
+            before, after = self.snaps(record)
+            yield record.operation, before, after, record.params, tx
+
+    def __len__(self):
+        return len(self.records)
+
+    def clear(self):
+        self.__init__()
+
+    # ===== Verify =====
+
+    def evaluate(self, invariants, derived, processes=None):
+        """
+        All the invariant violations of the log, split across a process pool if given
+        """
+        layouts = [keys for keys, _ in self.layouts]
+        if not processes or len(self.records) < 2:
+            return evaluate_records(invariants, derived, layouts, self.records)
+
+        size = -(-len(self.records) // processes)
+        chunks = [
+            self.records[start : start + size]
+            for start in range(0, len(self.records), size)
+        ]
+        with ProcessPoolExecutor(processes) as pool:
+            results = pool.map(
+                evaluate_records,
+                *zip(*[(invariants, derived, layouts, chunk) for chunk in chunks])
+            )
+            return [violation for result in results for violation in result]
+
+
+def evaluate_records(invariants, derived, layouts, records):
+    engine = InvariantEngine(invariants, derived)
+    violations = []
+    for record in records:
+        violations += engine.evaluate_values(
+            record.operation,
+            layouts[record.layout],
+            record.before,
+            record.after,
+            record.params,
+            record.afterBlock,
+        )
+    return violations
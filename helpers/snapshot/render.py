@@ -0,0 +1,305 @@
+"""
+Renderers for snapshot tables and comparisons
+
+Rows are streamed to the renderer as the snap is walked: one row per metric for a
+table, one per changed metric for a comparison. The grid renderer prints the tabulate
+grids as before; JSONL, CSV and Arrow write one record per row with the raw values, so
+a monitoring pipeline consumes them without parsing console text:
+
+    kind, title, fromBlock, toBlock, key, before, after, diff
+
+A table row has its value in after, a comparison row has all three.
+Pick one with SnapshotManager(..., renderer=get_renderer("jsonl", "snaps.jsonl")) or
+SNAPSHOT_RENDERER / SNAPSHOT_OUTPUT in the environment
+"""
+import abc
+import atexit
+import csv
+import json
+import os
+import sys
+
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+FIELDS = ["kind", "title", "fromBlock", "toBlock", "key", "before", "after", "diff"]
+
+# (name, output path) -> renderer, every manager of the process appends to the same one
+_renderers = {}
+
+
+def delta(before, after):
+    if type(before) is int and type(after) is int:
+        return after - before
+    return None
+
+
+def records(kind, title, fromBlock, toBlock, rows):
+    """
+    Table rows (key, value) or comparison rows (key, before, after) as FIELDS dicts
+    """
+    for row in rows:
+        if kind == "table":
+            key, before, after = row[0], None, row[1]
+        else:
+            key, before, after = row
+        yield {
+            "kind": kind,
+            "title": title,
+            "fromBlock": fromBlock,
+            "toBlock": toBlock,
+            "key": key,
+            "before": before,
+            "after": after,
+            "diff": delta(before, after),
+        }
+
+
+class Renderer(abc.ABC):
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def table(self, title, block, rows, format):
+        """
+        rows: (key, value), format(key, value) for the human readable renderers
+        """
+        self.write(records("table", title, None, block, rows), format)
+
+    def compare(self, title, fromBlock, toBlock, rows, format):
+        """
+        rows: (key, before, after) of the changed keys
+        """
+        self.write(records("compare", title, fromBlock, toBlock, rows), format)
+
+    @abc.abstractmethod
+    def write(self, records, format):
+        """
+        records: FIELDS dicts of one table or comparison
+        """
+
+    def close(self):
+        pass
+
+
+class GridRenderer(Renderer):
+    """
+    The tabulate grids, rows are buffered per table as tabulate needs them all
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.console = Console(file=stream) if stream else console
+
+    def table(self, title, block, rows, format):
+        self.console.print("[green]=== {} ===[/green]".format(title))
+        super().table(title, block, rows, format)
+
+    def compare(self, title, fromBlock, toBlock, rows, format):
+        self.console.print(
+            "[green]=== {} {} -> {} ===[/green]".format(title, fromBlock, toBlock)
+        )
+        super().compare(title, fromBlock, toBlock, rows, format)
+
+    def write(self, records, format):
+        records = list(records)
+        if not records:
+            return
+        if records[0]["kind"] == "table":
+            table = [[r["key"], format(r["key"], r["after"])] for r in records]
+            table.append(["---------------", "--------------------"])
+            print(tabulate(table, headers=["metric", "value"]), file=self.stream)
+            return
+
+        table = [
+            [
+                r["key"],
+                format(r["key"], r["before"]),
+                format(r["key"], r["after"]),
+                format(r["key"], r["diff"]) if r["diff"] is not None else "-",
+            ]
+            for r in records
+        ]
+        print(
+            tabulate(
+                table, headers=["metric", "before", "after", "diff"], tablefmt="grid"
+            ),
+            file=self.stream,
+        )
+
+
+class JsonlRenderer(Renderer):
+    """
+    One JSON object per row, ints kept exact
+    """
+
+    def write(self, records, format):
+        stream = self.stream or sys.stdout
+        for record in records:
+            stream.write(json.dumps(record, default=str) + "\n")
+        stream.flush()
+
+
+class CsvRenderer(Renderer):
+    """
+    FIELDS columns, the header once per stream
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.writer = None
+
+    def write(self, records, format):
+        stream = self.stream or sys.stdout
+        if self.writer is None:
+            self.writer = csv.DictWriter(stream, fieldnames=FIELDS)
+            self.writer.writeheader()
+        for record in records:
+            self.writer.writerow(record)
+        stream.flush()
+
+
+class ArrowRenderer(Renderer):
+    """
+    An Arrow IPC stream, one record batch per table. Needs pyarrow
+    Values are strings, uint256 doesn't fit Arrow's integers
+    The stream is only valid once closed, get_renderer closes its renderers at exit
+    """
+
+    def __init__(self, stream):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("The arrow renderer needs pyarrow: pip install pyarrow")
+
+        super().__init__(stream)
+        self.pa = pyarrow
+        self.schema = pyarrow.schema(
+            [
+                (
+                    field,
+                    pyarrow.int64() if field.endswith("Block") else pyarrow.string(),
+                )
+                for field in FIELDS
+            ]
+        )
+        self.writer = pyarrow.ipc.new_stream(stream, self.schema)
+
+    def write(self, records, format):
+        columns = {field: [] for field in FIELDS}
+        for record in records:
+            for field in FIELDS:
+                value = record[field]
+                if value is not None and not field.endswith("Block"):
+                    value = str(value)
+                columns[field].append(value)
+        if columns["key"]:
+            self.writer.write_batch(
+                self.pa.record_batch(
+                    [columns[field] for field in FIELDS], schema=self.schema
+                )
+            )
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.stream.close()
+
+
+class RichRenderer(Renderer):
+    """
+    rich tables of the changed keys only: the changed rows of a comparison, and for
+    tables the keys whose value differs from the last table rendered
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.console = Console(file=stream) if stream else console
+        self.last = {}
+
+    def write(self, records, format):
+        from rich.table import Table
+
+        records = list(records)
+        if not records:
+            return
+        first = records[0]
+        if first["kind"] == "table":
+            table = Table(title="{} @ {}".format(first["title"], first["toBlock"]))
+            table.add_column("metric")
+            table.add_column("value", justify="right")
+            for r in records:
+                key, value = r["key"], r["after"]
+                if self.last.get(key) != value:
+                    table.add_row(key, str(format(key, value)))
+                self.last[key] = value
+            self.console.print(table)
+            return
+
+        table = Table(
+            title="{}: {} -> {}".format(
+                first["title"], first["fromBlock"], first["toBlock"]
+            )
+        )
+        for column in ["metric", "before", "after", "diff"]:
+            table.add_column(column, justify="left" if column == "metric" else "right")
+        for r in records:
+            key, diff = r["key"], r["diff"]
+            table.add_row(
+                key,
+                str(format(key, r["before"])),
+                str(format(key, r["after"])),
+                "-"
+                if diff is None
+                else "[{}]{}[/]".format(
+                    "green" if diff > 0 else "red", format(key, diff)
+                ),
+            )
+        self.console.print(table)
+
+
+RENDERERS = {
+    "grid": GridRenderer,
+    "jsonl": JsonlRenderer,
+    "csv": CsvRenderer,
+    "arrow": ArrowRenderer,
+    "rich": RichRenderer,
+}
+
+
+def get_renderer(name="grid", output=None):
+    """
+    Renderer by name, writing to the output path (stdout if none, arrow needs one)
+    An output is opened once per process, later calls get the same renderer
+    """
+    if name not in RENDERERS:
+        raise ValueError(
+            "Unknown renderer {}, one of {}".format(name, ", ".join(RENDERERS))
+        )
+    if output is None:
+        assert name != "arrow", "The arrow renderer needs an output file"
+        return RENDERERS[name]()
+
+    key = (name, os.path.abspath(output))
+    if key not in _renderers:
+        if not _renderers:
+            atexit.register(close_renderers)
+        if name == "arrow":
+            stream = open(output, "wb")
+        else:
+            stream = open(output, "w", newline="")
+        _renderers[key] = RENDERERS[name](stream)
+    return _renderers[key]
+
+
+def close_renderers():
+    """
+    Ends and closes the outputs opened by get_renderer
+    """
+    while _renderers:
+        _, renderer = _renderers.popitem()
+        renderer.close()
+        if not renderer.stream.closed:
+            renderer.stream.close()
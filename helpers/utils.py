@@ -1,3 +1,6 @@
+from helpers.fixed_point import format_fixed, token_decimals
+
+
 # Assert approximate integer
 def approx(actual, expected, percentage_threshold):
     print(actual, expected, percentage_threshold)
@@ -9,10 +12,9 @@ def approx(actual, expected, percentage_threshold):
 
 
 def val(amount=0, decimals=18, token=None):
-    # return amount
-    # return "{:,.0f}".format(amount)
     # If no token specified, use decimals
     if token:
-        decimals = interface.IERC20Detailed(token).decimals()
-
+        decimals = token_decimals(token)
+    if type(amount) is int:
+        return format_fixed(amount, decimals)
     return "{:,.18f}".format(amount / 10**decimals)
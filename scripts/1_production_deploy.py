@@ -6,7 +6,6 @@ from brownie import (
     AuraBalStakerStrategy,
     TheVault,
     AdminUpgradeabilityProxy,
-    interface,
 )
 
 from _setup.config import (
@@ -19,6 +18,7 @@ from _setup.config import (
 )
 
 from helpers.constants import AddressZero
+from helpers.RegistrySnapshot import RegistrySnapshot
 
 import click
 from rich.console import Console
@@ -40,8 +40,8 @@ def main():
     # Get deployer account from local keystore
     dev = connect_account()
 
-    # Get actors from registry
-    registry = interface.IBadgerRegistry(REGISTRY)
+    # Get actors from the registry snapshot (REGISTRY_REFRESH=1 to refresh it)
+    registry = RegistrySnapshot.load(REGISTRY)
 
     strategist = registry.get("governance")
     badgerTree = registry.get("badgerTree")
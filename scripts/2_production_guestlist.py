@@ -1,25 +1,22 @@
-import time
-
 from brownie import (
     accounts,
     network,
     AdminUpgradeabilityProxy,
     TheGuestlist,
-    interface,
     TheVault,
 )
 
 from _setup.config import REGISTRY
 
 from helpers.constants import AddressZero
+from helpers.RegistrySnapshot import RegistrySnapshot
+from helpers.TxPipeline import TxPipeline
 
 import click
 from rich.console import Console
 
 console = Console()
 
-sleep_between_tx = 1
-
 
 def main():
     """
@@ -30,7 +27,8 @@ def main():
     different guestlist parameters below.
     """
 
-    # NOTE: Input your vault address and guestlist parameters below:
+    # NOTE: Input your vault address and guestlist parameters below.
+    # Build the merkleRoot from a CSV of addresses with the guestlist_merkle script
     vaultAddr = "0x1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a"
     merkleRoot = "0x1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a"
     userCap = 2e18
@@ -40,8 +38,8 @@ def main():
     # vault's governance address in order to set its guestlist parameters.
     dev = connect_account()
 
-    # Get actors from registry
-    registry = interface.IBadgerRegistry(REGISTRY)
+    # Get actors from the registry snapshot (REGISTRY_REFRESH=1 to refresh it)
+    registry = RegistrySnapshot.load(REGISTRY)
 
     governance = registry.get("governance")
     proxyAdmin = registry.get("proxyAdminTimelock")
@@ -52,23 +50,31 @@ def main():
     # Deploy guestlist
     guestlist = deploy_guestlist(dev, proxyAdmin, vaultAddr)
 
-    # Set guestlist parameters
-    guestlist.setUserDepositCap(userCap, {"from": dev})
-    assert guestlist.userDepositCap() == userCap
-
-    guestlist.setTotalDepositCap(totalCap, {"from": dev})
-    assert guestlist.totalDepositCap() == totalCap
-
-    guestlist.setGuestRoot(merkleRoot, {"from": dev})
-    assert guestlist.guestRoot() == merkleRoot
-
-    # Transfers ownership of guestlist to Badger Governance
-    guestlist.transferOwnership(governance, {"from": dev})
-    assert guestlist.owner() == governance
-
-    # Sets guestlist on Vault (Requires dev == Vault's governance)
+    # Set guestlist parameters, transfer its ownership to Badger Governance and
+    # set it on the Vault (Requires dev == Vault's governance)
     vault = TheVault.at(vaultAddr)
-    vault.setGuestList(guestlist.address, {"from": dev})
+
+    pipeline = TxPipeline(dev)
+    pipeline.add(
+        guestlist, "userDepositCap()(uint256)", userCap, "setUserDepositCap", userCap
+    )
+    pipeline.add(
+        guestlist,
+        "totalDepositCap()(uint256)",
+        totalCap,
+        "setTotalDepositCap",
+        totalCap,
+    )
+    pipeline.add(
+        guestlist, "guestRoot()(bytes32)", merkleRoot, "setGuestRoot", merkleRoot
+    )
+    pipeline.add(
+        guestlist, "owner()(address)", governance, "transferOwnership", governance
+    )
+    pipeline.add(
+        vault, "guestList()(address)", guestlist, "setGuestList", guestlist.address
+    )
+    pipeline.run()
 
 
 def deploy_guestlist(dev, proxyAdmin, vaultAddr):
@@ -86,7 +92,6 @@ def deploy_guestlist(dev, proxyAdmin, vaultAddr):
         guestlist_logic.initialize.encode_input(*args),
         {"from": dev},
     )
-    time.sleep(sleep_between_tx)
 
     ## We delete from deploy and then fetch again so we can interact
     AdminUpgradeabilityProxy.remove(guestlist_proxy)
@@ -1,18 +1,16 @@
-import time
-
-from brownie import accounts, network, AuraBalStakerStrategy, TheVault, BadgerRegistry
+from brownie import accounts, network, AuraBalStakerStrategy, TheVault
 
 from config import WANT, REWARD_TOKEN, LP_COMPONENT, REGISTRY
 
 from helpers.constants import AddressZero
+from helpers.RegistrySnapshot import RegistrySnapshot
+from helpers.TxPipeline import TxPipeline
 
 import click
 from rich.console import Console
 
 console = Console()
 
-sleep_between_tx = 1
-
 
 def main():
     """
@@ -49,8 +47,8 @@ def main():
     console.print("[blue]Strategy: [/blue]", strategy.getName())
     console.print("[blue]Vault: [/blue]", vault.name())
 
-    # Get production addresses from registry
-    registry = BadgerRegistry.at(REGISTRY)
+    # Get production addresses from the cached registry snapshot
+    registry = RegistrySnapshot.load(REGISTRY)
 
     governance = registry.get("governance")
     guardian = registry.get("guardian")
@@ -82,61 +80,57 @@ def main():
 
 
 def set_parameters(dev, strategy, vault, governance, guardian, keeper, controller):
-    # Set Controller (deterministic)
-    if strategy.controller() != controller:
-        strategy.setController(controller, {"from": dev})
-        time.sleep(sleep_between_tx)
-    if vault.controller() != controller:
-        vault.setController(controller, {"from": dev})
-        time.sleep(sleep_between_tx)
+    pipeline = TxPipeline(dev)
 
-    console.print("[green]Controller existing or set at: [/green]", controller)
+    # Set Controller (deterministic)
+    pipeline.add(
+        strategy, "controller()(address)", controller, "setController", controller
+    )
+    pipeline.add(
+        vault, "controller()(address)", controller, "setController", controller
+    )
 
     # Set Fees
-    if strategy.performanceFeeGovernance() != 0:
-        strategy.setPerformanceFeeGovernance(0, {"from": dev})
-        time.sleep(sleep_between_tx)
-    if strategy.performanceFeeStrategist() != 0:
-        strategy.setPerformanceFeeStrategist(0, {"from": dev})
-        time.sleep(sleep_between_tx)
-    if strategy.withdrawalFee() != 10:
-        strategy.setWithdrawalFee(10, {"from": dev})
-        time.sleep(sleep_between_tx)
-
-    console.print("[green]Fees existing or set at: [/green]", "0, 0, 10")
+    pipeline.add(
+        strategy,
+        "performanceFeeGovernance()(uint256)",
+        0,
+        "setPerformanceFeeGovernance",
+        0,
+    )
+    pipeline.add(
+        strategy,
+        "performanceFeeStrategist()(uint256)",
+        0,
+        "setPerformanceFeeStrategist",
+        0,
+    )
+    pipeline.add(strategy, "withdrawalFee()(uint256)", 10, "setWithdrawalFee", 10)
 
     # Set permissioned accounts
-    if strategy.keeper() != keeper:
-        strategy.setKeeper(keeper, {"from": dev})
-        time.sleep(sleep_between_tx)
-    if vault.keeper() != keeper:
-        vault.setKeeper(keeper, {"from": dev})
-        time.sleep(sleep_between_tx)
+    pipeline.add(strategy, "keeper()(address)", keeper, "setKeeper", keeper)
+    pipeline.add(vault, "keeper()(address)", keeper, "setKeeper", keeper)
+    pipeline.add(strategy, "guardian()(address)", guardian, "setGuardian", guardian)
+    pipeline.add(vault, "guardian()(address)", guardian, "setGuardian", guardian)
+    pipeline.add(
+        strategy, "strategist()(address)", governance, "setStrategist", governance
+    )
 
-    console.print("[green]Keeper existing or set at: [/green]", keeper)
+    # Governance last, dev can't set anything else afterwards
+    pipeline.add(
+        strategy, "governance()(address)", governance, "setGovernance", governance
+    )
+    pipeline.add(
+        vault, "governance()(address)", governance, "setGovernance", governance
+    )
 
-    if strategy.guardian() != guardian:
-        strategy.setGuardian(guardian, {"from": dev})
-        time.sleep(sleep_between_tx)
-    if vault.guardian() != guardian:
-        vault.setGuardian(guardian, {"from": dev})
-        time.sleep(sleep_between_tx)
+    pipeline.run()
 
+    console.print("[green]Controller existing or set at: [/green]", controller)
+    console.print("[green]Fees existing or set at: [/green]", "0, 0, 10")
+    console.print("[green]Keeper existing or set at: [/green]", keeper)
     console.print("[green]Guardian existing or set at: [/green]", guardian)
-
-    if strategy.strategist() != governance:
-        strategy.setStrategist(governance, {"from": dev})
-        time.sleep(sleep_between_tx)
-
     console.print("[green]Strategist existing or set at: [/green]", governance)
-
-    if strategy.governance() != governance:
-        strategy.setGovernance(governance, {"from": dev})
-        time.sleep(sleep_between_tx)
-    if vault.governance() != governance:
-        vault.setGovernance(governance, {"from": dev})
-        time.sleep(sleep_between_tx)
-
     console.print("[green]Governance existing or set at: [/green]", governance)
 
 
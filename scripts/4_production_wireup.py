@@ -1,10 +1,8 @@
-import time
-
 from brownie import (
     accounts,
     network,
+    web3,
     Controller,
-    BadgerRegistry,
 )
 
 import click
@@ -12,12 +10,13 @@ from rich.console import Console
 
 from config import REGISTRY
 
+from helpers import multisend
 from helpers.constants import AddressZero
+from helpers.RegistrySnapshot import RegistrySnapshot
+from helpers.TxPipeline import TxPipeline
 
 console = Console()
 
-sleep_between_tx = 1
-
 
 def main():
     """
@@ -26,10 +25,10 @@ def main():
 
     This script is enabled to handle multiple sets of strategy + vault + want. It must be
     called from the controller's governance account.
-    """
 
-    # dev must be the controller's governance (get from keystore)
-    dev = connect_account()
+    If the governance is a Gnosis Safe, all the txs are batched into one MultiSend tx to be
+    signed on the Safe instead. On fork networks the batch is simulated first.
+    """
 
     # NOTE: Add the strategies, vaults and their corresponding wants
     # to the arrays below. It is very important that indexes are the
@@ -50,31 +49,94 @@ def main():
         "0x1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a1a",
     ]
 
-    # Get production controller from registry
-    registry = BadgerRegistry.at(REGISTRY)
+    # Get production controller from the cached registry snapshot
+    registry = RegistrySnapshot.load(REGISTRY)
     controllerAddr = registry.get("controller")
     assert controllerAddr != AddressZero
     controller = Controller.at(controllerAddr)
+    governance = controller.governance()
+
+    if len(web3.eth.getCode(governance)) > 0:
+        if not multisend.is_safe(governance):
+            console.print(
+                "[red]Governance is a contract but not a Gnosis Safe, aborting:[/red]",
+                governance,
+            )
+            return
+        # Reads only, the Safe signs
+        pipeline = wireup_pipeline(None, controller, strategies, vaults, wants)
+        propose_multisend(pipeline, governance)
+        return
 
-    # Wire up strategies
-    for strat in strategies:
-        want = wants[strategies.index(strat)]
-
-        controller.approveStrategy(want, strat, {"from": dev})
-        time.sleep(sleep_between_tx)
-        assert controller.approvedStrategies(want, strat) == True
-
-        controller.setStrategy(want, strat, {"from": dev})
-        time.sleep(sleep_between_tx)
-        assert controller.strategies(want) == strat
-
-    # Wire up vaults
-    for vault in vaults:
-        want = wants[vaults.index(vault)]
-
-        controller.setVault(want, vault, {"from": dev})
-        time.sleep(sleep_between_tx)
-        assert controller.vaults(want) == vault
+    # dev must be the controller's governance (get from keystore)
+    dev = connect_account()
+    pipeline = wireup_pipeline(dev, controller, strategies, vaults, wants)
+    pipeline.run()
+
+
+def wireup_pipeline(dev, controller, strategies, vaults, wants):
+    pipeline = TxPipeline(dev)
+    for strat, want in zip(strategies, wants):
+        pipeline.add(
+            controller,
+            ["approvedStrategies(address,address)(bool)", want, strat],
+            True,
+            "approveStrategy",
+            want,
+            strat,
+        )
+        # Requires the approval above to be mined before its gas can be estimated,
+        # withdrawing from the previous strategy makes it too variable to hard-code
+        pipeline.add(
+            controller,
+            ["strategies(address)(address)", want],
+            strat,
+            "setStrategy",
+            want,
+            strat,
+            dependent=True,
+        )
+
+    for vault, want in zip(vaults, wants):
+        pipeline.add(
+            controller,
+            ["vaults(address)(address)", want],
+            vault,
+            "setVault",
+            want,
+            vault,
+        )
+
+    return pipeline
+
+
+def propose_multisend(pipeline, safe):
+    """
+    Prints the Safe tx batching all the setters still needed
+    """
+    steps = pipeline.diff()
+    pipeline.print(steps)
+    if not steps:
+        return
+
+    txs = pipeline.calls(steps)
+    if "fork" in network.show_active():
+        multisend.simulate(safe, txs)
+        console.print("[green]MultiSend simulated on the fork[/green]")
+    else:
+        console.print(
+            "[yellow]Run on a fork network to simulate the batch first[/yellow]"
+        )
+
+    console.print("[blue]Safe tx for[/blue]", safe)
+    console.print(
+        {
+            "to": multisend.MULTISEND_CALL_ONLY,
+            "value": 0,
+            "operation": multisend.DELEGATECALL,
+            "data": "0x" + multisend.encode(txs).hex(),
+        }
+    )
 
 
 def connect_account():
@@ -1,165 +1,206 @@
-from brownie import network, BadgerRegistry, Controller, TheVault, web3
-from config import REGISTRY
+from brownie import network
+from _setup.config import REGISTRY
 from helpers.constants import AddressZero
+from helpers.multicall import Call, Multicall
+from helpers.RegistrySnapshot import RegistrySnapshot
+from helpers.rpc.batch import address_from_slot, get_storage_at
 from rich.console import Console
 
 console = Console()
 
 ADMIN_SLOT = int(0xB53127684A568B3173AE13B9F8A6016E243E63B6E8EE1178D6A717850B5D6103)
 
+# NOTE: Add all existing keys from your network's registry. For example:
+KEYS = [
+    "governance",
+    "guardian",
+    "keeper",
+    "controller",
+    "badgerTree",
+    "devGovernance",
+    "paymentsGovernance",
+    "governanceTimelock",
+    "proxyAdminDev",
+    "rewardsLogger",
+    "keeperAccessControl",
+    "proxyAdminDfdBadger",
+    "dfdBadgerSharedGovernance",
+]
+
+# NOTE: Add all authors from your network's registry. For example:
+AUTHORS = ["0xee8b29aa52dd5ff2559da2c50b1887adee257556"]
+
+# NOTE: Add the keys to all proxyAdmins from your network's registry paired to their owner
+PROXY_ADMIN_OWNERS = [
+    ["proxyAdminTimelock", "governanceTimelock"],
+    ["proxyAdminDev", "devGovernance"],
+    ["proxyAdminDfdBadger", "dfdBadgerSharedGovernance"],
+]
+
 
 def main():
     """
     Checks that the proxyAdmin of all conracts added to the BadgerRegistry match
     the proxyAdminTimelock address on the same registry. How to run:
 
-    1. Add all keys for the network's registry to the 'keys' array below.
+    1. Add all keys for the network's registry to the 'KEYS' array above.
 
-    2. Add all authors' addresses with vaults added to the registry into the 'authors' array below.
+    2. Add all authors' addresses with vaults added to the registry into the 'AUTHORS' array above.
 
-    3. Add all all keys for the proxyAdmins for the network's registry paired to their owners' keys.
+    3. Add all all keys for the proxyAdmins for the network's registry paired to their owners' keys to 'PROXY_ADMIN_OWNERS'.
 
     4. Run the script and review the console output.
+
+    The audit runs in a fixed number of round trips regardless of the number of vaults:
+    one multicall for the registry (cached, REGISTRY_REFRESH=1 to refresh it), two to
+    resolve vaults and strategies, and one JSON-RPC batch for all the storage slots.
     """
 
     console.print("You are using the", network.show_active(), "network")
+    return audit(REGISTRY, KEYS, AUTHORS, PROXY_ADMIN_OWNERS)
+
 
-    # Get production registry
-    registry = BadgerRegistry.at(REGISTRY)
+def audit(registryAddress, keys, authors, proxyAdminOwners, w3=None):
+    # 1. Registry keys and vault listings
+    ownerKeys = [key for pair in proxyAdminOwners for key in pair]
+    registry = RegistrySnapshot.load(
+        registryAddress, keys + ownerKeys + ["proxyAdminTimelock"], authors, w3=w3
+    )
+    addresses = {key: registry.get(key) for key in keys + ownerKeys}
+    addresses["proxyAdminTimelock"] = registry.get("proxyAdminTimelock")
+    vaults = registry.allVaults()
 
     # Get proxyAdminTimelock
-    proxyAdmin = registry.get("proxyAdminTimelock")
+    proxyAdmin = addresses["proxyAdminTimelock"]
     assert proxyAdmin != AddressZero
     console.print("[cyan]proxyAdminTimelock:[/cyan]", proxyAdmin)
 
-    # NOTE: Add all existing keys from your network's registry. For example:
-    keys = [
-        "governance",
-        "guardian",
-        "keeper",
-        "controller",
-        "badgerTree",
-        "devGovernance",
-        "paymentsGovernance",
-        "governanceTimelock",
-        "proxyAdminDev",
-        "rewardsLogger",
-        "keeperAccessControl",
-        "proxyAdminDfdBadger",
-        "dfdBadgerSharedGovernance",
-    ]
-
-    # NOTE: Add all authors from your network's registry. For example:
-    authors = ["0xee8b29aa52dd5ff2559da2c50b1887adee257556"]
+    # 2. Vault names, controllers and their strategies
+    vaultProxies, strategyProxies = resolve_vaults_and_strategies(vaults, w3)
 
-    # NOTE: Add the keys to all proxyAdmins from your network's registry paired to their owner
-    proxyAdminOwners = [
-        ["proxyAdminTimelock", "governanceTimelock"],
-        ["proxyAdminDev", "devGovernance"],
-        ["proxyAdminDfdBadger", "dfdBadgerSharedGovernance"],
+    # 3. All admin slots (and the proxyAdmins' owner slot) in one batch
+    keyProxies = [
+        (key, addresses[key]) for key in keys if addresses[key] != AddressZero
     ]
-
-    check_by_keys(registry, proxyAdmin, keys)
-    check_vaults_and_strategies(registry, proxyAdmin, authors)
-    check_proxy_admin_owners(proxyAdminOwners, registry)
-
-
-def check_by_keys(registry, proxyAdmin, keys):
+    adminProxies = keyProxies + vaultProxies + strategyProxies
+    admins = [addresses[pair[0]] for pair in proxyAdminOwners]
+
+    values = get_storage_at(
+        [(proxy, ADMIN_SLOT) for _, proxy in adminProxies]
+        + [(admin, 0) for admin in admins],
+        w3=w3,
+    )
+    slots = dict(zip(adminProxies, map(address_from_slot, values)))
+    owners = list(map(address_from_slot, values[len(adminProxies) :]))
+
+    # 4. Report
+    mismatches = 0
     console.print("[blue]Checking proxyAdmins by key...[/blue]")
-    # Check the proxyAdmin of the different proxy contracts
     for key in keys:
-        proxy = registry.get(key)
-        if proxy == AddressZero:
+        if addresses[key] == AddressZero:
             console.print(key, ":[red] key doesn't exist on the registry![/red]")
             continue
-        check_proxy_admin(proxy, proxyAdmin, key)
+        mismatches += check_proxy_admin(slots[(key, addresses[key])], proxyAdmin, key)
 
-
-def check_vaults_and_strategies(registry, proxyAdmin, authors):
     console.print("[blue]Checking proxyAdmins from vaults and strategies...[/blue]")
+    for name, proxy in vaultProxies + strategyProxies:
+        mismatches += check_proxy_admin(slots[(name, proxy)], proxyAdmin, name)
 
-    vaultStatus = [0, 1, 2]
+    console.print("[blue]Checking proxyAdmins' owners...[/blue]")
+    for adminOwnerPair, address in zip(proxyAdminOwners, owners):
+        mismatches += check_proxy_admin_owner(
+            adminOwnerPair, address, addresses[adminOwnerPair[1]]
+        )
 
-    vaults = []
-    strategies = []
-    stratNames = []
+    return mismatches
 
-    # get vaults by author
-    for author in authors:
-        vaults += registry.getVaults("v1", author)
-        vaults += registry.getVaults("v2", author)
 
-    # Get promoted vaults
-    for status in vaultStatus:
-        vaults += registry.getFilteredProductionVaults("v1", status)
-        vaults += registry.getFilteredProductionVaults("v2", status)
+def resolve_vaults_and_strategies(vaults, w3=None):
+    """
+    Returns [(name, address)] for the vaults and for their strategies, in two multicalls
+    """
+    calls = []
+    for vault in vaults:
+        for getter in ["controller()(address)", "token()(address)", "name()(string)"]:
+            calls.append(
+                Call(vault, getter, [[vault + "." + getter.split("(")[0], None]])
+            )
+    data = Multicall(calls, w3, require_success=False)()
 
-    # Get strategies from vaults and check vaults' proxyAdmins
+    vaultProxies = []
+    strategyCalls = []
     for vault in vaults:
-        try:
-            vaultContract = TheVault.at(vault)
-            # get Controller
-            controller = Controller.at(vaultContract.controller())
-            strategies.append(controller.strategies(vaultContract.token()))
-            stratNames.append(vaultContract.name().replace("Badger Sett ", "Strategy "))
-            # Check vault proxyAdmin
-
-            check_proxy_admin(vault, proxyAdmin, vaultContract.name())
-        except Exception as error:
-            print("Something went wrong")
-            print(error)
-
-    for strat in strategies:
-        try:
-            # Check strategies' proxyAdmin
-            check_proxy_admin(strat, proxyAdmin, stratNames[strategies.index(strat)])
-        except Exception as error:
-            print("Something went wrong")
-            print(error)
-
-
-def check_proxy_admin(proxy, proxyAdmin, key):
-    # Get proxyAdmin address form the proxy's ADMIN_SLOT
-    val = web3.eth.getStorageAt(proxy, ADMIN_SLOT).hex()
-    address = "0x" + val[26:66]
+        controller = data.get(vault + ".controller")
+        token = data.get(vault + ".token")
+        name = data.get(vault + ".name")
+        if controller is None or token is None or name is None:
+            console.print("Something went wrong")
+            console.print("Unable to resolve vault", vault)
+            continue
+
+        vaultProxies.append((name, vault))
+        strategyCalls.append(
+            Call(
+                controller,
+                ["strategies(address)(address)", token],
+                [[vault, None]],
+            )
+        )
+
+    strategies = Multicall(strategyCalls, w3, require_success=False)()
 
+    strategyProxies = []
+    for name, vault in vaultProxies:
+        if vault not in strategies:
+            console.print("Something went wrong")
+            console.print("Unable to resolve strategy for", name)
+            continue
+        strategyProxies.append(
+            (name.replace("Badger Sett ", "Strategy "), strategies[vault])
+        )
+
+    return vaultProxies, strategyProxies
+
+
+def check_proxy_admin(address, proxyAdmin, key):
+    """
+    Prints the result for the admin found on a proxy's ADMIN_SLOT, returns 1 on mismatch
+    """
     # Check differnt possible scenarios
     if address == AddressZero:
         console.print(key, ":[red] admin not found on slot (GnosisSafeProxy?)[/red]")
-    elif address != proxyAdmin:
+        return 1
+    elif address != proxyAdmin.lower():
         console.print(
             key, ":[red] admin is different to proxyAdminTimelock[/red] - ", address
         )
+        return 1
     else:
-        assert address == proxyAdmin
         console.print(key, ":[green] admin matches proxyAdminTimelock![/green]")
+        return 0
 
 
-def check_proxy_admin_owners(proxyAdminOwners, registry):
-    console.print("[blue]Checking proxyAdmins' owners...[/blue]")
-
-    for adminOwnerPair in proxyAdminOwners:
-        proxyAdmin = registry.get(adminOwnerPair[0])
-        owner = registry.get(adminOwnerPair[1])
-        # Get proxyAdmin's owner address from slot 0
-        val = web3.eth.getStorageAt(proxyAdmin, 0).hex()
-        address = "0x" + val[26:66]
-
-        # Check differnt possible scenarios
-        if address == AddressZero:
-            console.print(adminOwnerPair[0], ":[red] no address found at slot 0![/red]")
-        elif address != owner:
-            console.print(
-                adminOwnerPair[0],
-                ":[red] owner is different to[/red]",
-                adminOwnerPair[1],
-                "-",
-                address,
-            )
-        else:
-            assert address == owner
-            console.print(
-                adminOwnerPair[0],
-                ":[green] owner matches[/green]",
-                adminOwnerPair[1],
-            )
+def check_proxy_admin_owner(adminOwnerPair, address, owner):
+    """
+    Prints the result for the owner found on a proxyAdmin's slot 0, returns 1 on mismatch
+    """
+    # Check differnt possible scenarios
+    if address == AddressZero:
+        console.print(adminOwnerPair[0], ":[red] no address found at slot 0![/red]")
+        return 1
+    elif address != owner.lower():
+        console.print(
+            adminOwnerPair[0],
+            ":[red] owner is different to[/red]",
+            adminOwnerPair[1],
+            "-",
+            address,
+        )
+        return 1
+    else:
+        console.print(
+            adminOwnerPair[0],
+            ":[green] owner matches[/green]",
+            adminOwnerPair[1],
+        )
+        return 0
@@ -1,17 +1,42 @@
-from brownie import network, BadgerRegistry, Controller, interface, web3
-from config import REGISTRY
+from functools import lru_cache
+
+from brownie import network
+from _setup.config import REGISTRY
+from eth_utils import keccak
 from helpers.constants import AddressZero
+from helpers.multicall import Call, Multicall
+from helpers.RegistrySnapshot import RegistrySnapshot
 from rich.console import Console
 from tabulate import tabulate
 
 console = Console()
 
-DEFAULT_ADMIN_ROLE = (
-    "0x0000000000000000000000000000000000000000000000000000000000000000"
-)
+DEFAULT_ADMIN_ROLE = bytes(32)
 
 tableHead = ["Role", "MemberCount", "Address"]
 
+# NOTE: Add keys to check paired to the key of their expected DEFAULT_ADMIN_ROLE:
+KEYS_WITH_ADMINS = [
+    ["badgerTree", "governance"],
+    ["BadgerRewardsManager", "governance"],
+    ["rewardsLogger", "governance"],
+    ["keeper", "devGovernance"],
+]
+
+# NOTE: Add all the roles related to the keys to check from the previous array. Indexes must match!
+ROLES = [
+    [
+        "DEFAULT_ADMIN_ROLE",
+        "ROOT_PROPOSER_ROLE",
+        "ROOT_VALIDATOR_ROLE",
+        "PAUSER_ROLE",
+        "UNPAUSER_ROLE",
+    ],
+    ["DEFAULT_ADMIN_ROLE", "SWAPPER_ROLE", "DISTRIBUTOR_ROLE"],
+    ["DEFAULT_ADMIN_ROLE", "MANAGER_ROLE"],
+    ["DEFAULT_ADMIN_ROLE", "EARNER_ROLE", "HARVESTER_ROLE", "TENDER_ROLE"],
+]
+
 
 def main():
     """
@@ -19,111 +44,177 @@ def main():
     the proxyAdminTimelock address on the same registry. How to run:
 
     1. Add all keys to check paired to the key of the expected DEFAULT_ADMIN_ROLE to the
-       'keysWithAdmins' array.
+       'KEYS_WITH_ADMINS' array above.
 
     2. Add an array with all the expected roles belonging to each one of the keyed contracts
-       added on the previous step to the 'roles' array. The index of the key must match the index
+       added on the previous step to the 'ROLES' array. The index of the key must match the index
        of its roles array.
 
     3. Additionally, the script will check that the controller's governance and strategist match
        the Badger's production configuration addresses.
 
     4. Run the script and analyze the printed results.
+
+    The audit runs in three multicalls regardless of the number of roles and members:
+    registry keys (cached, REGISTRY_REFRESH=1 to refresh them), member counts of every
+    (contract, role) and then every member.
     """
 
     console.print("You are using the", network.show_active(), "network")
 
-    # Get production registry
-    registry = BadgerRegistry.at(REGISTRY)
+    return audit(REGISTRY, KEYS_WITH_ADMINS, ROLES)
+
+
+def audit(registryAddress, keysWithAdmins, roles, w3=None):
+    """
+    Returns {"members": {key: {role: [address]}}, "mismatches": [{...}]}
+    """
+    assert len(keysWithAdmins) == len(roles)
 
-    # NOTE: Add keys to check paired to the key of their expected DEFAULT_ADMIN_ROLE:
-    keysWithAdmins = [
-        ["badgerTree", "governance"],
-        ["BadgerRewardsManager", "governance"],
-        ["rewardsLogger", "governance"],
-        ["keeper", "devGovernance"],
+    keys = [key for pair in keysWithAdmins for key in pair]
+    keys += ["controller", "governance", "governanceTimelock"]
+    registry = RegistrySnapshot.load(registryAddress, keys, w3=w3)
+    addresses = {key: registry.get(key) for key in keys}
+
+    members = get_role_members(addresses, keysWithAdmins, roles, w3)
+    mismatches = check_roles(addresses, keysWithAdmins, roles, members)
+    mismatches += check_controller_roles(addresses, w3)
+
+    return {"members": members, "mismatches": mismatches}
+
+
+def get_role_members(addresses, keysWithAdmins, roles, w3=None):
+    """
+    Returns {key: {role: [address]}} in two multicalls: all member counts, then all members
+    Roles whose count can't be read (not an AccessControl contract) map to None
+    """
+    pairs = [
+        (key, role)
+        for (key, _), keyRoles in zip(keysWithAdmins, roles)
+        if addresses[key] != AddressZero
+        for role in keyRoles
     ]
 
-    # NOTE: Add all the roles related to the keys to check from the previous array. Indexes must match!
-    roles = [
+    counts = Multicall(
         [
-            "DEFAULT_ADMIN_ROLE",
-            "ROOT_PROPOSER_ROLE",
-            "ROOT_VALIDATOR_ROLE",
-            "PAUSER_ROLE",
-            "UNPAUSER_ROLE",
+            Call(
+                addresses[key],
+                ["getRoleMemberCount(bytes32)(uint256)", role_hash(role)],
+                [[(key, role), None]],
+            )
+            for key, role in pairs
         ],
-        ["DEFAULT_ADMIN_ROLE", "SWAPPER_ROLE", "DISTRIBUTOR_ROLE"],
-        ["DEFAULT_ADMIN_ROLE", "MANAGER_ROLE"],
-        ["DEFAULT_ADMIN_ROLE", "EARNER_ROLE", "HARVESTER_ROLE", "TENDER_ROLE"],
+        w3,
+        require_success=False,
+    )()
+
+    memberCalls = [
+        Call(
+            addresses[key],
+            ["getRoleMember(bytes32,uint256)(address)", role_hash(role), i],
+            [[(key, role, i), None]],
+        )
+        for key, role in pairs
+        for i in range(counts.get((key, role), 0))
     ]
+    found = Multicall(memberCalls, w3)() if memberCalls else {}
 
-    assert len(keysWithAdmins) == len(roles)
-
-    check_roles(registry, keysWithAdmins, roles)
-    check_controller_roles(registry)
-
+    members = {}
+    for key, role in pairs:
+        count = counts.get((key, role))
+        members.setdefault(key, {})[role] = (
+            None if count is None else [found[(key, role, i)] for i in range(count)]
+        )
+    return members
 
-def check_roles(registry, keysWithAdmins, roles):
-    for key in keysWithAdmins:
-        console.print("[blue]Checking roles for[/blue]", key[0])
 
-        # Get contract address
-        contract = registry.get(key[0])
-        admin = registry.get(key[1])
+def check_roles(addresses, keysWithAdmins, roles, members):
+    """
+    Prints the role members of each key, returns the DEFAULT_ADMIN_ROLE mismatches
+    """
+    mismatches = []
+    for (key, adminKey), keyRoles in zip(keysWithAdmins, roles):
+        console.print("[blue]Checking roles for[/blue]", key)
 
-        if contract == AddressZero:
+        if addresses[key] == AddressZero:
             console.print("[red]Key not found on registry![/red]")
+            mismatches.append(
+                {"key": key, "role": None, "expected": None, "found": AddressZero}
+            )
             continue
 
+        admin = addresses[adminKey]
         tableData = []
 
-        accessControl = interface.IAccessControl(contract)
-
-        keyRoles = roles[keysWithAdmins.index(key)]
-        hashes = get_roles_hashes(keyRoles)
-
         for role in keyRoles:
-            roleHash = hashes[keyRoles.index(role)]
-            roleMemberCount = accessControl.getRoleMemberCount(roleHash)
-            if roleMemberCount == 0:
+            roleMembers = members[key][role]
+            if roleMembers is None:
+                tableData.append([role, "-", "Unable to read this role"])
+                continue
+            if not roleMembers:
                 tableData.append([role, "-", "No Addresses found for this role"])
-            else:
-                for memberNumber in range(roleMemberCount):
-                    memberAddress = accessControl.getRoleMember(roleHash, memberNumber)
-                    if role == "DEFAULT_ADMIN_ROLE":
-                        if memberAddress == admin:
-                            console.print(
-                                "[green]DEFAULT_ADMIN_ROLE matches[/green]",
-                                key[1],
-                                admin,
-                            )
-                        else:
-                            console.print(
-                                "[red]DEFAULT_ADMIN_ROLE doesn't match[/red]",
-                                key[1],
-                                admin,
-                            )
-                    tableData.append([role, memberNumber, memberAddress])
+            for memberNumber, memberAddress in enumerate(roleMembers):
+                tableData.append([role, memberNumber, memberAddress])
+
+            if role != "DEFAULT_ADMIN_ROLE":
+                continue
+            # Every admin other than the expected one is a mismatch
+            for memberAddress in roleMembers:
+                if memberAddress.lower() == admin.lower():
+                    console.print(
+                        "[green]DEFAULT_ADMIN_ROLE matches[/green]", adminKey, admin
+                    )
+                else:
+                    console.print(
+                        "[red]DEFAULT_ADMIN_ROLE doesn't match[/red]", adminKey, admin
+                    )
+                    mismatches.append(
+                        {
+                            "key": key,
+                            "role": role,
+                            "expected": admin,
+                            "found": memberAddress,
+                        }
+                    )
+            # The expected admin has to hold the role too, even if nobody else does
+            if admin.lower() not in [member.lower() for member in roleMembers]:
+                console.print(
+                    "[red]DEFAULT_ADMIN_ROLE is missing[/red]", adminKey, admin
+                )
+                mismatches.append(
+                    {"key": key, "role": role, "expected": admin, "found": None}
+                )
 
         print(tabulate(tableData, tableHead, tablefmt="grid"))
 
+    return mismatches
 
-def check_controller_roles(registry):
+
+def check_controller_roles(addresses, w3=None):
+    """
+    Checks the controller's governance and strategist, returns the mismatches
+    """
     console.print("[blue]Checking roles for Controller...[/blue]")
 
-    controllerAddress = registry.get("controller")
-    governance = registry.get("governance")
-    governanceTimelock = registry.get("governanceTimelock")
+    controllerAddress = addresses["controller"]
+    governance = addresses["governance"]
+    governanceTimelock = addresses["governanceTimelock"]
 
     assert controllerAddress != AddressZero
     assert governance != AddressZero
     assert governanceTimelock != AddressZero
 
-    controller = Controller.at(controllerAddress)
+    controller = Multicall(
+        [
+            Call(controllerAddress, "governance()(address)", [["governance", None]]),
+            Call(controllerAddress, "strategist()(address)", [["strategist", None]]),
+        ],
+        w3,
+    )()
 
+    mismatches = []
     # Check governance
-    if controller.governance() == governanceTimelock:
+    if controller["governance"].lower() == governanceTimelock.lower():
         console.print(
             "[green]controller.governance() matches governanceTimelock -[/green]",
             governanceTimelock,
@@ -131,26 +222,40 @@ def check_controller_roles(registry):
     else:
         console.print(
             "[red]controller.governance() doesn't match governanceTimelock -[/red]",
-            controller.governance(),
+            controller["governance"],
+        )
+        mismatches.append(
+            {
+                "key": "controller",
+                "role": "governance",
+                "expected": governanceTimelock,
+                "found": controller["governance"],
+            }
         )
     # Check strategist
-    if controller.strategist() == governance:
+    if controller["strategist"].lower() == governance.lower():
         console.print(
             "[green]controller.strategist() matches governance -[/green]", governance
         )
     else:
         console.print(
             "[red]controller.strategist() doesn't match governance -[/red]",
-            controller.strategist(),
+            controller["strategist"],
+        )
+        mismatches.append(
+            {
+                "key": "controller",
+                "role": "strategist",
+                "expected": governance,
+                "found": controller["strategist"],
+            }
         )
 
+    return mismatches
 
-def get_roles_hashes(roles):
-    hashes = []
-    for role in roles:
-        if role == "DEFAULT_ADMIN_ROLE":
-            hashes.append(DEFAULT_ADMIN_ROLE)
-        else:
-            hashes.append(web3.keccak(text=role).hex())
 
-    return hashes
+@lru_cache(maxsize=None)
+def role_hash(role):
+    if role == "DEFAULT_ADMIN_ROLE":
+        return DEFAULT_ADMIN_ROLE
+    return keccak(text=role)
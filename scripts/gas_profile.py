@@ -0,0 +1,204 @@
+import json
+import subprocess
+
+from brownie import (
+    accounts,
+    chain,
+    network,
+    interface,
+    AuraBalStakerStrategy,
+    TheVault,
+)
+
+from _setup.config import (
+    WANT,
+    WHALE_ADDRESS,
+    PERFORMANCE_FEE_GOVERNANCE,
+    PERFORMANCE_FEE_STRATEGIST,
+    WITHDRAWAL_FEE,
+    MANAGEMENT_FEE,
+)
+
+from helpers.constants import MaxUint256
+from helpers.time import days
+
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+# Time the rewards accrue before harvesting (seconds)
+REWARD_PERIODS = [3600, days(1), days(7)]
+
+# minBbaUsdHarvest values: 0 always takes the bb-a-USD -> WETH batch swap, MaxUint256 never does
+BBA_USD_ROUTES = {"swap": 0, "skip": int(MaxUint256)}
+
+
+def main(output="gas_profile.json"):
+    """
+    FOR LOCAL / FORK NETWORKS ONLY
+    Profiles gas of harvest() over a grid of reward sizes and branches, and of deposit,
+    withdraw and withdrawAll (claimRewardsOnWithdrawAll on and off).
+
+    brownie run gas_profile --network mainnet-fork
+    """
+    assert network.show_active() != "mainnet"
+
+    deployer, governance, keeper = accounts[0], accounts[1], accounts[2]
+    vault, strategy, want = deploy(deployer, governance, keeper)
+
+    depositAmount = want.balanceOf(deployer) // 2
+    want.approve(vault, MaxUint256, {"from": deployer})
+
+    rows = []
+
+    def record(scenario, operation, tx):
+        rows.append({"scenario": scenario, "operation": operation, "gas": tx.gas_used})
+
+    # Nothing staked: no rewards, every harvest branch is skipped
+    chain.snapshot()
+    record("empty", "harvest", strategy.harvest({"from": keeper}))
+    chain.revert()
+
+    record("-", "deposit", vault.deposit(depositAmount, {"from": deployer}))
+    record("-", "earn", vault.earn({"from": keeper}))
+    chain.snapshot()
+
+    for period in REWARD_PERIODS:
+        for minBbaUsd in BBA_USD_ROUTES.values():
+            chain.revert()
+            strategy.setMinBbaUsdHarvest(minBbaUsd, {"from": governance})
+            chain.sleep(period)
+            chain.mine()
+
+            bbaUsd = interface.IERC20(strategy.BB_A_USD())
+            # BAL, AURA, then one entry per extra reward (BB-A-USD among them)
+            earned = dict(strategy.balanceOfRewards())
+            # Held plus claimed on harvest, swapped only above the minimum
+            bbaUsdHarvested = bbaUsd.balanceOf(strategy) + earned.get(bbaUsd.address, 0)
+            scenario = "{}s, bbaUsd {}, bal {}".format(
+                period,
+                "swap" if bbaUsdHarvested > minBbaUsd else "skip",
+                "join" if earned.get(strategy.BAL(), 0) > 0 else "skip",
+            )
+            tx = strategy.harvest({"from": keeper})
+            record(scenario, "harvest", tx)
+            console.print(
+                scenario,
+                "- bbaUsd left:",
+                bbaUsd.balanceOf(strategy),
+                "gas:",
+                tx.gas_used,
+            )
+
+    chain.revert()
+    chain.sleep(days(1))
+    chain.mine()
+    record(
+        "-",
+        "withdraw",
+        vault.withdraw(vault.balanceOf(deployer) // 2, {"from": deployer}),
+    )
+
+    for claim in [True, False]:
+        chain.revert()
+        chain.sleep(days(1))
+        chain.mine()
+        strategy.setClaimRewardsOnWithdrawAll(claim, {"from": governance})
+        record(
+            "claimRewardsOnWithdrawAll={}".format(claim),
+            "withdrawAll",
+            vault.withdrawToVault({"from": governance}),
+        )
+
+    chain.revert()
+
+    print(
+        tabulate(
+            [[r["scenario"], r["operation"], r["gas"]] for r in rows],
+            headers=["scenario", "operation", "gas"],
+            tablefmt="grid",
+        )
+    )
+
+    with open(output, "w") as f:
+        json.dump({"revision": revision(), "results": rows}, f, indent=2)
+    console.print("[green]Gas profile written to[/green]", output)
+
+    return rows
+
+
+def deploy(deployer, governance, keeper):
+    want = interface.IERC20Detailed(WANT)
+    whale = accounts.at(WHALE_ADDRESS, force=True)
+    want.transfer(deployer, want.balanceOf(whale) // 4, {"from": whale})
+
+    vault = TheVault.deploy({"from": deployer})
+    vault.initialize(
+        want,
+        governance,
+        keeper,
+        governance,
+        governance,
+        governance,
+        governance,
+        "",
+        "",
+        [
+            PERFORMANCE_FEE_GOVERNANCE,
+            PERFORMANCE_FEE_STRATEGIST,
+            WITHDRAWAL_FEE,
+            MANAGEMENT_FEE,
+        ],
+        {"from": deployer},
+    )
+
+    strategy = AuraBalStakerStrategy.deploy({"from": deployer})
+    strategy.initialize(vault, {"from": deployer})
+    vault.setStrategy(strategy, {"from": governance})
+
+    return vault, strategy, want
+
+
+def revision():
+    """
+    Contracts revision the profile was taken at, to compare profiles across revisions
+    """
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "--short", "HEAD"])
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after):
+    """
+    Prints the gas difference between two profiles, e.g. from two contract revisions
+
+    brownie run gas_profile compare old.json new.json
+    """
+    with open(before) as f:
+        a = json.load(f)
+    with open(after) as f:
+        b = json.load(f)
+
+    previous = {(r["scenario"], r["operation"]): r["gas"] for r in a["results"]}
+    table = []
+    for r in b["results"]:
+        old = previous.get((r["scenario"], r["operation"]))
+        diff = r["gas"] - old if old is not None else "-"
+        table.append([r["scenario"], r["operation"], old, r["gas"], diff])
+
+    console.print(
+        "[green]=== Gas: {} -> {} ===[/green]".format(a["revision"], b["revision"])
+    )
+    print(
+        tabulate(
+            table,
+            headers=["scenario", "operation", "before", "after", "diff"],
+            tablefmt="grid",
+        )
+    )
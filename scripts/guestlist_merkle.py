@@ -0,0 +1,111 @@
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from brownie import TheGuestlist
+
+from helpers import merkle
+
+from rich.console import Console
+
+console = Console()
+
+
+def main(addresses="guestlist.csv", output="guestlist.tree"):
+    """
+    Builds the guestlist merkle tree from the first column of a CSV of addresses
+    Use the printed root as merkleRoot on 2_production_guestlist.py
+
+    brownie run guestlist_merkle main guests.csv guests.tree
+    """
+    root = merkle.build(merkle.read_addresses(addresses), output)
+    tree = merkle.MerkleTree(output)
+    console.print("[green]Guests:[/green]", tree.size)
+    console.print("[green]Merkle root:[/green]", "0x" + root.hex())
+    tree.close()
+    return "0x" + root.hex()
+
+
+def verify(tree="guestlist.tree", guestlist=None, sample=100):
+    """
+    Checks the tree root against the deployed guestRoot() and a sample of its proofs
+
+    brownie run guestlist_merkle verify guests.tree 0xGuestlist --network mainnet
+    """
+    tree = merkle.MerkleTree(tree)
+    ok = True
+
+    if guestlist:
+        guestRoot = TheGuestlist.at(guestlist).guestRoot()
+        if bytes(guestRoot) == tree.root:
+            console.print("[green]guestRoot() matches the tree[/green]")
+        else:
+            console.print("[red]guestRoot() doesn't match the tree[/red]", guestRoot)
+            ok = False
+
+    for index in random.sample(range(tree.size), min(int(sample), tree.size)):
+        node = tree.node(0, index)
+        proof = tree.proof_at(index)
+        if not merkle.verify(proof, tree.root, node):
+            console.print("[red]Invalid proof for leaf[/red]", "0x" + node.hex())
+            ok = False
+
+    tree.close()
+    return ok
+
+
+def serve(tree="guestlist.tree", port=8080):
+    """
+    Serves proofs from the tree file over HTTP
+    GET /root -> {"root"}
+    GET /proof/<address> -> {"address", "proof"}, 404 if not a guest
+
+    brownie run guestlist_merkle serve guests.tree 8080
+    """
+    tree = merkle.MerkleTree(tree)
+    root = "0x" + tree.root.hex()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts == ["root"]:
+                self.reply(200, {"root": root})
+            elif len(parts) == 2 and parts[0] == "proof":
+                try:
+                    proof = tree.proof(parts[1])
+                except ValueError:
+                    proof = None
+                if proof is None:
+                    self.reply(404, {"error": "not a guest"})
+                else:
+                    self.reply(
+                        200,
+                        {
+                            "address": parts[1],
+                            "root": root,
+                            "proof": ["0x" + node.hex() for node in proof],
+                        },
+                    )
+            else:
+                self.reply(404, {"error": "not found"})
+
+        def reply(self, status, body):
+            encoded = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", int(port)), Handler)
+    console.print("[blue]Serving proofs for root[/blue]", root, "on port", port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        tree.close()
@@ -0,0 +1,34 @@
+from brownie import web3
+
+from helpers.HarvestSimulator import HarvestSimulator
+from helpers.utils import val
+
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+
+def main(strategy, keeper, timestamp=None, trace=True):
+    """
+    Prints what harvest() would report and distribute now, without sending a tx
+    timestamp runs it at a later block time, trace=false for nodes without debug_traceCall
+
+    brownie run harvest_preview main 0xStrategy 0xKeeper --network mainnet
+    brownie run harvest_preview main 0xStrategy 0xKeeper 1700000000 --network mainnet
+    """
+    trace = str(trace).lower() not in ("false", "0", "no")
+    timestamp = int(timestamp) if timestamp is not None else None
+
+    simulator = HarvestSimulator(strategy, keeper, web3)
+    prediction = simulator.simulate(timestamp=timestamp, trace=trace)
+
+    console.print("[blue]Harvest at block[/blue]", prediction.block)
+    rows = [["harvest()", token, val(amount)] for token, amount in prediction.harvested]
+    for name, events in (
+        ("Harvested", prediction.reported),
+        ("TreeDistribution", prediction.distributed),
+    ):
+        rows += [[name, token, val(amount)] for token, amount in events or []]
+    print(tabulate(rows, headers=["source", "token", "amount"], tablefmt="grid"))
+    return prediction
@@ -0,0 +1,132 @@
+import asyncio
+import importlib
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from brownie._config import CONFIG
+from web3 import HTTPProvider, Web3
+
+from _setup.config import REGISTRY
+
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+# Live networks (brownie ids) of the chains in MULTICALL_ADDRESSES
+NETWORKS = ["mainnet", "ftm-main", "bsc-main", "polygon-main", "arbitrum-main"]
+
+TIMEOUT = 60
+
+
+def main(*networks):
+    """
+    Runs the proxy (5) and roles (6) production checks on several networks at once,
+    each against its own provider, and prints one combined report.
+    Exits with 1 if any check finds a mismatch or fails.
+
+    brownie run ops_check main
+    brownie run ops_check main mainnet ftm-main
+    """
+    networks = list(networks) or NETWORKS
+    results = asyncio.run(check_networks(networks))
+
+    for result in results:
+        console.print("[blue]===== {} =====[/blue]".format(result["network"]))
+        print(result["output"])
+
+    print(
+        tabulate(
+            [
+                [
+                    r["network"],
+                    r["chainId"],
+                    r["block"],
+                    r["proxyMismatches"],
+                    r["roleMismatches"],
+                    r["error"] or "-",
+                ]
+                for r in results
+            ],
+            headers=["network", "chainId", "block", "proxies", "roles", "error"],
+            tablefmt="grid",
+        )
+    )
+
+    failed = [
+        r["network"]
+        for r in results
+        if r["error"] or r["proxyMismatches"] or r["roleMismatches"]
+    ]
+    if failed:
+        console.print("[red]Mismatches found on:[/red]", ", ".join(failed))
+        sys.exit(1)
+    console.print("[green]All networks match![/green]")
+
+
+async def check_networks(networks):
+    """
+    web3 (v5) calls are blocking, so each network runs in its own process and
+    the event loop only waits on all of them: the audit takes as long as the slowest chain
+    """
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=len(networks)) as pool:
+        return await asyncio.gather(
+            *[
+                loop.run_in_executor(pool, check_network, network)
+                for network in networks
+            ]
+        )
+
+
+def check_network(network):
+    """
+    Both audits for one network. Their console output is captured so reports don't interleave
+    """
+    result = {
+        "network": network,
+        "chainId": None,
+        "block": None,
+        "proxyMismatches": None,
+        "roleMismatches": None,
+        "error": None,
+    }
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            w3 = connect(network)
+            result["chainId"] = w3.eth.chainId
+            result["block"] = w3.eth.blockNumber
+
+            proxies = importlib.import_module("scripts.5_production_proxy_check")
+            roles = importlib.import_module("scripts.6_production_roles_check")
+
+            result["proxyMismatches"] = proxies.audit(
+                REGISTRY,
+                proxies.KEYS,
+                proxies.AUTHORS,
+                proxies.PROXY_ADMIN_OWNERS,
+                w3=w3,
+            )
+            result["roleMismatches"] = len(
+                roles.audit(REGISTRY, roles.KEYS_WITH_ADMINS, roles.ROLES, w3=w3)[
+                    "mismatches"
+                ]
+            )
+        except Exception as e:
+            result["error"] = "{}: {}".format(type(e).__name__, e)
+
+    result["output"] = output.getvalue()
+    return result
+
+
+def connect(network):
+    host = os.path.expandvars(CONFIG.networks[network]["host"])
+    return Web3(HTTPProvider(host, request_kwargs={"timeout": TIMEOUT}))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
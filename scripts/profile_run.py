@@ -0,0 +1,25 @@
+import importlib
+import os
+
+from brownie import web3
+
+from helpers.rpc import profiler
+
+
+def main(script, function="main", *args):
+    """
+    Runs another script with RPC profiling enabled and prints where the calls went.
+    Set RPC_PROFILE_JSON to also export the profile.
+
+    brownie run profile_run main 5_production_proxy_check
+    """
+    module = importlib.import_module("scripts." + script.replace(".py", ""))
+
+    rpcProfiler = profiler.install(web3)
+    try:
+        return getattr(module, function)(*args)
+    finally:
+        profiler.uninstall(web3)
+        rpcProfiler.summary()
+        if os.getenv("RPC_PROFILE_JSON"):
+            rpcProfiler.export(os.getenv("RPC_PROFILE_JSON"))
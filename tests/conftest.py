@@ -6,6 +6,9 @@ from brownie import (
     MockStrategy,
     interface,
     accounts,
+    chain,
+    history,
+    web3,
 )
 from _setup.config import (
     WANT,
@@ -16,6 +19,8 @@ from _setup.config import (
     MANAGEMENT_FEE,
 )
 from helpers.constants import MaxUint256
+from helpers.rpc import profiler, workers
+from helpers.SnapshotManager import SnapshotManager
 from rich.console import Console
 
 console = Console()
@@ -24,19 +29,58 @@ from dotmap import DotMap
 import pytest
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--rpc-profile",
+        action="store_true",
+        help="Print JSON-RPC calls, bytes and latency per method and call site",
+    )
+    parser.addoption(
+        "--rpc-profile-json",
+        default=None,
+        help="Also export the RPC profile to this file",
+    )
+    parser.addoption(
+        "--trace-harvest",
+        action="store_true",
+        help="Also verify harvests from their call trace, needs debug_traceTransaction",
+    )
+
+
+def pytest_configure(config):
+    # Under xdist every worker gets its own fork node
+    workers.configure(config)
+
+
+## Profiling ##
+@pytest.fixture(scope="session", autouse=True)
+def rpc_profile(request):
+    exportPath = request.config.getoption("--rpc-profile-json")
+    if not (request.config.getoption("--rpc-profile") or exportPath):
+        yield None
+        return
+
+    rpcProfiler = profiler.install(web3)
+    yield rpcProfiler
+    profiler.uninstall(web3)
+    rpcProfiler.summary()
+    if exportPath:
+        rpcProfiler.export(exportPath)
+
+
 ## Accounts ##
-@pytest.fixture
+@pytest.fixture(scope="session")
 def deployer():
     return accounts[0]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def user():
     return accounts[9]
 
 
 ## Fund the account
-@pytest.fixture
+@pytest.fixture(scope="session")
 def want(deployer):
     """
     TODO: Customize this so you have the token you need for the strat
@@ -51,47 +95,47 @@ def want(deployer):
     return token
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def strategist():
     return accounts[1]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def keeper():
     return accounts[2]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def guardian():
     return accounts[3]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def governance():
     return accounts[4]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def treasury():
     return accounts[5]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def proxyAdmin():
     return accounts[6]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def randomUser():
     return accounts[7]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def badgerTree():
     return accounts[8]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def deployed(
     want,
     deployer,
@@ -105,6 +149,7 @@ def deployed(
 ):
     """
     Deploys, vault and test strategy, mock token and wires them up.
+    Runs once per session, tests are reverted back to this state by `isolation`
     """
     want = want
 
@@ -153,33 +198,33 @@ def deployed(
 
 
 ## Contracts ##
-@pytest.fixture
+@pytest.fixture(scope="session")
 def vault(deployed):
     return deployed.vault
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def strategy(deployed):
     return deployed.strategy
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def tokens(deployed):
     return [deployed.want]
 
 
 ### Fees ###
-@pytest.fixture
+@pytest.fixture(scope="session")
 def performanceFeeGovernance(deployed):
     return deployed.performanceFeeGovernance
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def performanceFeeStrategist(deployed):
     return deployed.performanceFeeStrategist
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def withdrawalFee(deployed):
     return deployed.withdrawalFee
 
@@ -197,7 +242,24 @@ def setup_share_math(deployer, vault, want, governance):
     return DotMap(depositAmount=depositAmount)
 
 
-## Forces reset before each test
+## Snapshot manager checking harvests from their call trace, with --trace-harvest
+@pytest.fixture
+def traced_snap(request, vault, strategy):
+    if not request.config.getoption("--trace-harvest"):
+        pytest.skip("Needs --trace-harvest and a node with debug_traceTransaction")
+    return SnapshotManager(vault, strategy, "StrategySnapshot", traceHarvest=True)
+
+
+## Reverts the chain to the session deployment after each test
+## NOTE: Session fixtures are set up before this snapshot is taken
 @pytest.fixture(autouse=True)
-def isolation(fn_isolation):
-    pass
+def isolation():
+    # Tests (and state_machine) take their own chain.snapshot(), which replaces
+    # brownie's single snapshot id, so keep a node snapshot of our own
+    snapshotId = web3.provider.make_request("evm_snapshot", [])["result"]
+    yield
+    web3.provider.make_request("evm_revert", [snapshotId])
+    # Resync brownie's time offset, drop the reverted txs and re-anchor chain.revert()
+    chain.sleep(0)
+    history.clear()
+    chain.snapshot()
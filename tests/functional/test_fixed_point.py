@@ -0,0 +1,56 @@
+from decimal import Decimal, localcontext
+
+from helpers.fixed_point import format_column, format_fixed
+from helpers.utils import val
+
+
+def expected(amount, decimals, places=18):
+    with localcontext() as context:
+        context.prec = 200
+        return "{:,.{}f}".format(Decimal(amount) / Decimal(10**decimals), places)
+
+
+def test_format_fixed_is_exact():
+    amounts = [
+        0,
+        1,
+        -1,
+        10**18,
+        -(10**18) - 1,
+        2**53 + 1,
+        2**256 - 1,
+        -(2**255),
+    ]
+    for decimals in [0, 6, 8, 18, 24]:
+        for amount in amounts:
+            assert format_fixed(amount, decimals) == expected(amount, decimals)
+            assert format_fixed(amount, decimals, 2) == expected(amount, decimals, 2)
+
+    # Lost by the float division
+    assert val(2**53 + 1, 0) == "9,007,199,254,740,993.000000000000000000"
+    assert val(123456789123456789123) == "123.456789123456789123"
+
+
+def test_format_fixed_rounds_half_to_even():
+    assert format_fixed(25, 1, 0) == "2"
+    assert format_fixed(35, 1, 0) == "4"
+    assert format_fixed(-25, 2, 1) == expected(-25, 2, 1)
+    assert format_fixed(-1, 24) == "-0.000000000000000000"
+
+
+def test_format_column():
+    column = [10**18, None, -5, "-", 2**200]
+    assert format_column(column) == [
+        format_fixed(10**18),
+        None,
+        format_fixed(-5),
+        "-",
+        format_fixed(2**200),
+    ]
+    assert format_column(column, 24, 6) == [
+        format_fixed(10**18, 24, 6),
+        None,
+        format_fixed(-5, 24, 6),
+        "-",
+        format_fixed(2**200, 24, 6),
+    ]
@@ -0,0 +1,73 @@
+from brownie import *
+from helpers.constants import MaxUint256
+from helpers.HarvestSimulator import (
+    HARVESTED_TOPIC,
+    TREE_DISTRIBUTION_TOPIC,
+    HarvestSimulator,
+    decode_events,
+)
+from helpers.TraceVerifier import iter_logs
+from helpers.time import days
+
+
+WANT = "0x" + "aa" * 20
+GRAVIAURA = "0x" + "bb" * 20
+
+
+def event(topic, token, amount):
+    return {
+        "address": "0x" + "11" * 20,
+        "topics": [topic, "0x" + token[2:].rjust(64, "0")],
+        "data": "0x"
+        + "".join(value.to_bytes(32, "big").hex() for value in (amount, 1, 2)),
+    }
+
+
+def test_decode_events_from_trace():
+    trace = {
+        "logs": [event(HARVESTED_TOPIC, WANT, 100)],
+        "calls": [
+            # Reverted, its events never happened
+            {
+                "error": "execution reverted",
+                "logs": [event(TREE_DISTRIBUTION_TOPIC, GRAVIAURA, 1)],
+            },
+            {"logs": [event(TREE_DISTRIBUTION_TOPIC, GRAVIAURA.upper(), 7)]},
+        ],
+    }
+    logs = list(iter_logs(trace))
+
+    assert decode_events(logs, HARVESTED_TOPIC) == [(WANT, 100)]
+    assert decode_events(logs, TREE_DISTRIBUTION_TOPIC) == [(GRAVIAURA, 7)]
+
+
+def test_harvest_simulation(deployer, vault, strategy, want, keeper):
+    want.approve(vault, MaxUint256, {"from": deployer})
+    vault.deposit(want.balanceOf(deployer) // 2, {"from": deployer})
+    vault.earn({"from": keeper})
+    chain.sleep(days(3))
+    chain.mine()
+
+    height = chain.height
+    balance = strategy.balanceOf()
+
+    simulator = HarvestSimulator(strategy, keeper)
+    # Tracing calls are not supported by every dev node
+    prediction = simulator.simulate(trace=False)
+    assert simulator.simulate(trace=False) is prediction
+    assert simulator.simulate(height, trace=False) is prediction
+
+    assert prediction.block == height
+    assert [token for token, _ in prediction.harvested] == [
+        strategy.AURABAL().lower(),
+        strategy.GRAVIAURA().lower(),
+    ]
+    assert all(amount > 0 for _, amount in prediction.harvested)
+
+    # Nothing was sent
+    assert chain.height == height
+    assert strategy.balanceOf() == balance
+
+    # Rewards keep accruing, the harvest a bit later gets at least the prediction
+    tx = strategy.harvest({"from": keeper})
+    assert tx.events["Harvested"][0]["amount"] >= prediction.harvested[0][1]
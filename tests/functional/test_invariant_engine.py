@@ -0,0 +1,65 @@
+from helpers.InvariantEngine import InvariantEngine, Invariant
+from helpers.snapshot.snap import Snap
+
+INVARIANTS = {
+    "deposit": [
+        Invariant(
+            "sett want increases by the amount",
+            'after.balances("want", "sett")',
+            "==",
+            'before.balances("want", "sett") + params["amount"]',
+        ),
+        Invariant(
+            "supply increases by the shares",
+            'after.get("sett.totalSupply")',
+            "approx",
+            'before.get("sett.totalSupply") + derived["shares"]',
+            1,
+        ),
+        Invariant(
+            "only checked on big deposits",
+            'after.get("sett.totalSupply")',
+            ">",
+            "10**30",
+            when='params["amount"] > 10**24',
+        ),
+    ]
+}
+
+DERIVED = {"deposit": [("shares", 'params["amount"] * 2')]}
+
+
+def snap(block, want, supply):
+    return Snap(
+        {"balances.want.sett": want, "sett.totalSupply": supply}, block, ["sett"]
+    )
+
+
+def test_invariants_report_every_violation():
+    engine = InvariantEngine(INVARIANTS, DERIVED)
+
+    assert (
+        engine.evaluate("deposit", snap(1, 0, 0), snap(2, 10, 20), {"amount": 10}) == []
+    )
+
+    violations = engine.evaluate_many(
+        [
+            ("deposit", snap(1, 0, 0), snap(2, 10, 20), {"amount": 10}),
+            ("deposit", snap(2, 10, 20), snap(3, 15, 50), {"amount": 10}),
+        ]
+    )
+    assert [(v.block, v.name) for v in violations] == [
+        (3, "sett want increases by the amount"),
+        (3, "supply increases by the shares"),
+    ]
+
+    # Compiled once per operation and snap layout
+    assert len(engine.plans) == 1
+
+
+def test_invariants_missing_keys_are_violations():
+    engine = InvariantEngine(
+        {"earn": [Invariant("missing", 'after.get("strategy.balanceOf")', ">", "0")]}
+    )
+    [violation] = engine.evaluate("earn", snap(1, 0, 0), snap(2, 0, 0))
+    assert "strategy.balanceOf" in violation.error
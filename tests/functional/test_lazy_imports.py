@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+PURE_MODULES = [
+    "helpers.shares_math",
+    "helpers.multicall.signature",
+    "helpers.snapshot.snap",
+    "helpers.snapshot.render",
+    "helpers.multicall",
+    "helpers.utils",
+    "helpers.fixed_point",
+]
+
+
+def test_pure_helpers_import_without_brownie():
+    """
+    Pure helpers must not pull in brownie, checked in a fresh interpreter
+    """
+    code = "import sys\nimport {}\nassert 'brownie' not in sys.modules".format(
+        ", ".join(PURE_MODULES)
+    )
+    subprocess.check_call([sys.executable, "-c", code])
@@ -0,0 +1,49 @@
+import pytest
+from brownie import *
+from helpers import merkle
+
+
+def test_guestlist_merkle_proofs(tmp_path, deployer, vault, randomUser):
+    guests = [account.address for account in accounts[:7]]
+
+    csvPath = tmp_path / "guests.csv"
+    csvPath.write_text("address\n" + "\n".join(guests + guests[:2]) + "\n")
+
+    # Small chunks to go through the on disk merge
+    treePath = str(tmp_path / "guests.tree")
+    root = merkle.build(merkle.read_addresses(str(csvPath)), treePath, chunk=3)
+    tree = merkle.MerkleTree(treePath)
+    assert tree.size == len(guests)
+    assert tree.proof(randomUser.address) is None
+
+    guestlist = TheGuestlist.deploy({"from": deployer})
+    guestlist.initialize(vault, {"from": deployer})
+    guestlist.setGuestRoot(root, {"from": deployer})
+    assert bytes(guestlist.guestRoot()) == tree.root
+
+    for guest in guests:
+        proof = tree.proof(guest)
+        assert merkle.verify(proof, root, merkle.leaf(guest))
+        assert guestlist.authorized(guest, 0, proof)
+
+    assert not guestlist.authorized(randomUser, 0, tree.proof(guests[0]))
+    tree.close()
+
+
+def test_read_addresses_validation(tmp_path):
+    address = "0x" + "ab" * 20
+    checksummed = web3.toChecksumAddress(address)
+
+    csvPath = tmp_path / "guests.csv"
+    csvPath.write_text("address\n\n{}\n{}\n".format(address[2:].upper(), checksummed))
+    assert list(merkle.read_addresses(str(csvPath))) == [address, address]
+    assert merkle.leaf(address[2:]) == merkle.leaf(checksummed)
+
+    # Bad checksum
+    wrongCase = checksummed[:2] + checksummed[2:].swapcase()
+    csvPath.write_text("address\n{}\n".format(wrongCase))
+    with pytest.raises(ValueError):
+        list(merkle.read_addresses(str(csvPath)))
+
+    with pytest.raises(ValueError):
+        merkle.leaf(address[:-2])
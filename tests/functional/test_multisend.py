@@ -0,0 +1,42 @@
+import pytest
+from brownie import *
+from eth_abi import decode_single
+from helpers import multisend
+
+
+def test_multisend_encoding():
+    to = "0x" + "11" * 20
+    packed = multisend.pack(to, "0xabcdef", 5)
+
+    assert packed[0] == multisend.CALL
+    assert packed[1:21] == bytes.fromhex("11" * 20)
+    assert int.from_bytes(packed[21:53], "big") == 5
+    assert int.from_bytes(packed[53:85], "big") == 3
+    assert packed[85:] == bytes.fromhex("abcdef")
+
+    data = multisend.encode([(to, "0xabcdef", 5), (to, b"\x01")])
+    assert data[:4] == multisend.MULTISEND_SELECTOR
+    assert decode_single("bytes", data[4:]) == packed + multisend.pack(to, b"\x01")
+
+
+def test_multisend_simulation(vault, governance, randomUser):
+    keeper = vault.keeper()
+    txs = [
+        (vault.address, vault.setKeeper.encode_input(randomUser)),
+        (vault.address, vault.setWithdrawalFee.encode_input(0)),
+    ]
+
+    # Executes as governance, without changing any state
+    multisend.simulate(governance, txs)
+    assert vault.keeper() == keeper
+    assert len(web3.eth.getCode(governance.address)) == 0
+
+    # Reverts if any tx does
+    with pytest.raises(ValueError):
+        multisend.simulate(randomUser, txs)
+
+
+def test_is_safe(vault, governance):
+    # An account, then a contract without the Safe getters
+    assert not multisend.is_safe(governance)
+    assert not multisend.is_safe(vault)
@@ -0,0 +1,50 @@
+from brownie import *
+from helpers.constants import MaxUint256
+from helpers.PositionTracker import PositionTracker
+
+
+def test_position_tracker(deployer, vault, strategy, want, governance, randomUser):
+    tracker = PositionTracker(vault, fromBlock=vault.tx.block_number)
+
+    depositAmount = want.balanceOf(deployer) // 2
+    assert depositAmount > 0
+
+    want.approve(vault, MaxUint256, {"from": deployer})
+    vault.deposit(depositAmount, {"from": deployer})
+    vault.earn({"from": governance})
+
+    tracker.sync()
+    assert tracker.balanceOf(deployer) == vault.balanceOf(deployer)
+    assert tracker.check_total_supply()
+
+    # Incremental sync picks up new transfers
+    vault.transfer(randomUser, vault.balanceOf(deployer) // 3, {"from": deployer})
+    tracker.sync()
+
+    assert tracker.balanceOf(deployer) == vault.balanceOf(deployer)
+    assert tracker.balanceOf(randomUser) == vault.balanceOf(randomUser)
+    assert tracker.topHolders(1) == [(deployer.address, vault.balanceOf(deployer))]
+
+    # Started after the deployment, holders' earlier balances are read when first seen
+    late = PositionTracker(vault, fromBlock=web3.eth.blockNumber + 1)
+
+    chain.sleep(10000 * 13)
+    chain.mine()
+
+    # Harvest issues shares to the treasury
+    strategy.harvest({"from": governance})
+    vault.withdraw(vault.balanceOf(randomUser), {"from": randomUser})
+    tracker.sync()
+
+    assert tracker.balanceOf(randomUser) == 0
+    assert tracker.holders() == len(
+        [holder for holder, balance in tracker.topHolders(10) if balance > 0]
+    )
+    assert tracker.check_total_supply()
+
+    late.sync()
+    assert late.balanceOf(randomUser) == 0
+    assert late.totalSupply() == vault.totalSupply()
+    for holder, balance in late.topHolders(10):
+        assert balance == vault.balanceOf(holder)
+    assert late.check_total_supply()
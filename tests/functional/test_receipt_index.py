@@ -0,0 +1,25 @@
+from brownie import *
+from helpers.constants import AddressZero
+from helpers.ReceiptIndex import ReceiptIndex
+
+
+def test_receipt_index(deployer, vault, want):
+    amount = want.balanceOf(deployer) // 2
+    want.approve(vault, amount, {"from": deployer})
+    tx = vault.deposit(amount, {"from": deployer})
+
+    events = ReceiptIndex.of(tx)
+    assert ReceiptIndex.of(tx) is events
+
+    assert events.transferred(want, deployer, vault) == amount
+    # Addresses match whatever their case
+    assert events.transferred(want.address.lower(), deployer.address, vault) == amount
+
+    shares = vault.balanceOf(deployer)
+    assert events.transferred(vault, AddressZero, deployer) == shares
+    assert events.count("Transfer") == len(tx.events["Transfer"])
+    assert events.count("Transfer", src=deployer) == 1
+    assert events.amount("Transfer", dst=deployer) == shares
+
+    assert events.transferred(want, vault, deployer) == 0
+    assert events.events("Harvested") == []
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+from helpers.snapshot.render import (
+    CsvRenderer,
+    GridRenderer,
+    JsonlRenderer,
+    close_renderers,
+    get_renderer,
+)
+
+BIG = 2**200 + 1
+
+
+def rows():
+    yield "sett.balance", BIG
+    yield "sett.token", "0xToken"
+
+
+def changes():
+    yield "sett.balance", BIG, BIG + 5
+    yield "sett.token", "0xA", "0xB"
+
+
+def test_jsonl_renderer_is_exact():
+    stream = io.StringIO()
+    renderer = JsonlRenderer(stream)
+    renderer.table("Status", 10, rows(), None)
+    renderer.compare("Compare", 10, 11, changes(), None)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["kind"] for r in records] == ["table", "table", "compare", "compare"]
+    assert records[0]["after"] == BIG and records[0]["toBlock"] == 10
+    assert records[2]["before"] == BIG and records[2]["diff"] == 5
+    assert records[3]["diff"] is None
+
+
+def test_csv_renderer_header_once():
+    stream = io.StringIO()
+    renderer = CsvRenderer(stream)
+    renderer.table("Status", 10, rows(), None)
+    renderer.compare("Compare", 10, 11, changes(), None)
+
+    read = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert len(read) == 4
+    assert int(read[2]["after"]) == BIG + 5
+    assert read[2]["fromBlock"] == "10"
+
+
+def test_grid_renderer_one_stream():
+    stream = io.StringIO()
+    renderer = GridRenderer(stream)
+    renderer.table("Status", 10, rows(), lambda key, value: value)
+    renderer.compare("Compare", 10, 11, changes(), lambda key, value: value)
+
+    # Titles go to the same stream as their grid
+    output = stream.getvalue()
+    assert output.index("=== Status ===") < output.index("sett.balance")
+    assert "=== Compare 10 -> 11 ===" in output
+    assert str(BIG + 5) in output
+
+
+def test_unknown_renderer():
+    try:
+        get_renderer("xml")
+        assert False
+    except ValueError:
+        pass
+
+
+def test_output_opened_once(tmp_path):
+    output = str(tmp_path / "snaps.jsonl")
+    first = get_renderer("jsonl", output)
+    first.table("Status", 10, rows(), None)
+
+    # A second manager appends to the same output instead of truncating it
+    second = get_renderer("jsonl", output)
+    assert second is first
+    second.compare("Compare", 10, 11, changes(), None)
+
+    close_renderers()
+    assert first.stream.closed
+    with open(output) as f:
+        assert len(f.readlines()) == 4
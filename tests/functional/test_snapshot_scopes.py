@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from brownie import *
+from helpers.SnapshotManager import SnapshotManager
+
+
+def test_snap_scopes(vault, strategy, want, deployer, randomUser):
+    manager = SnapshotManager(vault, strategy, "StrategySnapshot")
+    base = dict(manager.entities)
+
+    tracked = manager.snap({"user": deployer.address})
+    assert "balances.want.user" in tracked.data
+
+    # Tracked users don't leak into the base entities nor the later snaps
+    untracked = manager.snap()
+    assert manager.entities == base
+    assert "balances.want.user" not in untracked.data
+    assert set(untracked.data) < set(tracked.data)
+
+    # One compiled plan per scope
+    assert manager.plan({"user": deployer.address}) is manager.plan(
+        {"user": deployer.address}
+    )
+
+    users = [deployer.address, randomUser.address]
+    with ThreadPoolExecutor(4) as pool:
+        snaps = list(pool.map(lambda i: manager.snap({"user": users[i % 2]}), range(8)))
+    for i, snap in enumerate(snaps):
+        assert snap.balances("want", "user") == want.balanceOf(users[i % 2])
@@ -0,0 +1,71 @@
+import pytest
+
+from helpers.TraceVerifier import TRANSFER_TOPIC, TokenFlows
+
+TOKEN = "0x" + "aa" * 20
+OTHER = "0x" + "bb" * 20
+ZERO = "0x" + "00" * 20
+VAULT = "0x" + "11" * 20
+STRATEGY = "0x" + "22" * 20
+
+
+def transfer(token, src, dst, amount):
+    return {
+        "address": token,
+        "topics": [
+            TRANSFER_TOPIC,
+            "0x" + src[2:].rjust(64, "0"),
+            "0x" + dst[2:].rjust(64, "0"),
+        ],
+        "data": hex(amount),
+    }
+
+
+def test_token_flows_from_trace():
+    trace = {
+        "logs": [transfer(TOKEN, ZERO, STRATEGY, 100)],
+        "calls": [
+            {"logs": [transfer(TOKEN, STRATEGY, VAULT, 60)], "calls": []},
+            # Reverted, its transfers never happened
+            {
+                "error": "execution reverted",
+                "logs": [transfer(TOKEN, STRATEGY, VAULT, 40)],
+            },
+            {
+                "logs": [transfer(TOKEN, STRATEGY, VAULT, 40)],
+                "calls": [{"logs": [transfer(OTHER, VAULT, STRATEGY, 7)]}],
+            },
+        ],
+    }
+    flows = TokenFlows.from_trace(trace)
+
+    assert flows.minted(TOKEN) == 100
+    assert flows.sent(TOKEN, STRATEGY, VAULT) == 100
+    assert flows.sent(TOKEN.upper().replace("0X", "0x"), dst=VAULT) == 100
+    assert flows.net(TOKEN, VAULT) == 100
+    assert flows.net(OTHER, STRATEGY) == 7
+    assert flows.tokens() == [TOKEN, OTHER]
+
+    flows.assert_conserved(STRATEGY, TOKEN)
+    flows.assert_no_dust(STRATEGY, [TOKEN])
+    with pytest.raises(AssertionError, match="kept by"):
+        flows.assert_no_dust(STRATEGY, [OTHER])
+    # 7 came in on top of 5 held before the transaction
+    with pytest.raises(AssertionError, match="12 dust"):
+        flows.assert_no_dust(STRATEGY, [OTHER], before={OTHER: 5})
+
+
+def test_no_dust_from_pre_balance():
+    # Swept the 5 held before along with the 7 received
+    flows = TokenFlows.from_trace(
+        {
+            "logs": [
+                transfer(OTHER, VAULT, STRATEGY, 7),
+                transfer(OTHER, STRATEGY, VAULT, 12),
+            ]
+        }
+    )
+
+    flows.assert_no_dust(STRATEGY, [OTHER], before={OTHER: 5})
+    with pytest.raises(AssertionError, match="2 dust"):
+        flows.assert_no_dust(STRATEGY, [OTHER], before={OTHER: 7})
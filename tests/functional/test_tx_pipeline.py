@@ -0,0 +1,29 @@
+from brownie import *
+from helpers.TxPipeline import TxPipeline
+
+
+def test_tx_pipeline(vault, governance, keeper, guardian, randomUser):
+    pipeline = TxPipeline(governance)
+    # Already set, no tx
+    pipeline.add(vault, "guardian()(address)", guardian, "setGuardian", guardian)
+    pipeline.add(vault, "keeper()(address)", randomUser, "setKeeper", randomUser)
+    # Sent once setKeeper is mined, with its gas estimated then
+    pipeline.add(
+        vault, "withdrawalFee()(uint256)", 0, "setWithdrawalFee", 0, dependent=True
+    )
+
+    assert [step.setter for step in pipeline.diff()] == [
+        "setKeeper",
+        "setWithdrawalFee",
+    ]
+
+    nonce = governance.nonce
+    txs = pipeline.run()
+
+    assert [tx.nonce for tx in txs] == [nonce, nonce + 1]
+    assert vault.keeper() == randomUser
+    assert vault.withdrawalFee() == 0
+    assert pipeline.diff() == []
+
+    # Nothing left to send
+    assert pipeline.run() == []
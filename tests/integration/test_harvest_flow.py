@@ -245,3 +245,23 @@ def test_single_user_harvest_flow_remove_fees(deployer, vault, strategy, want, k
     print(endingBalance - startingBalance)
     print("gainsPercentage")
     print((endingBalance - startingBalance) / startingBalance)
+
+
+def test_deferred_harvest_flow(deployer, vault, strategy, want, keeper):
+    snap = SnapshotManager(vault, strategy, "StrategySnapshot")
+    depositAmount = want.balanceOf(deployer) // 2
+    want.approve(vault, MaxUint256, {"from": deployer})
+
+    with snap.deferredVerification(processes=2) as log:
+        snap.settDeposit(depositAmount, {"from": deployer})
+        snap.settEarn({"from": keeper})
+
+        chain.sleep(days(1))
+        chain.mine()
+
+        snap.settHarvest({"from": keeper})
+        snap.settWithdraw(vault.balanceOf(deployer) // 2, {"from": deployer})
+
+        assert len(log) == 4
+
+    assert len(snap.deferredLog) == 0
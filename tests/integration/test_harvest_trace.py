@@ -0,0 +1,25 @@
+from brownie import *
+from helpers.constants import MaxUint256
+from helpers.time import days
+
+
+def test_harvest_trace_flow(deployer, vault, want, keeper, traced_snap):
+    depositAmount = want.balanceOf(deployer) // 2
+    assert depositAmount > 0
+
+    want.approve(vault, MaxUint256, {"from": deployer})
+    traced_snap.settDeposit(depositAmount, {"from": deployer})
+    traced_snap.settEarn({"from": keeper})
+
+    chain.sleep(days(1))
+    chain.mine()
+
+    # confirm_harvest also runs hook_harvest_trace on the token flows of the tx
+    traced_snap.settHarvest({"from": keeper})
+
+    chain.sleep(days(1))
+    chain.mine()
+
+    # Deferred, the trace is checked with the other chain checks at the end
+    with traced_snap.deferredVerification():
+        traced_snap.settHarvest({"from": keeper})
@@ -0,0 +1,171 @@
+from brownie import accounts, chain
+from brownie.test import state_machine, strategy as st
+from helpers.constants import MaxUint256
+from helpers.InvariantEngine import Invariant, InvariantEngine
+from helpers.SnapshotManager import SnapshotManager
+from helpers.snapshot.snap import Snap
+from helpers.time import days
+
+USERS = 4
+
+
+def step_invariants(users):
+    """
+    Accounting that must hold across all the users after every step
+    """
+    userShares = " + ".join(
+        'after.balances("sett", "{}")'.format(user) for user in users
+    )
+    return {
+        "step": [
+            Invariant(
+                "All shares are held by the users, treasury and strategist",
+                userShares
+                + ' + after.balances("sett", "treasury")'
+                + ' + after.balances("sett", "strategist")',
+                "==",
+                'after.get("sett.totalSupply")',
+            ),
+            Invariant(
+                "balance() is the idle want plus the strategy's",
+                'after.get("sett.balance")',
+                "==",
+                'after.balances("want", "sett") + after.get("strategy.balanceOf")',
+            ),
+            Invariant(
+                "Strategy balanceOf() is its want plus its pool",
+                'after.get("strategy.balanceOf")',
+                "==",
+                'after.get("strategy.balanceOfWant") + after.get("strategy.balanceOfPool")',
+            ),
+            Invariant(
+                "available() is at most the idle want",
+                'after.get("sett.available")',
+                "<=",
+                'after.balances("want", "sett")',
+            ),
+            Invariant(
+                "Price per share never decreases, but for 1 wei of rounding",
+                'after.get("sett.getPricePerFullShare") + 1',
+                ">=",
+                'before.get("sett.getPricePerFullShare")',
+            ),
+        ]
+    }
+
+
+def alias(snap, userKey):
+    """
+    The snap with the acting user's balances also under "user", as the resolver expects
+    """
+    suffix = "." + userKey
+    data = dict(snap.data)
+    for key, value in snap.data.items():
+        if key.endswith(suffix):
+            data[key[: -len(suffix)] + ".user"] = value
+    return Snap(data, snap.block, snap.entityKeys)
+
+
+class StateMachine:
+    st_user = st("uint8", max_value=USERS - 1)
+    st_pct = st("uint8", min_value=1, max_value=100)
+    st_time = st("uint32", min_value=60, max_value=days(3))
+
+    def __init__(cls, manager, vault, strategy, want, users, keeper, governance):
+        cls.manager = manager
+        cls.vault = vault
+        cls.strategy = strategy
+        cls.want = want
+        cls.users = users
+        cls.keeper = keeper
+        cls.governance = governance
+        cls.userKeys = ["user{}".format(i) for i in range(len(users))]
+        # All users in every snap: one multicall per step whatever their number
+        cls.trackedUsers = dict(zip(cls.userKeys, [u.address for u in users]))
+        cls.engine = InvariantEngine(step_invariants(cls.userKeys))
+
+    def setup(self):
+        self.before = self.manager.snap(self.trackedUsers)
+
+    def step(self, operation=None, userKey="user0", params=None, tx=None):
+        after = self.manager.snap(self.trackedUsers)
+
+        violations = self.engine.evaluate("step", self.before, after)
+        if operation:
+            resolver = self.manager.resolver
+            before, aliased = alias(self.before, userKey), alias(after, userKey)
+            violations += resolver.engine.evaluate(operation, before, aliased, params)
+            if tx is not None:
+                resolver.confirm_chain(operation, before, aliased, params, tx)
+        self.engine.assert_none(violations)
+
+        self.before = after
+
+    # ===== Rules =====
+
+    def rule_deposit(self, st_user, st_pct):
+        user, userKey = self.users[st_user], self.userKeys[st_user]
+        amount = self.before.balances("want", userKey) * st_pct // 100
+        if amount == 0:
+            return self.step()
+
+        tx = self.vault.deposit(amount, {"from": user})
+        self.step("deposit", userKey, {"user": user.address, "amount": amount}, tx)
+
+    def rule_withdraw(self, st_user, st_pct):
+        user, userKey = self.users[st_user], self.userKeys[st_user]
+        shares = self.before.balances("sett", userKey) * st_pct // 100
+        if shares == 0:
+            return self.step()
+
+        tx = self.vault.withdraw(shares, {"from": user})
+        self.step("withdraw", userKey, {"user": user.address, "amount": shares}, tx)
+
+    def rule_earn(self):
+        if self.before.get("sett.available") == 0:
+            return self.step()
+
+        tx = self.vault.earn({"from": self.keeper})
+        self.step("earn", params={"user": self.users[0].address}, tx=tx)
+
+    def rule_harvest(self):
+        if self.before.get("strategy.balanceOfPool") == 0:
+            return self.step()
+
+        tx = self.strategy.harvest({"from": self.keeper})
+        self.step("harvest", tx=tx)
+
+    def rule_withdraw_to_vault(self):
+        if self.before.get("strategy.balanceOf") == 0:
+            return self.step()
+
+        self.vault.withdrawToVault({"from": self.governance})
+        self.step()
+
+    def rule_sleep(self, st_time):
+        chain.sleep(st_time)
+        chain.mine()
+        self.step()
+
+
+def test_stateful_multi_user_flow(deployer, vault, strategy, want, keeper, governance):
+    manager = SnapshotManager(vault, strategy, "StrategySnapshot")
+
+    users = [accounts.add() for _ in range(USERS)]
+    share = want.balanceOf(deployer) // (2 * USERS)
+    for user in users:
+        deployer.transfer(user, "1 ether")
+        want.transfer(user, share, {"from": deployer})
+        want.approve(vault, MaxUint256, {"from": user})
+
+    state_machine(
+        StateMachine,
+        manager,
+        vault,
+        strategy,
+        want,
+        users,
+        keeper,
+        governance,
+        settings={"max_examples": 10, "stateful_step_count": 20},
+    )
@@ -0,0 +1,60 @@
+import pytest
+
+from brownie import AuraBalStakerStrategy, TheVault, AdminUpgradeabilityProxy, accounts
+
+from helpers.constants import MaxUint256
+from helpers.StorageLayout import StorageLayout, diff, print_diff, value_of
+
+VAULT_ADDRESS = "0x37d9D2C6035b744849C15F1BFEE8F268a20fCBd8"
+
+
+@pytest.fixture
+def vault_proxy():
+    return TheVault.at(VAULT_ADDRESS)
+
+
+@pytest.fixture
+def strat_proxy(vault_proxy):
+    return AuraBalStakerStrategy.at(vault_proxy.strategy())
+
+
+def test_upgrade_keeps_storage(strat_proxy, vault_proxy, deployer):
+    layout = StorageLayout.compile(AuraBalStakerStrategy)
+    before = layout.read(strat_proxy)
+    admin = value_of(before, "<admin>")
+
+    # Upgrade in place to a fresh deployment of the same logic
+    logic = AuraBalStakerStrategy.deploy({"from": deployer})
+    proxy = AdminUpgradeabilityProxy.at(strat_proxy.address)
+    proxy.upgradeTo(logic, {"from": accounts.at(admin, force=True)})
+    AdminUpgradeabilityProxy.remove(proxy)
+
+    after = layout.read(strat_proxy)
+    changes = diff(before, after)
+    print_diff(changes)
+
+    # Only the implementation moved, every variable kept its value
+    assert [change.label for change in changes] == ["<implementation>"]
+    assert changes[0].after == logic.address.lower()
+
+    # Spot check the decoding against the getters
+    assert value_of(after, "want") == strat_proxy.want().lower()
+    assert value_of(after, "vault") == vault_proxy.address.lower()
+    assert value_of(after, "minBbaUsdHarvest") == strat_proxy.minBbaUsdHarvest()
+
+
+def test_read_follows_mapping_keys(vault, want, deployer, randomUser):
+    want.approve(vault, MaxUint256, {"from": deployer})
+    vault.deposit(want.balanceOf(deployer) // 2, {"from": deployer})
+
+    layout = StorageLayout.compile(TheVault)
+    values = layout.read(
+        vault, keys={"_balances": [deployer.address, randomUser.address]}
+    )
+
+    deposited = value_of(values, "_balances[{}]".format(deployer.address))
+    assert deposited > 0
+    assert deposited == vault.balanceOf(deployer)
+    assert value_of(values, "_balances[{}]".format(randomUser.address)) == 0
+    # Labels repeat across bases, every one is kept under its own slot
+    assert len([label for label, _ in values.values() if label == "__gap[0]"]) > 1